@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import re
+from collections.abc import Mapping
 from datetime import datetime
 from typing import Dict, List, Optional
 
@@ -28,7 +29,7 @@ def extract_image_url_from_metadata(metadata) -> str:
         except Exception:
             return metadata if metadata.startswith("http") else ""
 
-    if not isinstance(metadata, dict):
+    if not isinstance(metadata, Mapping):
         return ""
 
     image_data = metadata.get("image", {}) or {}
@@ -0,0 +1,211 @@
+"""
+Ограниченный кэш с TTL для ответов каталога
+
+- не больше maxsize записей, вытесняется давно не использованная (LRU);
+- отдельные TTL для непустых и пустых («негативных») результатов:
+  пустой ответ после сбоя API не закрепляется до перезапуска;
+- после истечения TTL запись ещё stale_ttl секунд отдаётся как устаревшая,
+  а вызывающий код обновляет её в фоне (stale-while-revalidate).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, NamedTuple, Optional
+
+
+class CacheLookup(NamedTuple):
+    """Результат TTLCache.lookup"""
+
+    hit: bool
+    value: Any = None
+    stale: bool = False
+
+
+_MISS = CacheLookup(False)
+
+
+class CatalogFallback:
+    """Отметка значения, подставленного при сбое каталога (пустого или устаревшего), а не полученного от него"""
+
+
+class FallbackList(CatalogFallback, list):
+    pass
+
+
+class FallbackDict(CatalogFallback, dict):
+    pass
+
+
+def is_fallback(value: Any) -> bool:
+    """Значение — заглушка при сбое каталога (см. GraphQLClient._cache_failure)"""
+    return isinstance(value, CatalogFallback)
+
+
+class TTLCache:
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: float = 6 * 3600,
+        negative_ttl: float = 300,
+        stale_ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            maxsize: Максимум записей
+            ttl: Время жизни непустого результата, сек
+            negative_ttl: Время жизни пустого результата (None, [], {}), сек
+            stale_ttl: Сколько ещё отдавать непустую запись после ttl, пока она обновляется
+            clock: Источник времени (монотонные секунды)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize должен быть положительным")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        # key -> (value, fresh_until, stale_until)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Есть ли запись, которую можно отдать (свежая или устаревшая); статистику не меняет"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and self._clock() < entry[2]
+
+    def is_fresh(self, key: Hashable) -> bool:
+        """Есть ли свежая запись; статистику не меняет"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and self._clock() < entry[1]
+
+    def lookup(self, key: Hashable) -> CacheLookup:
+        """Ищет запись: промах, свежее попадание или устаревшее (stale=True — пора обновить)"""
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISS
+            value, fresh_until, stale_until = entry
+            if now >= stale_until:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISS
+            self._data.move_to_end(key)
+            if now < fresh_until:
+                self.hits += 1
+                return CacheLookup(True, value)
+            self.stale_hits += 1
+            return CacheLookup(True, value, stale=True)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Значение, которое можно отдать (свежее или устаревшее), без учёта в статистике и LRU"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._clock() >= entry[2]:
+                return default
+            return entry[0]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        result = self.lookup(key)
+        return result.value if result.hit else default
+
+    async def load(self, keys: Iterable[Hashable]):
+        """Подгрузка ключей из нижнего уровня (TieredCache.load); у кэша только в памяти — ничего"""
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """
+        Сохраняет значение
+
+        Пустые значения живут negative_ttl и не отдаются как устаревшие.
+        ttl/stale_ttl задаются явно, например при переносе записи из другого уровня кэша.
+        """
+        now = self._clock()
+        if ttl is None:
+            ttl = self.ttl if value else self.negative_ttl
+        if stale_ttl is None:
+            stale_ttl = self.stale_ttl if value else 0
+        with self._lock:
+            self._data[key] = (value, now + ttl, now + ttl + stale_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    __setitem__ = set
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def purge_expired(self) -> int:
+        """Удаляет записи, которые уже нельзя отдать даже как устаревшие"""
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, entry in self._data.items() if now >= entry[2]]
+            for key in expired:
+                del self._data[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def make_catalog_cache(namespace: str):
+    """
+    Кэш для одного вида запросов каталога с параметрами из конфига (CATALOG_CACHE_*)
+
+    Если задан CATALOG_CACHE_PATH, перед SQLite-файлом стоит TTLCache в памяти
+    (см. clients.catalog_cache), и кэш переживает перезапуск процесса.
+    """
+    try:
+        from literary_calendar_bot_config import (
+            CATALOG_CACHE_NEGATIVE_TTL,
+            CATALOG_CACHE_PATH,
+            CATALOG_CACHE_SIZE,
+            CATALOG_CACHE_STALE_TTL,
+            CATALOG_CACHE_TTL,
+        )
+    except (ImportError, AttributeError):
+        return TTLCache()
+    memory = TTLCache(
+        maxsize=CATALOG_CACHE_SIZE,
+        ttl=CATALOG_CACHE_TTL,
+        negative_ttl=CATALOG_CACHE_NEGATIVE_TTL,
+        stale_ttl=CATALOG_CACHE_STALE_TTL,
+    )
+    if not CATALOG_CACHE_PATH:
+        return memory
+
+    from clients.catalog_cache import TieredCache, get_catalog_store
+
+    return TieredCache(memory, get_catalog_store(CATALOG_CACHE_PATH), namespace)
@@ -0,0 +1,475 @@
+"""
+Постоянный (SQLite) кэш ответов каталога
+
+Записи хранятся по паре (namespace — вид запроса, key — значение переменной)
+со сроками свежести в абсолютном времени, поэтому после перезапуска процесса
+или разового запуска рассылки книги берутся из файла без обращения к API.
+Перед файлом стоит TTLCache в памяти (TieredCache). Файл не трогается из
+event loop: записи копятся и пишутся пачками в фоновом потоке, а чтение
+(TieredCache.load) идёт в отдельном потоке через своё WAL-соединение и
+не ждёт записи.
+
+Просмотр и очистка:
+
+    python -m clients.catalog_cache stats
+    python -m clients.catalog_cache list --namespace books_by_author --limit 20
+    python -m clients.catalog_cache purge            # только истёкшие записи
+    python -m clients.catalog_cache purge --all      # всё (или --namespace ...)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from clients.cache import CacheLookup, TTLCache, is_fallback
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_CACHE_PATH = "catalog_cache.db"
+
+
+class CatalogStore:
+    """SQLite-файл с ответами каталога; общий для всех кэшей процесса (см. get_catalog_store)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # Кэш можно восстановить из API, поэтому fsync на каждую запись не нужен
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS catalog_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        # Отложенные записи (namespace, key) -> (значение, fresh_until, stale_until); пишет один фоновый поток
+        self._pending: Dict[Tuple[str, str], Tuple[Any, float, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-cache")
+        self.write_errors = 0
+        # Чтение — через своё соединение: в WAL оно не ждёт ни блокировки записи, ни её fsync
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(path, check_same_thread=False)
+        self._read_conn.execute("PRAGMA busy_timeout = 5000")
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-cache-read")
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        """(значение, fresh_until, stale_until) или None"""
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Tuple[Any, float, float]]:
+        """{key: (значение, fresh_until, stale_until)} для найденных ключей"""
+        found: Dict[str, Tuple[Any, float, float]] = {}
+        missing: List[str] = []
+        with self._pending_lock:
+            for key in dict.fromkeys(keys):
+                pending = self._pending.get((namespace, key))
+                if pending is not None:
+                    found[key] = pending
+                else:
+                    missing.append(key)
+        rows = []
+        with self._read_lock:
+            # Не больше 500 параметров в запросе (лимит SQLite на старых сборках — 999)
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows += self._read_conn.execute(
+                    f"""
+                    SELECT key, value, fresh_until, stale_until FROM catalog_cache
+                    WHERE namespace = ? AND key IN ({", ".join("?" * len(chunk))})
+                    """,
+                    (namespace, *chunk),
+                ).fetchall()
+        for key, value, fresh_until, stale_until in rows:
+            try:
+                found[key] = (json.loads(value), fresh_until, stale_until)
+            except ValueError:
+                continue
+        return found
+
+    async def aget_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Tuple[Any, float, float]]:
+        """get_many в потоке чтения, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader, self.get_many, namespace, list(keys))
+
+    def put(self, namespace: str, key: str, value: Any, fresh_until: float, stale_until: float):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO catalog_cache (namespace, key, value, fresh_until, stale_until, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (namespace, key, payload, fresh_until, stale_until, time.time()),
+            )
+            self._conn.commit()
+
+    def put_later(self, namespace: str, key: str, value: Any, fresh_until: float, stale_until: float):
+        """Как put, но запись уходит в файл в фоновом потоке вместе с остальными отложенными"""
+        with self._pending_lock:
+            self._pending[(namespace, key)] = (value, fresh_until, stale_until)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._writer.submit(self.flush)
+
+    def flush(self) -> int:
+        """Записывает отложенные записи одной транзакцией; возвращает их число"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        if not pending:
+            return 0
+        now = time.time()
+        rows = []
+        for (namespace, key), (value, fresh_until, stale_until) in pending.items():
+            try:
+                payload = json.dumps(value, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                self.write_errors += 1
+                logger.warning("⚠️ Не удалось записать кэш каталога (%s): %s", namespace, e)
+                continue
+            rows.append((namespace, key, payload, fresh_until, stale_until, now))
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO catalog_cache (namespace, key, value, fresh_until, stale_until, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            # Файл кэша — только ускорение: ошибка записи не должна ломать ответ
+            self.write_errors += len(rows)
+            logger.warning("⚠️ Не удалось записать кэш каталога: %s", e)
+            return 0
+        return len(rows)
+
+    def delete(self, namespace: str, key: str):
+        with self._pending_lock:
+            self._pending.pop((namespace, key), None)
+        with self._lock:
+            self._conn.execute("DELETE FROM catalog_cache WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def purge(self, namespace: Optional[str] = None, expired_only: bool = True) -> int:
+        """Удаляет истёкшие записи (или все при expired_only=False); возвращает количество"""
+        conditions, params = [], []
+        if namespace:
+            conditions.append("namespace = ?")
+            params.append(namespace)
+        if expired_only:
+            conditions.append("stale_until <= ?")
+            params.append(time.time())
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        self.flush()
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM catalog_cache{where}", params).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Записи по видам запросов: всего, свежих, устаревших, истёкших, объём JSON"""
+        now = time.time()
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT namespace,
+                       COUNT(*),
+                       SUM(fresh_until > ?),
+                       SUM(fresh_until <= ? AND stale_until > ?),
+                       SUM(stale_until <= ?),
+                       SUM(LENGTH(value))
+                FROM catalog_cache
+                GROUP BY namespace
+                ORDER BY namespace
+                """,
+                (now, now, now, now),
+            ).fetchall()
+        return [
+            {"namespace": r[0], "entries": r[1], "fresh": r[2], "stale": r[3], "expired": r[4], "bytes": r[5]}
+            for r in rows
+        ]
+
+    def entries(self, namespace: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Последние обновлённые записи (для просмотра из CLI)"""
+        sql = "SELECT namespace, key, value, fresh_until, stale_until, updated_at FROM catalog_cache"
+        params: list = []
+        if namespace:
+            sql += " WHERE namespace = ?"
+            params.append(namespace)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(limit)
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "namespace": r[0],
+                "key": r[1],
+                "bytes": len(r[2]),
+                "fresh_until": r[3],
+                "stale_until": r[4],
+                "updated_at": r[5],
+            }
+            for r in rows
+        ]
+
+    def close(self):
+        """Дописывает отложенные записи и закрывает файл"""
+        self._reader.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        self.flush()
+        with self._read_lock:
+            self._read_conn.close()
+        with self._lock:
+            self._conn.close()
+
+
+_stores: Dict[str, CatalogStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_catalog_store(path: str) -> CatalogStore:
+    """Общий CatalogStore для файла; при открытии удаляет истёкшие записи"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = CatalogStore(path)
+            purged = store.purge()
+            if purged:
+                logger.info("🧹 Кэш каталога %s: удалено истёкших записей: %s", path, purged)
+            _stores[key] = store
+        return store
+
+
+def close_catalog_stores():
+    """Закрывает все открытые файлы кэша каталога"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+class TieredCache:
+    """
+    TTLCache в памяти поверх CatalogStore
+
+    Интерфейс совпадает с TTLCache; синхронные методы работают только с памятью.
+    Файл читается в load(): перед обращением к кэшу клиент поднимает
+    из файла недостающие в памяти ключи (в потоке, не в event loop) с оставшимся сроком.
+    Запись идёт в оба уровня.
+    """
+
+    def __init__(
+        self,
+        memory: TTLCache,
+        store: CatalogStore,
+        namespace: str,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.memory = memory
+        self.store = store
+        self.namespace = namespace
+        self._clock = clock
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_writes = 0
+        self.disk_errors = 0
+        # Ключи, ждущие чтения из файла в текущем такте, и future этого чтения (см. load)
+        self._load_keys: Dict[str, Hashable] = {}
+        self._load_future: Optional[asyncio.Future] = None
+        self._reads: set = set()
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.memory
+
+    def is_fresh(self, key: Hashable) -> bool:
+        return self.memory.is_fresh(key)
+
+    def lookup(self, key: Hashable) -> CacheLookup:
+        return self.memory.lookup(key)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        return self.memory.peek(key, default)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.memory.get(key, default)
+
+    async def load(self, keys: Iterable[Hashable]):
+        """
+        Поднимает из файла в память ключи, которых в памяти нет
+
+        Если все ключи в памяти, файл не читается. Ключи, запрошенные в одном такте
+        event loop, читаются одним запросом, и все ожидающие продолжают в одном такте —
+        пакетирование запросов книг в GraphQLClient от этого не страдает.
+        """
+        missing = {str(key): key for key in keys if key not in self.memory}
+        if not missing:
+            return
+        if self._load_future is None:
+            loop = asyncio.get_running_loop()
+            self._load_future = loop.create_future()
+            loop.call_soon(self._dispatch_load)
+        self._load_keys.update(missing)
+        await asyncio.shield(self._load_future)
+
+    def _dispatch_load(self):
+        keys, future = self._load_keys, self._load_future
+        self._load_keys, self._load_future = {}, None
+        task = asyncio.ensure_future(self._read(keys, future))
+        self._reads.add(task)
+        task.add_done_callback(self._reads.discard)
+
+    async def _read(self, keys: Dict[str, Hashable], future: asyncio.Future):
+        try:
+            rows = await self.store.aget_many(self.namespace, keys)
+            now = self._clock()
+            for stored_key, key in keys.items():
+                row = rows.get(stored_key)
+                if row is None or now >= row[2]:
+                    self.disk_misses += 1
+                    continue
+                value, fresh_until, stale_until = row
+                # Пока читали файл, значение могло прийти из API — оно новее
+                if key not in self.memory:
+                    self.memory.set(key, value, ttl=fresh_until - now, stale_ttl=stale_until - fresh_until)
+                self.disk_hits += 1
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("⚠️ Не удалось прочитать кэш каталога (%s): %s", self.namespace, e)
+        finally:
+            # Ожидающие продолжают и без файла: промах уйдёт в API
+            if not future.done():
+                future.set_result(None)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.memory.ttl if value else self.memory.negative_ttl
+        if stale_ttl is None:
+            stale_ttl = self.memory.stale_ttl if value else 0
+        self.memory.set(key, value, ttl=ttl, stale_ttl=stale_ttl)
+        if is_fallback(value):
+            # Заглушка при сбое — только в памяти: из файла она вернулась бы обычным пустым ответом
+            return
+        now = self._clock()
+        # Синхронная запись в SQLite блокировала бы event loop — пишем в фоне
+        self.store.put_later(self.namespace, str(key), value, now + ttl, now + ttl + stale_ttl)
+        self.disk_writes += 1
+
+    __setitem__ = set
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self.memory.pop(key, default)
+        try:
+            self.store.delete(self.namespace, str(key))
+        except sqlite3.Error as e:
+            logger.warning("⚠️ Не удалось удалить запись кэша каталога (%s): %s", self.namespace, e)
+        return value
+
+    def clear(self):
+        self.memory.clear()
+        self.store.purge(self.namespace, expired_only=False)
+
+    def purge_expired(self) -> int:
+        return self.memory.purge_expired() + self.store.purge(self.namespace)
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.memory.stats()
+        stats.update(
+            disk_hits=self.disk_hits,
+            disk_misses=self.disk_misses,
+            disk_writes=self.disk_writes,
+            disk_errors=self.disk_errors,
+            disk_write_errors=self.store.write_errors,
+        )
+        return stats
+
+
+def _default_path() -> str:
+    try:
+        from literary_calendar_bot_config import CATALOG_CACHE_PATH
+    except (ImportError, AttributeError):
+        return DEFAULT_CATALOG_CACHE_PATH
+    return CATALOG_CACHE_PATH or DEFAULT_CATALOG_CACHE_PATH
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m clients.catalog_cache", description="Просмотр и очистка кэша каталога"
+    )
+    parser.add_argument("--path", default=None, help="файл кэша (по умолчанию CATALOG_CACHE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="записи по видам запросов")
+    list_parser = commands.add_parser("list", help="последние записи")
+    list_parser.add_argument("--namespace")
+    list_parser.add_argument("--limit", type=int, default=20)
+    purge_parser = commands.add_parser("purge", help="удалить истёкшие (или все) записи")
+    purge_parser.add_argument("--namespace")
+    purge_parser.add_argument("--all", action="store_true", help="удалить и неистёкшие записи")
+    args = parser.parse_args(argv)
+
+    path = args.path or _default_path()
+    if not os.path.exists(path):
+        print(f"Файл кэша не найден: {path}")
+        return 1
+    store = CatalogStore(path)
+    try:
+        if args.command == "stats":
+            rows = store.stats()
+            if not rows:
+                print("Кэш пуст")
+            for r in rows:
+                print(
+                    f"{r['namespace']:<20} записей: {r['entries']:>6}  свежих: {r['fresh']:>6}  "
+                    f"устаревших: {r['stale']:>6}  истёкших: {r['expired']:>6}  {r['bytes'] / 1024:.1f} КБ"
+                )
+        elif args.command == "list":
+            for r in store.entries(args.namespace, args.limit):
+                print(
+                    f"{r['namespace']:<20} {r['key']:<40} {r['bytes']:>7} Б  "
+                    f"обновлено {_format_time(r['updated_at'])}  свежо до {_format_time(r['fresh_until'])}"
+                )
+        elif args.command == "purge":
+            deleted = store.purge(args.namespace, expired_only=not args.all)
+            print(f"Удалено записей: {deleted}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,40 +1,450 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import re
-from typing import Dict, List, Optional
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
+from clients.cache import FallbackDict, FallbackList, TTLCache, make_catalog_cache
+from clients.limiter import AdaptiveLimiter, make_adaptive_limiter, percentile
+from clients.resilience import (
+    CatalogUnavailableError,
+    CircuitBreaker,
+    RetryPolicy,
+    make_circuit_breaker,
+    make_retry_policy,
+    parse_retry_after,
+)
+from time_utils import Deadline
+
+try:
+    import h2  # noqa: F401  (нужен httpx для HTTP/2)
+
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
 logger = logging.getLogger(__name__)
 
 
+BOOK_FIELDS = """
+            uuid
+            name
+            slug
+            annotation
+            image {
+              url
+            }
+"""
+
+# Выборки для пакетного документа (GraphQLBatchQuery); переменные в них
+# переименовываются под алиас, поэтому каждую выборку можно добавить много раз.
+# Поля совпадают с одиночными запросами get_books_by_* ниже.
+BOOKS_BY_AUTHOR_SELECTION = (
+    "books(body: { authors: [$authorUuid] isActive: true limit: 10 }) {" + BOOK_FIELDS + "}"
+)
+BOOKS_BY_UUIDS_SELECTION = (
+    "books(body: { uuids: $bookUuids isActive: true limit: $limit }) {" + BOOK_FIELDS + "}"
+)
+BOOKS_BY_TAG_SELECTION = """tags(body: { slugs: [$tagSlug] }) {
+            uuid
+            name
+            books(limit: 6) { uuid name slug image { url } }
+          }"""
+BOOKS_BY_CATEGORY_SELECTION = """category(body: { uuid: $categoryUuid }) {
+            uuid
+            name
+            books(limit: 6) { uuid name slug image { url } }
+          }"""
+
+
+class GraphQLBatchQuery:
+    """
+    Собирает несколько выборок в один GraphQL-документ через алиасы полей
+
+    Каждая добавленная выборка получает алиас q0, q1, ...; её переменные
+    переименовываются в q0_authorUuid и т.п., чтобы не конфликтовать.
+    Ответ раскладывается обратно по ключам через split().
+    """
+
+    _VARIABLE_RE = re.compile(r"\$(\w+)")
+
+    def __init__(self, operation_name: str = "Batch"):
+        self.operation_name = operation_name
+        self.variables: Dict[str, Any] = {}
+        self._selections: List[str] = []
+        self._variable_definitions: List[str] = []
+        self._keys: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._selections)
+
+    def add(self, key: Any, selection: str, variables: Dict[str, Tuple[str, Any]]) -> str:
+        """
+        Добавляет выборку
+
+        Args:
+            key: Ключ, по которому результат вернётся из split()
+            selection: Выборка с переменными вида $name (например, BOOKS_BY_AUTHOR_SELECTION)
+            variables: {name: (GraphQL-тип, значение)}
+
+        Returns:
+            Алиас выборки
+        """
+        alias = f"q{len(self._selections)}"
+        for name, (graphql_type, value) in variables.items():
+            self._variable_definitions.append(f"${alias}_{name}: {graphql_type}")
+            self.variables[f"{alias}_{name}"] = value
+        renamed = self._VARIABLE_RE.sub(lambda m: f"${alias}_{m.group(1)}", selection)
+        self._selections.append(f"{alias}: {renamed}")
+        self._keys[alias] = key
+        return alias
+
+    def render(self) -> str:
+        """Текст GraphQL-документа"""
+        definitions = ", ".join(self._variable_definitions)
+        header = f"query {self.operation_name}({definitions})" if definitions else f"query {self.operation_name}"
+        body = "\n          ".join(self._selections)
+        return f"{header} {{\n          {body}\n        }}"
+
+    def split(self, data: Optional[Dict]) -> Dict[Any, Any]:
+        """Раскладывает data ответа по ключам; выборки без данных (ошибка/null) пропускаются"""
+        data = data or {}
+        return {key: data[alias] for alias, key in self._keys.items() if data.get(alias) is not None}
+
+
+def make_http_client(max_connections: int) -> httpx.AsyncClient:
+    """
+    httpx-клиент для каталога: пул соединений по верхнему лимиту параллелизма и keep-alive
+
+    HTTP/2 (CATALOG_HTTP2=1) включается, только если установлен пакет h2.
+    """
+    try:
+        from literary_calendar_bot_config import CATALOG_HTTP2, CATALOG_KEEPALIVE
+    except (ImportError, AttributeError):
+        CATALOG_HTTP2, CATALOG_KEEPALIVE = False, 30.0
+    http2 = CATALOG_HTTP2 and HAS_H2
+    if CATALOG_HTTP2 and not HAS_H2:
+        logger.warning("⚠️ CATALOG_HTTP2 включён, но пакет h2 не установлен — используется HTTP/1.1")
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=CATALOG_KEEPALIVE,
+        ),
+        http2=http2,
+        headers={"Content-Type": "application/json"},
+    )
+
+
 class GraphQLClient:
-    def __init__(self, endpoint: str):
+    def __init__(
+        self,
+        endpoint: str,
+        books_batch_size: int = 50,
+        cache_factory: Optional[Callable[[str], TTLCache]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        hedge_budget: Optional[float] = None,
+    ):
+        """
+        Args:
+            endpoint: URL GraphQL API
+            books_batch_size: Сколько UUID отправлять в одном запросе книг
+            cache_factory: Фабрика кэшей ответов по имени операции
+                (по умолчанию make_catalog_cache — TTL/LRU из конфига, опционально с SQLite-файлом)
+            retry_policy: Повторы при сетевых ошибках, 429 и 5xx (по умолчанию из конфига)
+            circuit_breaker: Быстрый отказ при недоступном API (по умолчанию из конфига)
+            limiter: Адаптивный лимит одновременных запросов (по умолчанию из конфига)
+            hedge_budget: Доля дублирующих (hedged) запросов от основных, 0 — без дублирования
+                (по умолчанию CATALOG_HEDGE_BUDGET из конфига)
+        """
         self.endpoint = endpoint
-        self._api_sem = asyncio.Semaphore(5)
-        self._http = httpx.AsyncClient(
-            timeout=30.0,
-            headers={"Content-Type": "application/json"},
-        )
-
-        self._cache_books_by_author: dict[str, List[Dict]] = {}
-        self._cache_book_by_uuid: dict[str, Dict] = {}
-        self._cache_books_by_tag: dict[str, List[Dict]] = {}
-        self._cache_books_by_category: dict[str, List[Dict]] = {}
+        # Сколько UUID отправлять в одном запросе books(body: {uuids: [...]})
+        self.books_batch_size = books_batch_size
+        self.limiter = limiter or make_adaptive_limiter()
+        self.retry_policy = retry_policy or make_retry_policy()
+        self.circuit_breaker = circuit_breaker or make_circuit_breaker()
+        self._http = make_http_client(self.limiter.max_limit)
+
+        # Hedging: если запрос не ответил за p90, отправляем дубль и берём первый ответ
+        if hedge_budget is None:
+            try:
+                from literary_calendar_bot_config import CATALOG_HEDGE_BUDGET
+
+                hedge_budget = CATALOG_HEDGE_BUDGET
+            except (ImportError, AttributeError):
+                hedge_budget = 0.0
+        self.hedge_budget = hedge_budget
+        self.hedge_quantile = 0.9
+        self.hedge_min_samples = 20
+        # Задержки основных запросов; отменённый после победы дубля учитывается временем до отмены,
+        # иначе хвост пропадает из окна и порог дублирования сползает вниз
+        self._primary_latencies: deque = deque(maxlen=200)
+        self._primary_requests = 0
+        self._hedges_sent = 0
+        self._hedges_won = 0
+
+        cache_factory = cache_factory or make_catalog_cache
+        self._cache_books_by_author = cache_factory("books_by_author")
+        self._cache_book_by_uuid = cache_factory("book_by_uuid")
+        self._cache_books_by_tag = cache_factory("books_by_tag")
+        self._cache_books_by_category = cache_factory("books_by_category")
+        # Фоновые задачи: обновление устаревших записей, запросы, пережившие deadline
+        # (держим ссылки, чтобы задачи не собрал GC)
+        self._background: set = set()
+        self.deadline_misses = 0
+
+        # Dataloader для книг по UUID: запросы одного такта event loop собираются в один POST.
+        # _book_futures держит и ожидающие отправки, и уже летящие UUID — повторный запрос
+        # того же UUID ждёт существующий future.
+        self._book_futures: dict[str, asyncio.Future] = {}
+        self._pending_book_uuids: List[str] = []
+        self._book_batch_scheduled = False
+        # UUID, последний запрос которых не получил ответа API (сбой, а не «книги нет»)
+        self._failed_book_uuids: set = set()
+
+        # Single-flight: одинаковые запросы (операция + переменные) в полёте ждут одну задачу
+        self._inflight: dict[Tuple[str, str], asyncio.Task] = {}
+        self._flight_calls: Counter = Counter()
+        self._flight_coalesced: Counter = Counter()
 
     async def aclose(self):
         await self._http.aclose()
 
     async def post(self, query: str, variables: dict) -> httpx.Response:
-        async with self._api_sem:
-            return await self._http.post(self.endpoint, json={"query": query, "variables": variables})
+        """
+        POST GraphQL-запроса с повторами по retry_policy
+
+        Повторяются только сетевые ошибки/таймауты и ответы 429/5xx (с учётом Retry-After);
+        остальные ответы возвращаются как есть. При разомкнутом circuit breaker
+        сразу бросает CatalogUnavailableError.
+        """
+        self.circuit_breaker.before_call()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self._send_hedged(query, variables)
+            except Exception as e:
+                if not self.retry_policy.is_retryable_error(e):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                if delay is None:
+                    self.circuit_breaker.record_failure()
+                    raise
+                reason = type(e).__name__
+            else:
+                if not self.retry_policy.is_retryable_status(response.status_code):
+                    self.circuit_breaker.record_success()
+                    return response
+                delay = self.retry_policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                if delay is None:
+                    self.circuit_breaker.record_failure()
+                    return response
+                reason = f"HTTP {response.status_code}"
+
+            logger.warning(
+                "🔁 Запрос к API каталога не удался (%s), попытка %s через %.2f с", reason, attempt + 1, delay
+            )
+            await asyncio.sleep(delay)
+
+    async def _send(self, query: str, variables: dict) -> httpx.Response:
+        """Один HTTP-запрос в пределах адаптивного лимита; результат учитывается лимитером"""
+        await self.limiter.acquire()
+        started = time.monotonic()
+        outcome = AdaptiveLimiter.DROPPED
+        try:
+            response = await self._http.post(self.endpoint, json={"query": query, "variables": variables})
+            overload = self.retry_policy.is_retryable_status(response.status_code)
+            outcome = AdaptiveLimiter.OVERLOAD if overload else AdaptiveLimiter.OK
+            return response
+        except Exception as e:
+            if self.retry_policy.is_retryable_error(e):
+                outcome = AdaptiveLimiter.OVERLOAD
+            raise
+        finally:
+            await self.limiter.release(time.monotonic() - started, outcome)
+
+    async def _send_hedged(self, query: str, variables: dict) -> httpx.Response:
+        """
+        _send с дублированием медленного запроса
+
+        Если ответа нет дольше наблюдаемого p90 и бюджет (hedge_budget от числа
+        основных запросов) не исчерпан, уходит второй такой же запрос; берётся первый
+        успешный ответ, второй отменяется. Только для чтения (query), не для mutation.
+        """
+        self._primary_requests += 1
+        delay = self._hedge_delay(query)
+        if delay is None:
+            started = time.monotonic()
+            try:
+                return await self._send(query, variables)
+            finally:
+                self._primary_latencies.append(time.monotonic() - started)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._send(query, variables))
+        primary.add_done_callback(lambda _: self._primary_latencies.append(time.monotonic() - started))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self._hedges_sent + 1 > self.hedge_budget * self._primary_requests:
+                return await primary
+
+            self._hedges_sent += 1
+            hedge = asyncio.ensure_future(self._send(query, variables))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Если оба завершились одновременно, предпочитаем основной
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedges_won += 1
+                        return task.result()
+            # Оба запроса упали — отдаём ошибку основного (её разберёт post и решит про повтор)
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_delay(self, query: str) -> Optional[float]:
+        """Через сколько секунд дублировать запрос; None — не дублировать"""
+        if self.hedge_budget <= 0 or query.lstrip().startswith("mutation"):
+            return None
+        # Дольше p90 отвечают ~10% запросов; при бюджете меньше 10% дублируем позже (p(1 - бюджет)),
+        # иначе бюджет уходит на запросы чуть медленнее p90, а до настоящего хвоста не доходит
+        quantile = max(self.hedge_quantile, 1.0 - self.hedge_budget)
+        return percentile(self._primary_latencies, quantile, min_samples=self.hedge_min_samples)
+
+    def hedging_stats(self) -> Dict[str, Any]:
+        """Основные запросы, отправленные дубли и сколько раз дубль ответил первым"""
+        return {
+            "requests": self._primary_requests,
+            "hedges_sent": self._hedges_sent,
+            "hedges_won": self._hedges_won,
+            "hedge_delay": self._hedge_delay("query"),
+        }
+
+    async def _single_flight(self, operation: str, variables: dict, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет factory() один раз на все одновременные вызовы с теми же operation и variables
+
+        Общая задача защищена shield: отмена одного ожидающего не отменяет запрос для остальных.
+        """
+        key = (operation, json.dumps(variables, sort_keys=True, ensure_ascii=False))
+        self._flight_calls[operation] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(
+                lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None
+            )
+        else:
+            self._flight_coalesced[operation] += 1
+        return await asyncio.shield(task)
+
+    async def _cached(
+        self,
+        cache: TTLCache,
+        key: str,
+        operation: str,
+        variables: dict,
+        factory: Callable[[], Awaitable[Any]],
+        deadline: Optional[Deadline] = None,
+        default: Any = None,
+    ) -> Any:
+        """
+        Ответ из кэша или через single-flight запрос
+
+        Устаревшая запись отдаётся сразу, а обновляется в фоне.
+        При промахе ждём не дольше deadline, иначе возвращаем default.
+        """
+        await cache.load([key])
+        cached = cache.lookup(key)
+        if not cached.hit:
+            return await self._within(self._single_flight(operation, variables, factory), deadline, default)
+        if cached.stale:
+            self._spawn(self._single_flight(operation, variables, factory))
+        return cached.value
+
+    def _spawn(self, awaitable: Awaitable[Any]) -> asyncio.Future:
+        task = asyncio.ensure_future(awaitable)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _within(self, awaitable: Awaitable[Any], deadline: Optional[Deadline], default: Any) -> Any:
+        """
+        Результат awaitable, если он успел до deadline, иначе default
+
+        Сам запрос по истечении бюджета не отменяется: он завершится в фоне
+        и заполнит кэш для следующих команд.
+        """
+        if deadline is None:
+            return await awaitable
+        task = self._spawn(awaitable)
+        done, _ = await asyncio.wait({task}, timeout=deadline.remaining())
+        if task in done:
+            return task.result()
+        self.deadline_misses += 1
+        return default
+
+    @staticmethod
+    def _cache_failure(cache: TTLCache, key: str) -> List[Dict]:
+        """
+        Результат при сбое API: устаревшая запись, если она ещё есть, иначе []
+
+        Пустой ответ кэшируется только на negative_ttl, чтобы не повторять запрос
+        к недоступному API на каждое сообщение, но и не закреплять его надолго.
+        Результат — FallbackList: вызывающий код отличает его от настоящего ответа (is_fallback).
+        """
+        cached = cache.peek(key)
+        if cached:
+            return FallbackList(cached)
+        empty = FallbackList()
+        cache.set(key, empty)
+        return empty
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Статистика кэшей каталога: размер, попадания, промахи, вытеснения"""
+        return {
+            "books_by_author": self._cache_books_by_author.stats(),
+            "book_by_uuid": self._cache_book_by_uuid.stats(),
+            "books_by_tag": self._cache_books_by_tag.stats(),
+            "books_by_category": self._cache_books_by_category.stats(),
+        }
+
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счётчики single-flight по операциям: {операция: {"calls": ..., "coalesced": ...}}"""
+        return {
+            operation: {"calls": calls, "coalesced": self._flight_coalesced[operation]}
+            for operation, calls in sorted(self._flight_calls.items())
+        }
 
-    async def get_books_by_author(self, author_uuid: str) -> List[Dict]:
-        if author_uuid in self._cache_books_by_author:
-            return self._cache_books_by_author[author_uuid]
+    async def get_books_by_author(self, author_uuid: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return await self._cached(
+            self._cache_books_by_author,
+            author_uuid,
+            "books_by_author",
+            {"authorUuid": author_uuid},
+            lambda: self._fetch_books_by_author(author_uuid),
+            deadline,
+            [],
+        )
 
+    async def _fetch_books_by_author(self, author_uuid: str) -> List[Dict]:
         query = """
         query GetBooksByAuthor($authorUuid: String!) {
           books(body: {
@@ -54,48 +464,42 @@ class GraphQLClient:
         """
         variables = {"authorUuid": author_uuid}
 
-        max_retries = 4
-        retry_delay = 3.0
-
-        for attempt in range(max_retries):
-            try:
-                response = await self.post(query, variables)
-                if response.status_code != 200:
-                    logger.error(
-                        "❌ [get_books_by_author] Ошибка API (code %s) для автора %s",
-                        response.status_code,
-                        author_uuid,
-                    )
-                    self._cache_books_by_author[author_uuid] = []
-                    return []
-
-                data = response.json()
-                if "errors" in data:
-                    logger.warning("⚠️ [get_books_by_author] GraphQL ошибки: %s", data["errors"])
-
-                books = (((data or {}).get("data") or {}).get("books")) or []
-                if books:
-                    self._cache_books_by_author[author_uuid] = books
-                    return books
-
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    continue
+        # Повторы при сбоях делает post(); пустой список — нормальный ответ (у автора нет книг)
+        try:
+            response = await self.post(query, variables)
+            if response.status_code != 200:
+                logger.error(
+                    "❌ [get_books_by_author] Ошибка API (code %s) для автора %s",
+                    response.status_code,
+                    author_uuid,
+                )
+                return self._cache_failure(self._cache_books_by_author, author_uuid)
 
-                self._cache_books_by_author[author_uuid] = []
-                return []
-            except Exception as e:
-                logger.error("Ошибка запроса к API (попытка %s): %s", attempt + 1, e, exc_info=True)
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                    continue
-                self._cache_books_by_author[author_uuid] = []
-                return []
+            data = response.json()
+            if "errors" in data:
+                logger.warning("⚠️ [get_books_by_author] GraphQL ошибки: %s", data["errors"])
 
-        self._cache_books_by_author[author_uuid] = []
-        return []
+            books = (((data or {}).get("data") or {}).get("books")) or []
+            self._cache_books_by_author[author_uuid] = books
+            return books
+        except CatalogUnavailableError:
+            logger.debug("[get_books_by_author] API недоступно, автор %s без книг", author_uuid)
+        except Exception as e:
+            logger.error("Ошибка запроса к API: %s", e, exc_info=True)
+        return self._cache_failure(self._cache_books_by_author, author_uuid)
+
+    async def get_books_by_author_slug(self, author_slug: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return await self._within(
+            self._single_flight(
+                "books_by_author_slug",
+                {"authorSlug": author_slug},
+                lambda: self._fetch_books_by_author_slug(author_slug),
+            ),
+            deadline,
+            [],
+        )
 
-    async def get_books_by_author_slug(self, author_slug: str) -> List[Dict]:
+    async def _fetch_books_by_author_slug(self, author_slug: str) -> List[Dict]:
         query = """
         query GetBooksByAuthorSlug($authorSlug: String!) {
           books(body: {
@@ -125,44 +529,247 @@ class GraphQLClient:
             logger.error("Ошибка запроса к API по author_slug: %s", e)
         return []
 
-    async def get_book_by_uuid(self, book_uuid: str) -> Optional[Dict]:
-        if book_uuid in self._cache_book_by_uuid:
-            return self._cache_book_by_uuid[book_uuid]
+    async def get_book_by_uuid(self, book_uuid: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        await self._cache_book_by_uuid.load([book_uuid])
+        cached = self._cache_book_by_uuid.lookup(book_uuid)
+        if cached.hit:
+            if cached.stale:
+                self._load_book(book_uuid)
+            return cached.value
+        return await self._within(asyncio.shield(self._load_book(book_uuid)), deadline, None)
+
+    async def get_books_by_uuids(
+        self, book_uuids: List[str], deadline: Optional[Deadline] = None
+    ) -> Dict[str, Optional[Dict]]:
+        """
+        Книги по списку UUID: {uuid: книга или None}
 
-        query = """
-        query GetBookByUuid($bookUuid: String!) {
-          books(body: {
-            uuids: [$bookUuid]
+        Все UUID, запрошенные в одном такте event loop (в том числе параллельными
+        вызовами get_book_by_uuid), уходят одним запросом (с разбиением по books_batch_size).
+        Книги, не успевшие к deadline, возвращаются как None (и попадут в кэш позже).
+        Если на часть UUID API не ответило (сбой), результат — FallbackDict.
+        """
+        unique_uuids = list(dict.fromkeys(u for u in book_uuids if u))
+        result: Dict[str, Optional[Dict]] = {}
+        futures: Dict[str, asyncio.Future] = {}
+        await self._cache_book_by_uuid.load(unique_uuids)
+        for book_uuid in unique_uuids:
+            cached = self._cache_book_by_uuid.lookup(book_uuid)
+            if cached.hit:
+                result[book_uuid] = cached.value
+                if cached.stale:
+                    self._load_book(book_uuid)
+            else:
+                futures[book_uuid] = self._load_book(book_uuid)
+        if futures:
+            timeout = deadline.remaining() if deadline is not None else None
+            done, pending = await asyncio.wait(set(futures.values()), timeout=timeout)
+            if pending:
+                self.deadline_misses += 1
+            for book_uuid, future in futures.items():
+                if future in done:
+                    result[book_uuid] = future.result()
+        books = {book_uuid: result.get(book_uuid) for book_uuid in unique_uuids}
+        if any(books[book_uuid] is None and book_uuid in self._failed_book_uuids for book_uuid in futures):
+            return FallbackDict(books)
+        return books
+
+    def _load_book(self, book_uuid: str) -> asyncio.Future:
+        """
+        Future книги по UUID
+
+        Если UUID уже ждёт отправки или в полёте, возвращается тот же future;
+        иначе UUID ставится в текущую пачку, которая уходит в конце такта event loop.
+        """
+        self._flight_calls["book_by_uuid"] += 1
+        future = self._book_futures.get(book_uuid)
+        if future is not None:
+            self._flight_coalesced["book_by_uuid"] += 1
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._book_futures[book_uuid] = future
+        self._pending_book_uuids.append(book_uuid)
+        if not self._book_batch_scheduled:
+            self._book_batch_scheduled = True
+            loop.call_soon(self._dispatch_book_batch)
+        return future
+
+    def _dispatch_book_batch(self):
+        uuids = self._pending_book_uuids
+        self._pending_book_uuids = []
+        self._book_batch_scheduled = False
+
+        for start in range(0, len(uuids), self.books_batch_size):
+            chunk = uuids[start:start + self.books_batch_size]
+            self._spawn(self._fetch_book_batch(chunk))
+
+    async def _fetch_book_batch(self, book_uuids: List[str]):
+        query = f"""
+        query GetBooksByUuids($bookUuids: [String!]!, $limit: Int!) {{
+          books(body: {{
+            uuids: $bookUuids
             isActive: true
-            limit: 1
-          }) {
-            uuid
-            name
-            slug
-            annotation
-            image {
-              url
-            }
-          }
-        }
+            limit: $limit
+          }}) {{{BOOK_FIELDS}          }}
+        }}
         """
-        variables = {"bookUuid": book_uuid}
+        variables = {"bookUuids": book_uuids, "limit": len(book_uuids)}
 
+        found: dict[str, Dict] = {}
+        answered = False
         try:
             response = await self.post(query, variables)
             if response.status_code != 200:
-                logger.warning("⚠️ [get_book_by_uuid] Ошибка API (code %s) для книги %s", response.status_code, book_uuid)
-                return None
-            data = response.json()
-            books = (((data or {}).get("data") or {}).get("books")) or []
-            if books:
-                self._cache_book_by_uuid[book_uuid] = books[0]
-                return books[0]
+                logger.warning(
+                    "⚠️ [get_books_by_uuids] Ошибка API (code %s) для %s книг", response.status_code, len(book_uuids)
+                )
+            else:
+                data = response.json()
+                answered = "errors" not in (data or {})
+                for book in (((data or {}).get("data") or {}).get("books")) or []:
+                    if book and book.get("uuid"):
+                        found[book["uuid"]] = book
         except Exception as e:
-            logger.warning("⚠️ [get_book_by_uuid] Ошибка запроса к API для книги %s: %s", book_uuid, e)
-        return None
+            logger.warning("⚠️ [get_books_by_uuids] Ошибка запроса к API для %s книг: %s", len(book_uuids), e)
+        finally:
+            # Освобождаем ожидающих даже при отмене, иначе UUID навсегда останется «в полёте»
+            for book_uuid in book_uuids:
+                book = found.get(book_uuid)
+                if book or answered:
+                    # Отсутствующую в ответе книгу запоминаем как None на negative_ttl
+                    self._cache_book_by_uuid[book_uuid] = book
+                    self._failed_book_uuids.discard(book_uuid)
+                else:
+                    self._failed_book_uuids.add(book_uuid)
+                future = self._book_futures.pop(book_uuid, None)
+                if future is not None and not future.done():
+                    future.set_result(book)
+
+    async def prefetch_for_events(
+        self, events: Iterable[Dict], max_selections: int = 40, deadline: Optional[Deadline] = None
+    ) -> int:
+        """
+        Заполняет кэши книгами для всех ссылок набора событий одним запросом
+
+        Авторы, теги, категории и книги без обложки, которых ещё нет в кэше,
+        собираются в один GraphQL-документ с алиасами (при большом числе
+        выборок — в несколько, по max_selections). После этого
+        get_books_by_* для этих событий отвечают из кэша.
+        По истечении deadline ожидание прекращается, а запрос дозаполняет кэш в фоне.
+
+        Returns:
+            Количество выполненных HTTP-запросов (0, если не дождались)
+        """
+        return await self._within(self._prefetch_for_events(list(events), max_selections), deadline, 0)
+
+    async def _prefetch_for_events(self, events: List[Dict], max_selections: int) -> int:
+        # Сначала поднимаем из файлового кэша всё, что там есть (одним чтением на вид запроса, не в event loop)
+        await asyncio.gather(
+            self._cache_books_by_author.load(
+                ref["uuid"] for event in events for ref in event.get("author_refs", []) if ref.get("uuid")
+            ),
+            self._cache_books_by_tag.load(
+                ref["uuid"] for event in events for ref in event.get("tag_refs", []) if ref.get("uuid")
+            ),
+            self._cache_books_by_category.load(
+                ref["uuid"] for event in events for ref in event.get("category_refs", []) if ref.get("uuid")
+            ),
+            self._cache_book_by_uuid.load(
+                ref["uuid"]
+                for event in events
+                for ref in event.get("book_references", [])
+                if ref.get("uuid") and not ref.get("cover_url")
+            ),
+        )
+        lookups: Dict[Tuple[str, Any], Tuple[str, Dict[str, Tuple[str, Any]]]] = {}
+        book_uuids: List[str] = []
+        for event in events:
+            for ref in event.get("author_refs", []):
+                au_uuid = ref.get("uuid")
+                if au_uuid and not self._cache_books_by_author.is_fresh(au_uuid):
+                    lookups[("author", au_uuid)] = (
+                        BOOKS_BY_AUTHOR_SELECTION,
+                        {"authorUuid": ("String!", au_uuid)},
+                    )
+            for ref in event.get("tag_refs", []):
+                tag = ref.get("uuid")
+                if tag and not self._cache_books_by_tag.is_fresh(tag):
+                    lookups[("tag", tag)] = (BOOKS_BY_TAG_SELECTION, {"tagSlug": ("String!", tag)})
+            for ref in event.get("category_refs", []):
+                cat_uuid = ref.get("uuid")
+                if cat_uuid and not self._cache_books_by_category.is_fresh(cat_uuid):
+                    lookups[("category", cat_uuid)] = (
+                        BOOKS_BY_CATEGORY_SELECTION,
+                        {"categoryUuid": ("String!", cat_uuid)},
+                    )
+            for ref in event.get("book_references", []):
+                book_uuid = ref.get("uuid")
+                if book_uuid and not ref.get("cover_url") and not self._cache_book_by_uuid.is_fresh(book_uuid):
+                    book_uuids.append(book_uuid)
+
+        book_uuids = list(dict.fromkeys(book_uuids))
+        for start in range(0, len(book_uuids), self.books_batch_size):
+            chunk = book_uuids[start:start + self.books_batch_size]
+            lookups[("books", tuple(chunk))] = (
+                BOOKS_BY_UUIDS_SELECTION,
+                {"bookUuids": ("[String!]!", chunk), "limit": ("Int!", len(chunk))},
+            )
+
+        items = list(lookups.items())
+        requests_made = 0
+        for start in range(0, len(items), max_selections):
+            batch = GraphQLBatchQuery("PrefetchCatalog")
+            for key, (selection, variables) in items[start:start + max_selections]:
+                batch.add(key, selection, variables)
+            requests_made += 1
+            try:
+                response = await self.post(batch.render(), batch.variables)
+                if response.status_code != 200:
+                    logger.warning("⚠️ [prefetch_for_events] Ошибка API (code %s)", response.status_code)
+                    continue
+                data = response.json() or {}
+                if "errors" in data:
+                    logger.warning("⚠️ [prefetch_for_events] GraphQL ошибки: %s", data["errors"])
+                self._store_prefetched(batch.split(data.get("data")))
+            except Exception as e:
+                logger.warning("⚠️ [prefetch_for_events] Ошибка пакетного запроса: %s", e)
+
+        if items:
+            logger.info(
+                "📦 [prefetch_for_events] %s выборок каталога за %s запрос(ов)", len(items), requests_made
+            )
+        return requests_made
+
+    def _store_prefetched(self, results: Dict[Tuple[str, Any], Any]):
+        """Раскладывает результаты пакетного запроса по кэшам get_books_by_*"""
+        for (kind, key), value in results.items():
+            if kind == "author":
+                self._cache_books_by_author[key] = value or []
+            elif kind == "tag":
+                self._cache_books_by_tag[key] = (value[0].get("books") if value else None) or []
+            elif kind == "category":
+                self._cache_books_by_category[key] = value.get("books") or []
+            elif kind == "books":
+                found = {book["uuid"]: book for book in value if book and book.get("uuid")}
+                for book_uuid in key:
+                    self._cache_book_by_uuid[book_uuid] = found.get(book_uuid)
+
+    async def search_books_by_title(
+        self, title: str, author_name: str | None = None, deadline: Optional[Deadline] = None
+    ) -> List[Dict]:
+        return await self._within(
+            self._single_flight(
+                "search_books",
+                {"title": title, "author": author_name},
+                lambda: self._fetch_books_by_title(title, author_name),
+            ),
+            deadline,
+            [],
+        )
 
-    async def search_books_by_title(self, title: str, author_name: str | None = None) -> List[Dict]:
+    async def _fetch_books_by_title(self, title: str, author_name: str | None) -> List[Dict]:
         clean_title = re.sub(r'[«»""„‟]', "", title).strip()
 
         query = """
@@ -203,10 +810,18 @@ class GraphQLClient:
             logger.error("Ошибка запроса поиска книг: %s", e)
         return []
 
-    async def get_books_by_tag(self, tag: str) -> List[Dict]:
-        if tag in self._cache_books_by_tag:
-            return self._cache_books_by_tag[tag]
+    async def get_books_by_tag(self, tag: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return await self._cached(
+            self._cache_books_by_tag,
+            tag,
+            "books_by_tag",
+            {"tagSlug": tag},
+            lambda: self._fetch_books_by_tag(tag),
+            deadline,
+            [],
+        )
 
+    async def _fetch_books_by_tag(self, tag: str) -> List[Dict]:
         query = """
         query GetBooksByTag($tagSlug: String!) {
           tags(body: {
@@ -238,13 +853,20 @@ class GraphQLClient:
         except Exception as e:
             logger.error("Ошибка запроса к API по тегу: %s", e)
 
-        self._cache_books_by_tag[tag] = []
-        return []
-
-    async def get_books_by_category(self, category_uuid: str) -> List[Dict]:
-        if category_uuid in self._cache_books_by_category:
-            return self._cache_books_by_category[category_uuid]
+        return self._cache_failure(self._cache_books_by_tag, tag)
+
+    async def get_books_by_category(self, category_uuid: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        return await self._cached(
+            self._cache_books_by_category,
+            category_uuid,
+            "books_by_category",
+            {"categoryUuid": category_uuid},
+            lambda: self._fetch_books_by_category(category_uuid),
+            deadline,
+            [],
+        )
 
+    async def _fetch_books_by_category(self, category_uuid: str) -> List[Dict]:
         query = """
         query GetBooksByCategory($categoryUuid: String!) {
           category(body: { uuid: $categoryUuid }) {
@@ -274,6 +896,5 @@ class GraphQLClient:
         except Exception as e:
             logger.error("Ошибка запроса к API по категории: %s", e)
 
-        self._cache_books_by_category[category_uuid] = []
-        return []
+        return self._cache_failure(self._cache_books_by_category, category_uuid)
 
@@ -0,0 +1,170 @@
+"""
+Адаптивный лимит одновременных запросов к каталогу (AIMD)
+
+Лимит пересматривается раз в «раунд» — после стольких завершённых запросов,
+каков текущий лимит:
+- были перегрузки (таймауты, сетевые ошибки, 429/5xx) или p95 выше цели —
+  лимит умножается на backoff (мультипликативное уменьшение);
+- всё в норме и лимит в раунде был выбран полностью — лимит +1 (аддитивный рост).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: Iterable[float], q: float, min_samples: int = 1) -> Optional[float]:
+    """Перцентиль (q от 0 до 1) по nearest-rank; None, если значений меньше min_samples"""
+    ordered = sorted(values)
+    if len(ordered) < max(1, min_samples):
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(math.ceil(len(ordered) * q)) - 1))]
+
+
+class AdaptiveLimiter:
+    OK = "ok"
+    OVERLOAD = "overload"
+    DROPPED = "dropped"
+
+    def __init__(
+        self,
+        initial: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target: float = 2.0,
+        max_error_rate: float = 0.05,
+        backoff: float = 0.5,
+        window: int = 100,
+    ):
+        """
+        Args:
+            initial: Начальный лимит
+            min_limit: Нижняя граница лимита
+            max_limit: Верхняя граница (и размер пула соединений httpx)
+            latency_target: Допустимый p95 задержки ответа, сек
+            max_error_rate: Допустимая доля перегрузок в окне
+            backoff: Множитель при уменьшении лимита
+            window: Сколько последних запросов учитывать в p95 и доле ошибок
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.backoff = backoff
+        self.in_flight = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._condition: Optional[asyncio.Condition] = None
+        self._round_done = 0
+        self._round_overloads = 0
+        self._round_saturated = False
+        self.increases = 0
+        self.decreases = 0
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """Ждёт свободного места в пределах текущего лимита"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self._round_saturated = True
+
+    async def release(self, latency: float, outcome: str):
+        """
+        Освобождает место и учитывает результат запроса
+
+        Args:
+            latency: Длительность запроса, сек
+            outcome: OK, OVERLOAD (таймаут/сеть/429/5xx) или DROPPED (отменён — не учитывается)
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            if outcome != self.DROPPED:
+                self._record(latency, outcome == self.OVERLOAD)
+            condition.notify_all()
+
+    def _record(self, latency: float, overload: bool):
+        self._outcomes.append(overload)
+        if not overload:
+            self._latencies.append(latency)
+        self._round_done += 1
+        self._round_overloads += overload
+        if overload and self._round_overloads == 1:
+            # Перегрузку не ждём до конца раунда — снижаем сразу (но не чаще раза за раунд)
+            self._decrease("перегрузка API")
+            return
+        if self._round_done < self.limit:
+            return
+
+        p95 = self.p95()
+        if not self._round_overloads:
+            if p95 is not None and p95 > self.latency_target:
+                self._decrease(f"p95 {p95:.2f} с выше цели")
+            elif self._round_saturated and self.error_rate() <= self.max_error_rate and self.limit < self.max_limit:
+                self.limit += 1
+                self.increases += 1
+        self._start_round()
+
+    def _decrease(self, reason: str):
+        new_limit = max(self.min_limit, int(math.floor(self.limit * self.backoff)))
+        if new_limit < self.limit:
+            logger.info("📉 Лимит запросов к каталогу %s → %s (%s)", self.limit, new_limit, reason)
+            self.limit = new_limit
+            self.decreases += 1
+        self._start_round()
+        # Раунд начинается с уже учтённой перегрузкой, чтобы не снижать лимит повторно от того же всплеска
+        self._round_overloads = 1
+
+    def _start_round(self):
+        self._round_done = 0
+        self._round_overloads = 0
+        self._round_saturated = self.in_flight >= self.limit
+
+    def p95(self) -> Optional[float]:
+        return percentile(self._latencies, 0.95)
+
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "p95": self.p95(),
+            "error_rate": round(self.error_rate(), 3),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+def make_adaptive_limiter() -> AdaptiveLimiter:
+    """AdaptiveLimiter с параметрами из конфига (CATALOG_CONCURRENCY_*, CATALOG_LATENCY_TARGET)"""
+    try:
+        from literary_calendar_bot_config import (
+            CATALOG_CONCURRENCY_INITIAL,
+            CATALOG_CONCURRENCY_MAX,
+            CATALOG_LATENCY_TARGET,
+        )
+    except (ImportError, AttributeError):
+        return AdaptiveLimiter()
+    return AdaptiveLimiter(
+        initial=CATALOG_CONCURRENCY_INITIAL,
+        max_limit=CATALOG_CONCURRENCY_MAX,
+        latency_target=CATALOG_LATENCY_TARGET,
+    )
@@ -0,0 +1,186 @@
+"""
+Повторы и защита от недоступного API каталога
+
+- RetryPolicy: экспоненциальная задержка с джиттером; повторяются только
+  сетевые ошибки/таймауты и ответы 429/5xx, Retry-After учитывается;
+- CircuitBreaker: после серии сбоев запросы какое-то время не отправляются
+  вовсе (CatalogUnavailableError), затем пропускается один пробный.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CatalogUnavailableError(Exception):
+    """API каталога считается недоступным (circuit breaker разомкнут)"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Секунды из заголовка Retry-After (число или HTTP-дата); None, если разобрать не удалось"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        retry_statuses=RETRYABLE_STATUSES,
+    ):
+        """
+        Args:
+            max_attempts: Всего попыток, включая первую
+            base_delay: Задержка перед первым повтором (верхняя граница джиттера), сек
+            max_delay: Потолок задержки; Retry-After больше потолка — повтор не делается
+            retry_statuses: HTTP-коды, после которых имеет смысл повторить
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def is_retryable_status(self, status_code: int) -> bool:
+        return status_code in self.retry_statuses
+
+    @staticmethod
+    def is_retryable_error(error: BaseException) -> bool:
+        # TimeoutException и ошибки соединения — подклассы TransportError
+        return isinstance(error, httpx.TransportError)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Пауза перед повтором после попытки attempt (с 1); None — больше не повторять
+
+        Без Retry-After — «full jitter»: случайное значение от 0 до base_delay * 2**(attempt-1),
+        чтобы одновременные клиенты не повторяли запросы синхронно.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            failure_threshold: Сколько сбоев подряд размыкает цепь
+            reset_timeout: Через сколько секунд пропустить пробный запрос
+            clock: Источник времени (монотонные секунды)
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self):
+        """Проверка перед запросом: CatalogUnavailableError, если цепь разомкнута"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = self._clock()
+            if now - self.opened_at >= self.reset_timeout:
+                # Пропускаем один пробный запрос; если он не завершился (например, отменён),
+                # через reset_timeout пропускаем следующий
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return
+            self.rejected += 1
+            raise CatalogUnavailableError("API каталога временно недоступен")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("✅ API каталога снова доступно")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        "⛔ API каталога недоступно (%s сбоев подряд), запросы приостановлены на %s с",
+                        self.failures,
+                        self.reset_timeout,
+                    )
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+def make_retry_policy() -> RetryPolicy:
+    """RetryPolicy с параметрами из конфига (CATALOG_RETRY_*)"""
+    try:
+        from literary_calendar_bot_config import (
+            CATALOG_RETRY_ATTEMPTS,
+            CATALOG_RETRY_BASE_DELAY,
+            CATALOG_RETRY_MAX_DELAY,
+        )
+    except (ImportError, AttributeError):
+        return RetryPolicy()
+    return RetryPolicy(
+        max_attempts=CATALOG_RETRY_ATTEMPTS,
+        base_delay=CATALOG_RETRY_BASE_DELAY,
+        max_delay=CATALOG_RETRY_MAX_DELAY,
+    )
+
+
+def make_circuit_breaker() -> CircuitBreaker:
+    """CircuitBreaker с параметрами из конфига (CATALOG_BREAKER_*)"""
+    try:
+        from literary_calendar_bot_config import CATALOG_BREAKER_RESET, CATALOG_BREAKER_THRESHOLD
+    except (ImportError, AttributeError):
+        return CircuitBreaker()
+    return CircuitBreaker(failure_threshold=CATALOG_BREAKER_THRESHOLD, reset_timeout=CATALOG_BREAKER_RESET)
@@ -8,7 +8,7 @@ import json
 import logging
 import re
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
 from dotenv import load_dotenv
@@ -19,11 +19,14 @@ from bot.formatting import (
     format_event_message,
     get_age_word,
 )
+from clients.catalog_cache import close_catalog_stores
 from clients.graphql_client import GraphQLClient
-from literary_calendar_database import LiteraryCalendarDatabase
-from time_utils import now_tz
-from services.digest_service import DigestService
+from literary_calendar_database import AsyncLiteraryCalendarDatabase, close_shared_databases
+from time_utils import Deadline, now_tz
+from services.broadcast_service import BroadcastService
+from services.digest_service import DigestBuild, DigestService
 from services.jubilee_service import JubileeService
+from services.send_scheduler import make_send_scheduler
 
 # Настройка логирования
 logging.basicConfig(
@@ -60,11 +63,76 @@ class LiteraryCalendarBot:
         self.timezone = timezone
         self.send_hour = send_hour
         self._gql = GraphQLClient(graphql_endpoint)
-        self._digest = DigestService(bot=self.bot, gql=self._gql, timezone=self.timezone)
-        self._jubilees = JubileeService(bot=self.bot)
+        # Общий для всех сервисов планировщик отправок: лимиты Telegram считаются на весь бот
+        self.sender = make_send_scheduler(self.bot)
+        try:
+            from literary_calendar_bot_config import DIGEST_CACHE_TTL, DIGEST_PREPARE_CONCURRENCY
+
+            prepare_concurrency = DIGEST_PREPARE_CONCURRENCY
+            digest_cache_ttl = DIGEST_CACHE_TTL
+        except (ImportError, AttributeError):
+            prepare_concurrency = 4
+            digest_cache_ttl = 3600
+        self._digest = DigestService(
+            bot=self.bot,
+            gql=self._gql,
+            timezone=self.timezone,
+            prepare_concurrency=prepare_concurrency,
+            digest_cache_ttl=digest_cache_ttl,
+            sender=self.sender,
+        )
+        self._jubilees = JubileeService(bot=self.bot, sender=self.sender)
+        self._db: Optional[AsyncLiteraryCalendarDatabase] = None
+        self._broadcast: Optional[BroadcastService] = None
+        try:
+            from literary_calendar_bot_config import COMMAND_DEADLINE_SECONDS
+
+            self.command_deadline_seconds = COMMAND_DEADLINE_SECONDS
+        except (ImportError, AttributeError):
+            self.command_deadline_seconds = 3.0
+
+    @property
+    def db(self) -> AsyncLiteraryCalendarDatabase:
+        """Асинхронный доступ к общей БД (создаётся при первом обращении)"""
+        if self._db is None:
+            self._db = AsyncLiteraryCalendarDatabase()
+        return self._db
+
+    @property
+    def broadcast(self) -> BroadcastService:
+        """Рассылка подписчикам по расписанию (создаётся при первом обращении)"""
+        if self._broadcast is None:
+            try:
+                from literary_calendar_bot_config import (
+                    BROADCAST_CONCURRENCY,
+                    OUTBOX_LEASE_SECONDS,
+                    OUTBOX_MAX_ATTEMPTS,
+                )
+
+                options = dict(
+                    concurrency=BROADCAST_CONCURRENCY,
+                    lease_seconds=OUTBOX_LEASE_SECONDS,
+                    max_attempts=OUTBOX_MAX_ATTEMPTS,
+                )
+            except (ImportError, AttributeError):
+                options = {}
+            self._broadcast = BroadcastService(
+                db=self.db,
+                get_digest=self.get_digest,
+                deliver=self._digest.deliver,
+                timezone=self.timezone,
+                send_hour=self.send_hour,
+                **options,
+            )
+        return self._broadcast
 
     async def aclose(self):
         await self._gql.aclose()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        close_shared_databases()
+        close_catalog_stores()
     
     @staticmethod
     def extract_image_url_from_metadata(metadata) -> str:
@@ -141,15 +209,14 @@ class LiteraryCalendarBot:
             Список событий с ссылками на книги
         """
         try:
-            # Пытаемся получить из встроенной в этот модуль базы данных
-            db = LiteraryCalendarDatabase()
-            events = db.get_events_by_date(date.month, date.day)
-            db.close()
+            # Общий для процесса экземпляр БД; запрос идёт в пуле потоков, не блокируя event loop
+            events = await self.db.get_events_by_date(date.month, date.day)
             
             # Преобразуем в формат бота и обогащаем информацией о книгах
             result = []
             for event in events:
                 event_dict = {
+                    'id': event.get('id'),  # id события в БД (ключ записей outbox рассылки)
                     'title': event['title'],
                     'description': event.get('description', ''),
                     'start_date': date,
@@ -183,7 +250,8 @@ class LiteraryCalendarBot:
                             'uuid': ref_uuid,
                             'slug': ref.get('reference_slug', ''),
                             'name': ref_name or 'Без названия',
-                            'metadata': metadata
+                            'metadata': metadata,
+                            'cover_url': ref.get('cover_url') or ''
                         }
                         event_dict['book_references'].append(book_ref)
                         logger.debug(f"Добавлена книга: {ref_name}")
@@ -210,62 +278,112 @@ class LiteraryCalendarBot:
     async def get_jubilees_for_year(self, year: int) -> List[Dict]:
         """Возвращает список юбиляров для указанного года (возраст и ссылки)."""
         try:
-            db = LiteraryCalendarDatabase()
-            jubilees = db.get_jubilees_by_year(year)
-            db.close()
+            jubilees = await self.db.get_jubilees_by_year(year)
             return jubilees
         except Exception as e:
             logger.error(f"Ошибка получения юбиляров: {e}", exc_info=True)
             return []
     
+    async def search_events(self, query: str, limit: int = 10) -> List[Dict]:
+        """Полнотекстовый поиск событий по заголовку, описанию, автору и книге"""
+        try:
+            return await self.db.search_events(query, limit)
+        except Exception as e:
+            logger.error(f"Ошибка поиска событий: {e}", exc_info=True)
+            return []
+
     async def send_jubilees_for_year(self, chat_id: str, year: int):
         """Получает и отправляет список юбиляров для указанного года с разбивкой по месяцам."""
         jubilees = await self.get_jubilees_for_year(year)
         await self._jubilees.send_jubilees_for_year(chat_id=chat_id, year=year, jubilees=jubilees)
     
-    async def collect_books_and_links(self, event: Dict) -> Tuple[List[Dict], List[Dict]]:
-        return await self._digest.collect_books_and_links(event)
+    def new_command_deadline(self) -> Optional[Deadline]:
+        """Бюджет времени на ответ команде (None, если COMMAND_DEADLINE_SECONDS <= 0)"""
+        if self.command_deadline_seconds and self.command_deadline_seconds > 0:
+            return Deadline(self.command_deadline_seconds)
+        return None
+
+    async def prefetch_catalog(self, events: List[Dict], deadline: Optional[Deadline] = None):
+        """Заранее загружает книги для всех ссылок событий (один запрос к API)"""
+        await self._digest.prefetch(events, deadline=deadline)
+
+    async def collect_books_and_links(
+        self, event: Dict, deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        return await self._digest.collect_books_and_links(event, deadline=deadline)
     
-    async def send_event_with_media(self, chat_id: str, event: Dict):
-        await self._digest.send_event_with_media(chat_id, event)
+    async def send_event_with_media(self, chat_id: str, event: Dict, deadline: Optional[Deadline] = None):
+        await self._digest.send_event_with_media(chat_id, event, deadline=deadline)
     
-    async def send_daily_digest(self, chat_id: str):
-        """Отправляет ежедневную рассылку с событиями и ссылками на книги"""
+    async def send_events(
+        self,
+        chat_id: str,
+        events: List[Dict],
+        deadline: Optional[Deadline] = None,
+        on_error: Optional[Callable[[Dict, Exception], Awaitable[None]]] = None,
+    ):
+        """Отправляет события: подготовка параллельно, доставка по порядку (см. DigestService.send_events)"""
+        await self._digest.send_events(chat_id, events, deadline=deadline, on_error=on_error)
+
+    async def get_digest(self, date: datetime, deadline: Optional[Deadline] = None) -> DigestBuild:
+        """
+        Подготовленный дайджест даты, общий для всех чатов
+
+        Собирается один раз на дату и версию данных БД: пока календарь не правили,
+        повторные запросы той же даты не ходят ни в БД, ни в каталог.
+        """
+        try:
+            stamp = await self.db.data_stamp()
+        except Exception as e:
+            logger.warning(f"Не удалось получить версию данных БД, дайджест не кэшируется: {e}")
+            stamp = None
+        return await self._digest.get_digest(
+            date.strftime('%Y-%m-%d'), stamp, lambda: self.get_events_by_date(date), deadline=deadline
+        )
+
+    async def send_digest(
+        self,
+        chat_id: str,
+        build: DigestBuild,
+        on_error: Optional[Callable[[Dict, Exception], Awaitable[None]]] = None,
+    ):
+        await self._digest.send_digest(chat_id, build, on_error=on_error)
+
+    async def send_daily_digest(self, chat_id: str, deadline: Optional[Deadline] = None):
+        """
+        Отправляет ежедневную рассылку с событиями и ссылками на книги
+
+        deadline — бюджет на запросы к каталогу (для ответа на команду); без него ждём API полностью.
+        """
         try:
-            events = await self.get_today_events()
+            build = await self.get_digest(now_tz(self.timezone), deadline=deadline)
             
-            if not events:
+            if not build.events:
                 logger.info("Нет событий на сегодня")
-                await self.bot.send_message(
+                await self.sender.send_message(
                     chat_id=chat_id,
                     text="На этот день в календаре пока что нет событий.",
                     parse_mode='HTML'
                 )
                 return
-            
-            # Отправляем каждое событие отдельным сообщением
-            for event in events:
-                await self.send_event_with_media(chat_id, event)
+
+            # Каждое событие — отдельным сообщением, в порядке календаря
+            await self.send_digest(chat_id, build)
             
         except Exception as e:
             logger.error(f"Ошибка при отправке рассылки: {e}", exc_info=True)
     
+    async def subscribe(self, chat_id: str, send_hour: Optional[int] = None) -> Dict:
+        """Подписывает чат на ежедневную рассылку (по умолчанию — в send_hour)"""
+        return await self.broadcast.subscribe(chat_id, send_hour)
+
+    async def unsubscribe(self, chat_id: str) -> bool:
+        return await self.broadcast.unsubscribe(chat_id)
+
     async def run_daily(self):
-        """Запускает бота в режиме ежедневной рассылки"""
+        """Запускает ежедневную рассылку подписчикам (каждому — в его час)"""
         logger.info("Бот запущен в режиме ежедневной рассылки")
-        
-        while True:
-            try:
-                now = now_tz(self.timezone)
-                if now.hour == self.send_hour and now.minute == 0:
-                    # Здесь нужен chat_id для отправки
-                    logger.warning("Автоматическая рассылка требует chat_id. Используйте /send_events_for_today")
-                    await asyncio.sleep(3600)
-                else:
-                    await asyncio.sleep(60)
-            except Exception as e:
-                logger.error(f"Ошибка в цикле: {e}")
-                await asyncio.sleep(60)
+        await self.broadcast.run()
 
 
 async def main():
@@ -291,6 +409,10 @@ async def main():
     )
     
     logger.info("Бот инициализирован")
+    try:
+        await bot.run_daily()
+    finally:
+        await bot.aclose()
 
 
 if __name__ == "__main__":
@@ -16,6 +16,71 @@ CALENDAR_URL = os.getenv("CALENDAR_URL", "")
 
 DB_PATH = os.getenv("DB_PATH", "literary_events.db")
 
+# Индекс календаря в памяти (366 дней): чтение событий без запросов к SQLite
+CALENDAR_INDEX = os.getenv("CALENDAR_INDEX", "1") != "0"
+
+# Размер пула потоков для запросов к БД из асинхронных обработчиков
+DB_THREADS = int(os.getenv("DB_THREADS", "4"))
+
+# Кэш ответов каталога (в памяти): размер на каждый вид запроса и время жизни, сек.
+# Пустые ответы живут NEGATIVE_TTL; после TTL запись ещё STALE_TTL отдаётся и обновляется в фоне
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "21600"))
+CATALOG_CACHE_NEGATIVE_TTL = int(os.getenv("CATALOG_CACHE_NEGATIVE_TTL", "300"))
+CATALOG_CACHE_STALE_TTL = int(os.getenv("CATALOG_CACHE_STALE_TTL", "3600"))
+# Файл постоянного кэша каталога (переживает перезапуск); пустая строка — только память
+CATALOG_CACHE_PATH = os.getenv("CATALOG_CACHE_PATH", "catalog_cache.db")
+
+# Повторы запросов к каталогу (сетевые ошибки, 429, 5xx): попыток всего, задержки в секундах
+CATALOG_RETRY_ATTEMPTS = int(os.getenv("CATALOG_RETRY_ATTEMPTS", "3"))
+CATALOG_RETRY_BASE_DELAY = float(os.getenv("CATALOG_RETRY_BASE_DELAY", "0.5"))
+CATALOG_RETRY_MAX_DELAY = float(os.getenv("CATALOG_RETRY_MAX_DELAY", "8"))
+
+# Circuit breaker: после стольких сбоев подряд запросы к каталогу не шлются BREAKER_RESET секунд
+CATALOG_BREAKER_THRESHOLD = int(os.getenv("CATALOG_BREAKER_THRESHOLD", "5"))
+CATALOG_BREAKER_RESET = float(os.getenv("CATALOG_BREAKER_RESET", "30"))
+
+# Параллельные запросы к каталогу: лимит подстраивается (AIMD) по p95 задержки и доле 429/5xx/таймаутов
+CATALOG_CONCURRENCY_INITIAL = int(os.getenv("CATALOG_CONCURRENCY_INITIAL", "5"))
+CATALOG_CONCURRENCY_MAX = int(os.getenv("CATALOG_CONCURRENCY_MAX", "32"))
+CATALOG_LATENCY_TARGET = float(os.getenv("CATALOG_LATENCY_TARGET", "2.0"))
+
+# Hedging: запрос к каталогу, не ответивший за p90, дублируется; доля дублей не больше бюджета (0 — выключено)
+CATALOG_HEDGE_BUDGET = float(os.getenv("CATALOG_HEDGE_BUDGET", "0"))
+
+# HTTP-соединения с каталогом: keep-alive простаивающих соединений (сек) и HTTP/2 (нужен пакет h2)
+CATALOG_KEEPALIVE = float(os.getenv("CATALOG_KEEPALIVE", "30"))
+CATALOG_HTTP2 = os.getenv("CATALOG_HTTP2", "0") == "1"
+
+# Бюджет времени (сек) на запросы к каталогу при ответе на команду; дальше книги только из кэша.
+# 0 — ждать API без ограничения
+COMMAND_DEADLINE_SECONDS = float(os.getenv("COMMAND_DEADLINE_SECONDS", "3"))
+
+# Сколько событий дня одновременно готовится (книги + тексты), пока предыдущие отправляются
+DIGEST_PREPARE_CONCURRENCY = int(os.getenv("DIGEST_PREPARE_CONCURRENCY", "4"))
+
+# Сколько секунд подготовленный дайджест даты (книги, подписи, тексты) отдаётся всем чатам;
+# при изменении данных БД пересобирается сразу. 0 — готовить для каждого запроса заново
+DIGEST_CACHE_TTL = float(os.getenv("DIGEST_CACHE_TTL", "3600"))
+
+# Сколько подписчиков получают ежедневную рассылку одновременно
+# (темп отправки всё равно ограничивают лимиты TELEGRAM_*)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+
+# Лимиты отправки в Telegram: сообщений в секунду на бота, в секунду в личный чат,
+# в минуту в группу/канал. RetryAfter от Telegram приостанавливает отправку на указанное время
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20"))
+
+# Outbox рассылки: на сколько секунд отправитель занимает сообщение (после падения процесса
+# оно снова доступно через это время) и сколько попыток до отметки об ошибке
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+# Чат (группа/канал), куда send_daily.py отправляет дайджест помимо подписчиков
+GROUP_CHAT_ID = os.getenv("GROUP_CHAT_ID", "")
+
 # Время отправки ежедневного дайджеста (в часах, по умолчанию 13:00)
 SEND_HOUR = int(os.getenv("SEND_HOUR", "13"))
 
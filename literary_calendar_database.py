@@ -3,41 +3,459 @@
 Поддерживает ежегодные события с привязкой к книгам, авторам, тегам и категориям
 """
 
+import asyncio
+import functools
+import logging
+import os
 import sqlite3
-import csv
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, date
-from typing import List, Dict, Optional, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import json
+from collections.abc import Mapping
 
+logger = logging.getLogger(__name__)
 
-class LiteraryCalendarDatabase:
-    """База данных литературного календаря"""
+# Максимум параметров в одном IN (...) — с запасом ниже лимита SQLite (999 в старых сборках)
+_IN_CHUNK_SIZE = 500
 
-    def __init__(self, db_path: str = None):
-        # Используем путь из конфига, если не указан явно
-        if db_path is None:
+# Условие «o — первая неотправленная запись outbox своего чата»: события чата уходят по порядку
+_OUTBOX_CHAT_HEAD = """NOT EXISTS (
+    SELECT 1 FROM outbox p
+    WHERE p.chat_id = o.chat_id
+      AND p.state IN ('pending', 'sending')
+      AND (p.digest_date < o.digest_date OR (p.digest_date = o.digest_date AND p.position < o.position))
+)"""
+
+# Запись outbox всё ещё у того, кто её арендовал: attempts растёт при каждой аренде и служит токеном
+_OUTBOX_HELD = "id = ? AND state = 'sending' AND attempts = ?"
+
+# Пути БД, для которых схема уже создана в этом процессе (DDL выполняется один раз)
+_bootstrapped_paths: set = set()
+_bootstrap_lock = threading.Lock()
+
+# Общие (процессные) экземпляры БД: путь -> LiteraryCalendarDatabase
+_shared_databases: Dict[str, "LiteraryCalendarDatabase"] = {}
+_shared_lock = threading.Lock()
+
+
+def _resolve_db_path(db_path: Optional[str]) -> str:
+    """Путь к БД: явно указанный или из конфига"""
+    if db_path is not None:
+        return db_path
+    try:
+        from literary_calendar_bot_config import DB_PATH
+
+        return DB_PATH
+    except (ImportError, AttributeError):
+        return "literary_events.db"
+
+
+def _connect(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Открывает соединение с прагмами, которые нужно выставлять на каждом соединении"""
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    # Важно для SQLite: включаем внешние ключи и выставляем прагмы для стабильной работы
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    return conn
+
+
+def _data_stamp(probe: sqlite3.Connection, db_path: str) -> Tuple:
+    """
+    «Версия» данных календаря
+
+    Счётчик calendar_version увеличивают триггеры при любой правке событий и ссылок
+    (из любого соединения и процесса); записи в служебные таблицы (подписчики) его не меняют.
+    Для БД без счётчика — PRAGMA data_version соединения-наблюдателя и mtime файлов.
+    """
+    try:
+        return (probe.execute("SELECT version FROM calendar_version").fetchone()[0],)
+    except (sqlite3.OperationalError, TypeError):
+        pass
+    data_version = probe.execute("PRAGMA data_version").fetchone()[0]
+    mtimes = tuple(
+        os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        for path in (db_path, db_path + "-wal")
+    )
+    return (data_version,) + mtimes
+
+
+class LazyMetadata(Mapping):
+    """
+    metadata ссылки только для чтения: JSON разбирается при первом обращении к полям
+
+    Обложка уже лежит в колонке cover_url, поэтому на горячем пути рассылки
+    JSON обычно не разбирается вовсе — только когда нужна аннотация и т.п.
+    """
+
+    __slots__ = ("_raw", "_data")
+
+    def __init__(self, raw: str):
+        self._raw = raw
+        self._data: Optional[Dict] = None
+
+    def _decoded(self) -> Dict:
+        if self._data is None:
             try:
-                from literary_calendar_bot_config import DB_PATH
+                data = json.loads(self._raw)
+            except ValueError:
+                data = None
+            self._data = data if isinstance(data, dict) else {}
+        return self._data
 
-                db_path = DB_PATH
-            except (ImportError, AttributeError):
-                db_path = "literary_events.db"
+    def __getitem__(self, key):
+        return self._decoded()[key]
 
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self) -> int:
+        return len(self._decoded())
+
+    def __bool__(self) -> bool:
+        # Пустой metadata в БД хранится как NULL, поэтому непустая строка — непустые данные
+        return bool(self._raw)
+
+    def __repr__(self) -> str:
+        return f"LazyMetadata({self._raw!r})"
+
+    def copy(self) -> "LazyMetadata":
+        """Независимая копия: JSON разбирается заново, правки разобранных значений не видны оригиналу"""
+        return LazyMetadata(self._raw)
+
+
+class DatabaseConnectionManager:
+    """
+    Процессный менеджер соединений с одной БД
+
+    Держит по одному читающему соединению на поток и одно пишущее соединение,
+    доступ к которому сериализуется через write_lock.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: List[sqlite3.Connection] = []
+
+    def reader(self) -> sqlite3.Connection:
+        """Читающее соединение текущего потока (создаётся при первом обращении)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.db_path)
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def writer(self) -> sqlite3.Connection:
+        """Единственное пишущее соединение; использовать под write_lock"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = _connect(self.db_path, check_same_thread=False)
+            return self._writer
+
+    def close(self):
+        """Закрывает все соединения менеджера"""
+        with self._lock:
+            connections = self._readers + ([self._writer] if self._writer else [])
+            self._readers = []
+            self._writer = None
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Соединение другого потока — закроется вместе с процессом
+                pass
+
+
+class CalendarIndex:
+    """
+    Индекс календаря в памяти
+
+    366 слотов по дню года (по високосному году, чтобы поместилось 29 февраля),
+    в каждом — готовые события со ссылками и разобранным metadata. Индекс
+    пересобирается лениво при следующем обращении, если изменилась версия
+    данных календаря (счётчик calendar_version) — так правки из веб-редактора
+    видны без перезапуска бота.
+    """
+
+    SLOTS = 366
+
+    def __init__(self, db_path: str, loader):
+        """
+        Args:
+            db_path: Путь к файлу БД
+            loader: Функция без аргументов, возвращающая все события со ссылками
+        """
         self.db_path = db_path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._probe: Optional[sqlite3.Connection] = None
+        self._slots: List[Tuple[Dict, ...]] = [()] * self.SLOTS
+        self._stamp = None
+
+    @staticmethod
+    def day_slot(month: int, day: int) -> Optional[int]:
+        """Номер слота (0..365) для даты или None для несуществующей даты"""
+        try:
+            return date(2000, month, day).timetuple().tm_yday - 1
+        except ValueError:
+            return None
+
+    def events_for(self, month: int, day: int) -> List[Dict]:
+        """События на дату — чтение из памяти (копии событий, см. _copy_event)"""
+        slot = self.day_slot(month, day)
+        if slot is None:
+            return []
+        self.refresh()
+        return [self._copy_event(event) for event in self._slots[slot]]
+
+    @staticmethod
+    def _copy_event(event: Dict) -> Dict:
+        """
+        Копия события, которую вызывающий может менять, не портя индекс
+
+        Копируются сам словарь, список ссылок, словари ссылок и их metadata —
+        всё изменяемое, что есть в событии (остальные значения — строки и числа).
+        """
+        copy = dict(event)
+        copy["references"] = [
+            {**ref, "metadata": ref["metadata"].copy()} if isinstance(ref.get("metadata"), LazyMetadata) else dict(ref)
+            for ref in event["references"]
+        ]
+        return copy
+
+    def data_stamp(self) -> Tuple:
+        """Текущая «версия» данных календаря (см. _data_stamp)"""
+        if self._probe is None:
+            self._probe = _connect(self.db_path, check_same_thread=False)
+        return _data_stamp(self._probe, self.db_path)
+
+    def refresh(self):
+        """Пересобирает индекс, если данные в БД изменились"""
+        with self._lock:
+            # Версию берём до загрузки: запись во время пересборки вызовет ещё одну пересборку
+            stamp = self.data_stamp()
+            if stamp == self._stamp:
+                return
+
+            slots: List[List[Dict]] = [[] for _ in range(self.SLOTS)]
+            for event in self._loader():
+                month, _, day = (event.get("event_date") or "").partition("-")
+                try:
+                    slot = self.day_slot(int(month), int(day))
+                except ValueError:
+                    slot = None
+                if slot is not None:
+                    slots[slot].append(event)
+
+            self._slots = [tuple(events) for events in slots]
+            self._stamp = stamp
+
+    def close(self):
+        with self._lock:
+            if self._probe:
+                self._probe.close()
+                self._probe = None
+            self._stamp = None
+
+
+def get_shared_database(db_path: str = None, use_index: bool = None) -> "LiteraryCalendarDatabase":
+    """
+    Возвращает общий для процесса экземпляр БД
+
+    Соединения и схема создаются один раз; вызывать close() у общего экземпляра не нужно.
+    use_index (по умолчанию — CALENDAR_INDEX из конфига) учитывается при первом создании.
+    """
+    db_path = _resolve_db_path(db_path)
+    key = os.path.abspath(db_path)
+    if use_index is None:
+        try:
+            from literary_calendar_bot_config import CALENDAR_INDEX
+
+            use_index = CALENDAR_INDEX
+        except (ImportError, AttributeError):
+            use_index = False
+    with _shared_lock:
+        db = _shared_databases.get(key)
+        if db is None:
+            db = LiteraryCalendarDatabase(
+                db_path, manager=DatabaseConnectionManager(db_path), use_index=use_index
+            )
+            _shared_databases[key] = db
+        return db
+
+
+def close_shared_databases():
+    """Закрывает все общие экземпляры БД (при остановке процесса)"""
+    with _shared_lock:
+        databases = list(_shared_databases.values())
+        _shared_databases.clear()
+    for db in databases:
+        if db._index:
+            db._index.close()
+        db._close_stamp_probe()
+        db._manager.close()
+
+
+class LiteraryCalendarDatabase:
+    """База данных литературного календаря"""
+
+    def __init__(
+        self,
+        db_path: str = None,
+        manager: DatabaseConnectionManager = None,
+        use_index: bool = False,
+    ):
+        # Используем путь из конфига, если не указан явно
+        self.db_path = _resolve_db_path(db_path)
         self.conn = None
+        self._manager = manager
+        self._write_lock = manager.write_lock if manager else threading.RLock()
         self.init_database()
 
+        # Индекс в памяти имеет смысл только для файловой БД (у :memory: у каждого соединения своя база)
+        self._index: Optional[CalendarIndex] = None
+        if use_index and self.db_path != ":memory:":
+            self._index = CalendarIndex(self.db_path, self._load_all_events)
+        self._stamp_probe: Optional[sqlite3.Connection] = None
+        self._stamp_lock = threading.Lock()
+
     def init_database(self):
         """Инициализация базы данных"""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        cursor = self.conn.cursor()
+        if self._manager:
+            self.conn = self._manager.writer()
+        else:
+            self.conn = _connect(self.db_path)
+
+        with self._write_lock:
+            self._ensure_schema()
+
+    def _read_conn(self) -> sqlite3.Connection:
+        """Соединение для чтения: собственное либо читающее соединение текущего потока"""
+        if self._manager:
+            return self._manager.reader()
+        return self.conn
+
+    def _ensure_schema(self):
+        """Применяет недостающие миграции схемы — проверка один раз на процесс для каждого файла БД"""
+        in_memory = self.db_path == ":memory:"
+        key = os.path.abspath(self.db_path)
+        with _bootstrap_lock:
+            if not in_memory and key in _bootstrapped_paths:
+                if os.path.exists(self.db_path):
+                    return
+                # Файл удалили во время работы — схему нужно создать заново
+                _bootstrapped_paths.discard(key)
+
+            self._apply_migrations()
+            self._ensure_search_index()
+            if not in_memory:
+                _bootstrapped_paths.add(key)
+
+    def data_stamp(self) -> Tuple:
+        """
+        «Версия» данных для кэшей поверх БД (например, готовых дайджестов)
+
+        Меняется при любой правке событий и ссылок, в том числе из веб-редактора
+        или импорта в другом процессе; пока значение то же, календарь не менялся.
+        """
+        if self.db_path == ":memory:":
+            return _data_stamp(self.conn, self.db_path)
+        if self._index:
+            with self._index._lock:
+                return self._index.data_stamp()
+        with self._stamp_lock:
+            if self._stamp_probe is None:
+                self._stamp_probe = _connect(self.db_path, check_same_thread=False)
+            return _data_stamp(self._stamp_probe, self.db_path)
+
+    def _close_stamp_probe(self):
+        with self._stamp_lock:
+            if self._stamp_probe:
+                self._stamp_probe.close()
+                self._stamp_probe = None
+
+    def schema_version(self) -> int:
+        """Версия схемы БД (PRAGMA user_version)"""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _apply_migrations(self):
+        """
+        Применяет миграции из SCHEMA_MIGRATIONS, которых ещё нет в БД
+
+        Версия схемы хранится в PRAGMA user_version; каждая миграция выполняется
+        в своей транзакции вместе с повышением версии. Если схема актуальна,
+        никакой DDL не выполняется.
+        """
+        latest = len(self.SCHEMA_MIGRATIONS)
+        current = self.schema_version()
+        if current == latest:
+            return
+        if current > latest:
+            logger.warning(
+                "Версия схемы БД %s (%s) новее, чем известна этой версии кода (%s)",
+                self.db_path,
+                current,
+                latest,
+            )
+            return
+
+        # Режим журнала хранится в файле БД и не меняется внутри транзакции
+        self.conn.execute("PRAGMA journal_mode = WAL")
+
+        for version, migration in enumerate(self.SCHEMA_MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                # Другой процесс мог успеть применить миграцию, пока мы ждали блокировку
+                if self.schema_version() >= version:
+                    self.conn.rollback()
+                    continue
+                migration(self)
+                self.conn.execute(f"PRAGMA user_version = {version}")
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            logger.info("БД %s: применена миграция схемы %s (%s)", self.db_path, version, migration.__name__)
+
+    def _add_column_if_missing(self, table: str, column: str, declaration: str) -> bool:
+        """Добавляет колонку, если её нет (БД могли обновляться до появления миграций); True — если добавлена"""
+        columns = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column in columns:
+            return False
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        return True
 
-        # Важно для SQLite: включаем внешние ключи и выставляем прагмы для стабильной работы
-        cursor.execute("PRAGMA foreign_keys = ON")
-        cursor.execute("PRAGMA busy_timeout = 5000")
-        cursor.execute("PRAGMA journal_mode = WAL")
+    @contextmanager
+    def _triggers_suspended(self, *names: str):
+        """Временно убирает триггеры (внутри транзакции миграции) и создаёт их заново тем же SQL"""
+        saved = []
+        for name in names:
+            row = self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)
+            ).fetchone()
+            if row is not None:
+                saved.append(row["sql"])
+                self.conn.execute(f"DROP TRIGGER {name}")
+        yield
+        for sql in saved:
+            self.conn.execute(sql)
+
+    def _migration_base_schema(self):
+        """1: таблицы событий и ссылок с базовыми индексами"""
+        cursor = self.conn.cursor()
 
         # Таблица событий
         cursor.execute(
@@ -87,7 +505,249 @@ class LiteraryCalendarDatabase:
             "CREATE INDEX IF NOT EXISTS idx_event_references_event_id ON event_references(event_id)"
         )
 
-        self.conn.commit()
+    def _migration_birth_year(self):
+        """2: events.birth_year — год из year для поиска юбиляров в SQL"""
+        if self._add_column_if_missing("events", "birth_year", "INTEGER"):
+            self._backfill_birth_years()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_events_birth_year ON events(birth_year)")
+
+    def _migration_updated_at(self):
+        """3: events.updated_at, поддерживаемый триггерами, — для экспорта изменённых событий"""
+        cursor = self.conn.cursor()
+        # ALTER TABLE не допускает DEFAULT CURRENT_TIMESTAMP — пустые значения
+        # берутся из created_at (см. COALESCE в фильтре modified_since)
+        self._add_column_if_missing("events", "updated_at", "TIMESTAMP")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_events_modified ON events(COALESCE(updated_at, created_at))"
+        )
+
+        # updated_at обновляется триггерами при любых правках события и его ссылок
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS events_touch_update AFTER UPDATE ON events
+            WHEN NEW.updated_at IS OLD.updated_at
+            BEGIN
+                UPDATE events SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+            END
+        """
+        )
+        for trigger_event, row_alias in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cursor.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS event_references_touch_{trigger_event.lower()}
+                AFTER {trigger_event} ON event_references
+                BEGIN
+                    UPDATE events SET updated_at = CURRENT_TIMESTAMP WHERE id = {row_alias}.event_id;
+                END
+            """
+            )
+
+    def _migration_cover_url(self):
+        """4: event_references.cover_url — нормализованная обложка из metadata"""
+        if self._add_column_if_missing("event_references", "cover_url", "TEXT"):
+            # Заполнение cover_url — не правка событий: updated_at (миграция 3) не меняем
+            with self._triggers_suspended("event_references_touch_update"):
+                self._backfill_cover_urls()
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_event_references_cover_url ON event_references(cover_url)"
+        )
+
+    def _migration_search_index(self):
+        """
+        5: полнотекстовый индекс FTS5 по событиям, синхронизируемый триггерами
+
+        Без FTS5 версия схемы всё равно повышается (иначе не применились бы следующие миграции),
+        а индекс создаёт _ensure_search_index при запуске, когда FTS5 станет доступен.
+        """
+        self._create_search_index()
+
+    def _has_search_index(self) -> bool:
+        return (
+            self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'").fetchone()
+            is not None
+        )
+
+    def _ensure_search_index(self):
+        """Создаёт индекс FTS5, пропущенный миграцией 5 из-за сборки SQLite без FTS5 (вызывать после миграций)"""
+        if self._has_search_index():
+            return
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            created = self._has_search_index() or self._create_search_index()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        if created:
+            logger.info("БД %s: создан индекс полнотекстового поиска (FTS5)", self.db_path)
+
+    def _create_search_index(self) -> bool:
+        """Таблица events_fts и триггеры синхронизации; False — SQLite собран без FTS5"""
+        cursor = self.conn.cursor()
+        exists = self._has_search_index()
+        try:
+            cursor.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING {self._FTS_MODULE}(
+                    title, description, author_name, book_title,
+                    content = 'events', content_rowid = 'id',
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """
+            )
+        except sqlite3.OperationalError as e:
+            # SQLite собран без FTS5 — поиск будет работать через LIKE
+            logger.warning("FTS5 недоступен, поиск по событиям будет медленным: %s", e)
+            return False
+
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events
+            BEGIN
+                INSERT INTO events_fts(rowid, title, description, author_name, book_title)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.author_name, NEW.book_title);
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events
+            BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, description, author_name, book_title)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.author_name, OLD.book_title);
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS events_fts_update
+            AFTER UPDATE OF title, description, author_name, book_title ON events
+            BEGIN
+                INSERT INTO events_fts(events_fts, rowid, title, description, author_name, book_title)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.author_name, OLD.book_title);
+                INSERT INTO events_fts(rowid, title, description, author_name, book_title)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.author_name, NEW.book_title);
+            END
+        """
+        )
+
+        if not exists:
+            # Индекс создан для уже заполненной БД — проиндексируем существующие события
+            cursor.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+        return True
+
+    def _migration_calendar_version(self):
+        """6: счётчик calendar_version, увеличиваемый триггерами при правках событий и ссылок"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS calendar_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """
+        )
+        cursor.execute("INSERT OR IGNORE INTO calendar_version (id, version) VALUES (1, 0)")
+        for table in ("events", "event_references"):
+            for trigger_event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_bump_version_{trigger_event.lower()}
+                    AFTER {trigger_event} ON {table}
+                    BEGIN
+                        UPDATE calendar_version SET version = version + 1 WHERE id = 1;
+                    END
+                """
+                )
+
+    def _migration_subscribers(self):
+        """7: подписчики ежедневной рассылки"""
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscribers (
+                chat_id TEXT PRIMARY KEY,
+                send_hour INTEGER NOT NULL,  -- Час отправки по местному времени подписчика
+                timezone TEXT NOT NULL,      -- IANA timezone, например Europe/Moscow
+                last_sent_date TEXT,         -- YYYY-MM-DD последнего дайджеста, поставленного в рассылку
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """
+        )
+
+    def _migration_outbox(self):
+        """8: очередь отправки дайджестов (outbox) — что и кому уже отправлено"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                digest_date TEXT NOT NULL,            -- YYYY-MM-DD
+                event_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,            -- Порядок события в дайджесте
+                state TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'sending', 'sent', 'failed'
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL DEFAULT 0,  -- Не отправлять раньше (повтор после ошибки), unix time
+                lease_until REAL,                     -- До какого времени запись занята отправителем
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                UNIQUE (chat_id, digest_date, event_id)  -- Ключ идемпотентности
+            )
+        """
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox(state, available_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_chat ON outbox(chat_id, digest_date, position)")
+
+    # Модуль полнотекстового индекса (в тестах подменяется, чтобы изобразить SQLite без FTS5)
+    _FTS_MODULE = "fts5"
+
+    # Упорядоченный список миграций: номер версии = позиция в списке (с 1).
+    # Новые миграции добавляются только в конец.
+    SCHEMA_MIGRATIONS = (
+        _migration_base_schema,
+        _migration_birth_year,
+        _migration_updated_at,
+        _migration_cover_url,
+        _migration_search_index,
+        _migration_calendar_version,
+        _migration_subscribers,
+        _migration_outbox,
+    )
+
+    def _backfill_birth_years(self):
+        """Заполняет birth_year для уже существующих строк"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT id, year, title FROM events WHERE birth_year IS NULL AND year IS NOT NULL"
+        )
+        updates = [
+            (birth_year, row["id"])
+            for row in cursor.fetchall()
+            if (birth_year := self.derive_birth_year(row["year"], row["title"])) is not None
+        ]
+        cursor.executemany("UPDATE events SET birth_year = ? WHERE id = ?", updates)
+
+    def _backfill_cover_urls(self):
+        """Заполняет cover_url для уже существующих ссылок (разбирает metadata один раз)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, metadata FROM event_references WHERE metadata IS NOT NULL")
+        updates = [
+            (cover_url, row["id"])
+            for row in cursor.fetchall()
+            if (cover_url := self.extract_cover_url(row["metadata"]))
+        ]
+        cursor.executemany("UPDATE event_references SET cover_url = ? WHERE id = ?", updates)
+
+    @staticmethod
+    def extract_cover_url(metadata: Union[Dict, str, None]) -> Optional[str]:
+        """Нормализованный URL обложки из metadata ссылки (dict или JSON-строка)"""
+        if not metadata:
+            return None
+        # Импорт внутри: bot.formatting сам импортирует этот модуль
+        from bot.formatting import extract_image_url_from_metadata
+
+        return extract_image_url_from_metadata(metadata) or None
 
     @staticmethod
     def normalize_reference_date(value: Union[int, str, datetime, date, None]) -> Optional[str]:
@@ -125,6 +785,24 @@ class LiteraryCalendarDatabase:
 
         return None
 
+    @classmethod
+    def derive_birth_year(
+        cls, year: Union[str, int, datetime, date, None], title: Optional[str] = None
+    ) -> Optional[int]:
+        """Вычисляет значение колонки birth_year из year (с фолбэком на год в заголовке)."""
+        if not cls.normalize_reference_date(year):
+            return None
+
+        reference_date = cls.parse_reference_date(year)
+        if reference_date:
+            return reference_date.year
+
+        # Извлекаем год из названия события (костыль для исторических названий)
+        year_match = re.search(r"\b(1[0-9]{3}|2[0-2][0-9]{2})\b", title or "")
+        if year_match:
+            return int(year_match.group(1))
+        return None
+
     def add_event(
         self,
         month: int,
@@ -156,26 +834,29 @@ class LiteraryCalendarDatabase:
         event_date = f"{month:02d}-{day:02d}"
 
         normalized_year = self.normalize_reference_date(year)
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO events (event_date, event_type, title, description, author_name, book_title, year)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                event_date,
-                event_type,
-                title,
-                description,
-                author_name,
-                book_title,
-                normalized_year,
-            ),
-        )
+        birth_year = self.derive_birth_year(normalized_year, title)
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO events (event_date, event_type, title, description, author_name, book_title, year, birth_year)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    event_date,
+                    event_type,
+                    title,
+                    description,
+                    author_name,
+                    book_title,
+                    normalized_year,
+                    birth_year,
+                ),
+            )
 
-        if commit:
-            self.conn.commit()
-        return cursor.lastrowid
+            if commit:
+                self.conn.commit()
+            return cursor.lastrowid
 
     def add_reference(
         self,
@@ -200,54 +881,355 @@ class LiteraryCalendarDatabase:
             priority: Приоритет (0 = высший)
             metadata: Дополнительные данные (обложка, аннотация и т.д.)
         """
-        cursor = self.conn.cursor()
         metadata_json = json.dumps(metadata) if metadata else None
+        cover_url = self.extract_cover_url(metadata)
 
-        cursor.execute(
-            """
-            INSERT INTO event_references 
-            (event_id, reference_type, reference_uuid, reference_slug, reference_name, priority, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-            (
-                event_id,
-                reference_type,
-                reference_uuid,
-                reference_slug,
-                reference_name,
-                priority,
-                metadata_json,
-            ),
-        )
+        with self._write_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO event_references 
+                (event_id, reference_type, reference_uuid, reference_slug, reference_name, priority, metadata, cover_url)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    event_id,
+                    reference_type,
+                    reference_uuid,
+                    reference_slug,
+                    reference_name,
+                    priority,
+                    metadata_json,
+                    cover_url,
+                ),
+            )
+
+            if commit:
+                self.conn.commit()
+
+    def add_subscriber(self, chat_id: str, send_hour: int, timezone: str) -> Dict:
+        """
+        Подписывает чат на ежедневную рассылку (повторная подписка меняет час и timezone)
+
+        Returns:
+            Запись подписчика
+        """
+        with self._write_lock:
+            self.conn.execute(
+                """
+                INSERT INTO subscribers (chat_id, send_hour, timezone) VALUES (?, ?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET send_hour = excluded.send_hour, timezone = excluded.timezone
+            """,
+                (str(chat_id), send_hour, timezone),
+            )
+            self.conn.commit()
+            row = self.conn.execute("SELECT * FROM subscribers WHERE chat_id = ?", (str(chat_id),)).fetchone()
+        return dict(row)
+
+    def remove_subscriber(self, chat_id: str) -> bool:
+        """Отписывает чат; False, если подписки не было"""
+        with self._write_lock:
+            deleted = self.conn.execute("DELETE FROM subscribers WHERE chat_id = ?", (str(chat_id),)).rowcount
+            self.conn.commit()
+        return deleted > 0
+
+    def get_subscribers(self) -> List[Dict]:
+        """Все подписчики рассылки"""
+        cursor = self._read_conn().execute("SELECT * FROM subscribers ORDER BY created_at, chat_id")
+        return [dict(row) for row in cursor.fetchall()]
+
+    def enqueue_digest(self, chat_ids: Iterable[str], digest_date: str, event_ids: List[int]) -> int:
+        """
+        Ставит дайджест даты в outbox для чатов и отмечает его у подписчиков как запланированный
+
+        Всё в одной транзакции; повторная постановка того же (чат, дата, событие)
+        игнорируется (UNIQUE), поэтому планировщик можно безопасно перезапускать.
+
+        Returns:
+            Сколько записей добавлено
+        """
+        chat_ids = [str(chat_id) for chat_id in chat_ids]
+        now = time.time()
+        rows = [
+            (chat_id, digest_date, event_id, position, now)
+            for chat_id in chat_ids
+            for position, event_id in enumerate(event_ids)
+        ]
+        with self._write_lock:
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO outbox (chat_id, digest_date, event_id, position, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """,
+                    rows,
+                )
+                added = self.conn.total_changes - before
+                self.conn.executemany(
+                    "UPDATE subscribers SET last_sent_date = ? WHERE chat_id = ?",
+                    [(digest_date, chat_id) for chat_id in chat_ids],
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        return added
+
+    def lease_outbox(self, limit: int, lease_seconds: float, now: float = None) -> List[Dict]:
+        """
+        Забирает до limit записей outbox на отправку (state='sending' до lease_until)
 
-        if commit:
+        Берётся только первая неотправленная запись каждого чата — события чата уходят
+        по порядку и не параллельно. Записи, аренда которых истекла (отправитель упал),
+        забираются снова. Требует SQLite 3.35+ (UPDATE ... RETURNING).
+        """
+        now = time.time() if now is None else now
+        with self._write_lock:
+            rows = self.conn.execute(
+                f"""
+                UPDATE outbox
+                SET state = 'sending', lease_until = :lease_until, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT o.id FROM outbox o
+                    WHERE ((o.state = 'pending' AND o.available_at <= :now)
+                           OR (o.state = 'sending' AND o.lease_until < :now))
+                      AND {_OUTBOX_CHAT_HEAD}
+                    ORDER BY o.available_at, o.id
+                    LIMIT :limit
+                )
+                RETURNING id, chat_id, digest_date, event_id, position, attempts
+            """,
+                {"lease_until": now + lease_seconds, "now": now, "limit": limit},
+            ).fetchall()
+            self.conn.commit()
+        return [dict(row) for row in rows]
+
+    def renew_outbox(self, entry_id: int, attempts: int, lease_seconds: float, now: float = None) -> bool:
+        """Продлевает аренду записи outbox; False — аренда истекла и запись забрал другой отправитель"""
+        now = time.time() if now is None else now
+        with self._write_lock:
+            renewed = self.conn.execute(
+                f"UPDATE outbox SET lease_until = ? WHERE {_OUTBOX_HELD}",
+                (now + lease_seconds, entry_id, attempts),
+            ).rowcount
+            self.conn.commit()
+        return renewed > 0
+
+    def complete_outbox(self, entry_id: int, attempts: int) -> bool:
+        """Отмечает запись outbox отправленной; False — аренда уже потеряна, запись не изменена"""
+        with self._write_lock:
+            updated = self.conn.execute(
+                f"""
+                UPDATE outbox SET state = 'sent', sent_at = ?, lease_until = NULL, last_error = NULL
+                WHERE {_OUTBOX_HELD}
+            """,
+                (time.time(), entry_id, attempts),
+            ).rowcount
+            self.conn.commit()
+        return updated > 0
+
+    def retry_outbox(self, entry_id: int, attempts: int, error: str, retry_at: Optional[float]) -> bool:
+        """
+        Возвращает запись в очередь до retry_at; retry_at=None — больше не пытаться (failed)
+
+        Returns:
+            False, если аренда уже потеряна (запись не изменена)
+        """
+        with self._write_lock:
+            if retry_at is None:
+                updated = self.conn.execute(
+                    f"UPDATE outbox SET state = 'failed', lease_until = NULL, last_error = ? WHERE {_OUTBOX_HELD}",
+                    (error, entry_id, attempts),
+                ).rowcount
+            else:
+                updated = self.conn.execute(
+                    f"""
+                    UPDATE outbox SET state = 'pending', available_at = ?, lease_until = NULL, last_error = ?
+                    WHERE {_OUTBOX_HELD}
+                """,
+                    (retry_at, error, entry_id, attempts),
+                ).rowcount
             self.conn.commit()
+        return updated > 0
+
+    def fail_outbox_chat(self, chat_id: str, error: str, entry_id: int, attempts: int) -> int:
+        """
+        Отменяет все неотправленные записи чата (например, бот заблокирован); возвращает количество
+
+        entry_id и attempts — запись, на которой случилась ошибка: если её аренда потеряна,
+        ничего не меняется (ошибку обработает новый отправитель).
+        """
+        with self._write_lock:
+            failed = self.conn.execute(
+                f"""
+                UPDATE outbox SET state = 'failed', lease_until = NULL, last_error = ?
+                WHERE chat_id = ? AND state IN ('pending', 'sending')
+                  AND EXISTS (SELECT 1 FROM outbox WHERE {_OUTBOX_HELD})
+            """,
+                (error, str(chat_id), entry_id, attempts),
+            ).rowcount
+            self.conn.commit()
+        return failed
+
+    def next_outbox_time(self) -> Optional[float]:
+        """Когда появится следующая запись для отправки (unix time) или None, если очередь пуста"""
+        # Учитываем только первые записи чатов: остальные ждут их, а не своего available_at
+        row = self._read_conn().execute(
+            f"""
+            SELECT MIN(CASE WHEN o.state = 'pending' THEN o.available_at ELSE o.lease_until END)
+            FROM outbox o WHERE o.state IN ('pending', 'sending') AND {_OUTBOX_CHAT_HEAD}
+        """
+        ).fetchone()
+        return row[0]
+
+    def outbox_stats(self, digest_date: str = None, window: float = 60.0) -> Dict:
+        """
+        Прогресс отправки: записи по состояниям, отправлено за последние window секунд
+        и темп (сообщений в секунду), чатов в очереди
+        """
+        conditions, params = [], []
+        if digest_date:
+            conditions.append("digest_date = ?")
+            params.append(digest_date)
+
+        def where(*extra: str) -> str:
+            clauses = conditions + list(extra)
+            return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._read_conn()
+        states = {
+            row[0]: row[1]
+            for row in conn.execute(f"SELECT state, COUNT(*) FROM outbox{where()} GROUP BY state", params)
+        }
+        sent_recently = where("state = 'sent'", "sent_at >= ?")
+        recent = conn.execute(
+            f"SELECT COUNT(*) FROM outbox{sent_recently}", params + [time.time() - window]
+        ).fetchone()[0]
+        waiting = where("state IN ('pending', 'sending')")
+        chats = conn.execute(f"SELECT COUNT(DISTINCT chat_id) FROM outbox{waiting}", params).fetchone()[0]
+        total = sum(states.values())
+        done = states.get("sent", 0) + states.get("failed", 0)
+        return {
+            "total": total,
+            "pending": states.get("pending", 0),
+            "sending": states.get("sending", 0),
+            "sent": states.get("sent", 0),
+            "failed": states.get("failed", 0),
+            "chats_waiting": chats,
+            "progress": round(done / total, 3) if total else 1.0,
+            "sent_per_second": round(recent / window, 2),
+        }
+
+    def failed_outbox(self, digest_date: str = None, limit: int = 20) -> List[Dict]:
+        """Записи, которые не удалось отправить (для просмотра из CLI)"""
+        sql = "SELECT id, chat_id, digest_date, event_id, attempts, last_error FROM outbox WHERE state = 'failed'"
+        params: list = []
+        if digest_date:
+            sql += " AND digest_date = ?"
+            params.append(digest_date)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._read_conn().execute(sql, params).fetchall()]
+
+    def purge_outbox(self, before_date: str) -> int:
+        """Удаляет завершённые (sent/failed) записи дайджестов раньше before_date (YYYY-MM-DD)"""
+        with self._write_lock:
+            deleted = self.conn.execute(
+                "DELETE FROM outbox WHERE digest_date < ? AND state IN ('sent', 'failed')", (before_date,)
+            ).rowcount
+            self.conn.commit()
+        return deleted
 
     def get_events_by_date(self, month: int, day: int) -> List[Dict]:
         """Получает все события на заданную дату"""
-        event_date = f"{month:02d}-{day:02d}"
+        return self.get_events_by_dates([(month, day)])[(month, day)]
 
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            SELECT * FROM events WHERE event_date = ?
-            ORDER BY event_type, year DESC
-        """,
-            (event_date,),
-        )
+    def get_events_by_dates(self, dates: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        Получает события сразу на несколько дат
 
+        Args:
+            dates: Пары (месяц, день)
+
+        Returns:
+            Словарь {(месяц, день): [события со ссылками]}; для дат без событий — пустой список
+        """
+        keys: Dict[str, Tuple[int, int]] = {}
+        for month, day in dates:
+            keys[f"{month:02d}-{day:02d}"] = (month, day)
+
+        if self._index:
+            return {key: self._index.events_for(*key) for key in keys.values()}
+
+        result: Dict[Tuple[int, int], List[Dict]] = {key: [] for key in keys.values()}
+        if not keys:
+            return result
+
+        cursor = self._read_conn().cursor()
+        event_dates = list(keys)
         events = []
-        for row in cursor.fetchall():
-            event = dict(row)
-            # Получаем все ссылки для этого события
-            event["references"] = self.get_event_references(event["id"])
-            events.append(event)
+        for start in range(0, len(event_dates), _IN_CHUNK_SIZE):
+            chunk = event_dates[start:start + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"""
+                SELECT * FROM events WHERE event_date IN ({placeholders})
+                ORDER BY event_date, event_type, year DESC
+            """,
+                chunk,
+            )
+            events.extend(dict(row) for row in cursor.fetchall())
+
+        self._attach_references(events)
+        for event in events:
+            result[keys[event["event_date"]]].append(event)
+
+        return result
+
+    def _load_all_events(self) -> List[Dict]:
+        """Загружает все события со ссылками (для индекса в памяти)"""
+        cursor = self._read_conn().cursor()
+        cursor.execute("SELECT * FROM events ORDER BY event_date, event_type, year DESC")
+        return self._attach_references([dict(row) for row in cursor.fetchall()])
+
+    def _attach_references(self, events: List[Dict]) -> List[Dict]:
+        """Подгружает ссылки для списка событий пачкой запросов с IN (...) вместо запроса на каждое событие"""
+        events_by_id: Dict[int, Dict] = {}
+        for event in events:
+            event["references"] = []
+            events_by_id[event["id"]] = event
+
+        cursor = self._read_conn().cursor()
+        event_ids = list(events_by_id)
+        for start in range(0, len(event_ids), _IN_CHUNK_SIZE):
+            chunk = event_ids[start:start + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"""
+                SELECT * FROM event_references
+                WHERE event_id IN ({placeholders})
+                ORDER BY event_id, priority, id
+            """,
+                chunk,
+            )
+            for row in cursor.fetchall():
+                ref = self._row_to_reference(row)
+                events_by_id[ref["event_id"]]["references"].append(ref)
 
         return events
 
+    @staticmethod
+    def _row_to_reference(row: sqlite3.Row) -> Dict:
+        """Превращает строку event_references в словарь; metadata разбирается лениво (см. LazyMetadata)"""
+        ref = dict(row)
+        if ref["metadata"]:
+            ref["metadata"] = LazyMetadata(ref["metadata"])
+        return ref
+
     def get_event_references(self, event_id: int) -> List[Dict]:
         """Получает все ссылки для события"""
-        cursor = self.conn.cursor()
+        cursor = self._read_conn().cursor()
         cursor.execute(
             """
             SELECT * FROM event_references 
@@ -257,179 +1239,275 @@ class LiteraryCalendarDatabase:
             (event_id,),
         )
 
-        references = []
-        for row in cursor.fetchall():
-            ref = dict(row)
-            if ref["metadata"]:
-                ref["metadata"] = json.loads(ref["metadata"])
-            references.append(ref)
-
-        return references
+        return [self._row_to_reference(row) for row in cursor.fetchall()]
 
     def get_jubilees_by_year(self, target_year: int) -> List[Dict]:
         """Возвращает список событий-юбиляров для заданного года.
 
         Юбиляры — события с заполненным полем `year`, для которых
-        возраст в `target_year` оканчивается на 0 или 5.
+        возраст в `target_year` оканчивается на 0 или 5. Фильтрация
+        выполняется в SQL по индексированной колонке `birth_year`.
         """
-        cursor = self.conn.cursor()
+        cursor = self._read_conn().cursor()
         cursor.execute(
             """
             SELECT * FROM events
-            WHERE year IS NOT NULL AND TRIM(year) != ''
+            WHERE birth_year IS NOT NULL AND birth_year < ?
+              AND (? - birth_year) % 5 = 0
               AND event_type IN ('birthday', 'день рождения')
-            ORDER BY year ASC
-        """
+            ORDER BY birth_year ASC, year ASC
+        """,
+            (target_year, target_year),
         )
 
         results = []
         for row in cursor.fetchall():
             event = dict(row)
-            birth_year = None
+            event["age"] = target_year - event["birth_year"]
+            results.append(event)
 
-            reference_date = self.parse_reference_date(event.get("year"))
-            if reference_date:
-                birth_year = reference_date.year
+        return self._attach_references(results)
 
-            if not birth_year:
-                # Извлекаем год из названия события (костыль для исторических названий)
-                year_match = re.search(
-                    r"\b(1[0-9]{3}|2[0-2][0-9]{2})\b", event.get("title", "")
-                )
-                if year_match:
-                    birth_year = int(year_match.group(1))
+    @staticmethod
+    def _fts_match_query(query: str) -> str:
+        """Запрос пользователя -> выражение MATCH: все слова, каждое как префикс"""
+        words = re.findall(r"\w+", query or "")
+        return " ".join(f'"{word}"*' for word in words)
 
-            age = 0
-            if birth_year:
-                age = target_year - birth_year
+    def search_events(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Полнотекстовый поиск событий по заголовку, описанию, автору и книге
 
-            if age > 0 and (age % 10 == 0 or age % 10 == 5):
-                event["age"] = age
-                event["references"] = self.get_event_references(event["id"])
-                results.append(event)
+        Args:
+            query: Слова для поиска (ищутся все, каждое — как начало слова)
+            limit: Максимум результатов
 
-        results.sort(key=lambda e: e["age"], reverse=True)
-        return results
+        Returns:
+            События со ссылками, отсортированные по релевантности (bm25)
+        """
+        match = self._fts_match_query(query)
+        if not match:
+            return []
 
-    def import_from_csv(self, csv_path: str):
+        cursor = self._read_conn().cursor()
+        try:
+            # Веса столбцов bm25: заголовок важнее автора и книги, описание — меньше всего
+            cursor.execute(
+                """
+                SELECT e.* FROM events_fts
+                JOIN events e ON e.id = events_fts.rowid
+                WHERE events_fts MATCH ?
+                ORDER BY bm25(events_fts, 10.0, 1.0, 5.0, 5.0)
+                LIMIT ?
+            """,
+                (match, limit),
+            )
+        except sqlite3.OperationalError as e:
+            if "events_fts" not in str(e):
+                raise
+            # Нет FTS5 — медленный фолбэк с полным сканированием
+            conditions = []
+            params: List = []
+            for word in re.findall(r"\w+", query):
+                conditions.append(
+                    "(title LIKE ? OR description LIKE ? OR author_name LIKE ? OR book_title LIKE ?)"
+                )
+                params.extend([f"%{word}%"] * 4)
+            cursor.execute(
+                f"SELECT * FROM events WHERE {' AND '.join(conditions)} ORDER BY event_date LIMIT ?",
+                params + [limit],
+            )
+
+        return self._attach_references([dict(row) for row in cursor.fetchall()])
+
+    def import_from_csv(self, csv_path: str, chunk_size: int = 1000) -> Dict[str, int]:
         """
         Импортирует события из CSV файла
 
         Формат CSV:
         month,day,event_type,title,description,author_name,book_title,year,
         reference_type,reference_uuid,reference_slug,reference_name,priority,metadata_json
+
+        Строки одного события (по строке на ссылку) объединяются; повторный импорт
+        не создаёт дубликатов. Запись идёт порциями по chunk_size строк.
+
+        Returns:
+            Статистика импорта (см. BulkImporter.import_rows)
         """
-        with open(csv_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
+        from literary_calendar_io import BulkImporter
 
-            try:
-                self.conn.execute("BEGIN")
-                for row in reader:
-                    # Добавляем событие
-                    event_id = self.add_event(
-                        month=int(row["month"]),
-                        day=int(row["day"]),
-                        event_type=row["event_type"],
-                        title=row["title"],
-                        description=row.get("description") or None,
-                        author_name=row.get("author_name") or None,
-                        book_title=row.get("book_title") or None,
-                        year=row.get("year") or None,
-                        commit=False,
-                    )
-
-                    # Добавляем ссылки (если есть)
-                    if row.get("reference_type"):
-                        metadata = None
-                        if row.get("metadata_json"):
-                            try:
-                                metadata = json.loads(row["metadata_json"])
-                            except Exception:
-                                metadata = None
-
-                        self.add_reference(
-                            event_id=event_id,
-                            reference_type=row["reference_type"],
-                            reference_uuid=row.get("reference_uuid") or None,
-                            reference_slug=row.get("reference_slug") or None,
-                            reference_name=row.get("reference_name") or None,
-                            priority=int(row.get("priority", 0)),
-                            metadata=metadata,
-                            commit=False,
-                        )
-                self.conn.commit()
-            except Exception:
-                self.conn.rollback()
-                raise
+        return BulkImporter(self, chunk_size=chunk_size).import_file(csv_path)
 
-    def export_to_csv(self, csv_path: str):
-        """Экспортирует события в CSV файл"""
-        cursor = self.conn.cursor()
-        cursor.execute(
-            """
-            SELECT 
-                e.*,
-                r.reference_type,
-                r.reference_uuid,
-                r.reference_slug,
-                r.reference_name,
-                r.priority,
-                r.metadata
-            FROM events e
-            LEFT JOIN event_references r ON e.id = r.event_id
-            ORDER BY e.event_date, e.id, r.priority
+    def import_from_excel(self, xlsx_path: str, sheet_name: str = None, chunk_size: int = 1000) -> Dict[str, int]:
+        """Импортирует события из листа Excel (.xlsx) с теми же колонками, что и CSV"""
+        from literary_calendar_io import BulkImporter, iter_xlsx_rows
+
+        return BulkImporter(self, chunk_size=chunk_size).import_rows(iter_xlsx_rows(xlsx_path, sheet_name))
+
+    def export_to_csv(
+        self,
+        csv_path: str,
+        month: int = None,
+        event_type: str = None,
+        modified_since: Union[str, datetime, date] = None,
+        batch_size: int = 500,
+    ) -> int:
+        """
+        Экспортирует события в CSV файл (по строке на каждую ссылку)
+
+        Args:
+            csv_path: Путь к файлу
+            month: Только события этого месяца
+            event_type: Только события этого типа
+            modified_since: Только события, изменённые начиная с этого момента (UTC)
+            batch_size: Сколько строк читать из курсора за раз
+
+        Returns:
+            Количество записанных строк
         """
+        from literary_calendar_io import export_csv
+
+        return export_csv(
+            self, csv_path, month=month, event_type=event_type, modified_since=modified_since, batch_size=batch_size
         )
 
-        with open(csv_path, "w", encoding="utf-8", newline="") as f:
-            fieldnames = [
-                "month",
-                "day",
-                "event_type",
-                "title",
-                "description",
-                "author_name",
-                "book_title",
-                "year",
-                "reference_type",
-                "reference_uuid",
-                "reference_slug",
-                "reference_name",
-                "priority",
-                "metadata_json",
-            ]
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
+    def export_to_ndjson(
+        self,
+        ndjson_path: str,
+        month: int = None,
+        event_type: str = None,
+        modified_since: Union[str, datetime, date] = None,
+        batch_size: int = 500,
+    ) -> int:
+        """
+        Экспортирует события в NDJSON: по JSON-объекту на событие, ссылки вложены в "references"
 
-            for row in cursor.fetchall():
-                month, day = row["event_date"].split("-")
-                writer.writerow(
-                    {
-                        "month": month,
-                        "day": day,
-                        "event_type": row["event_type"],
-                        "title": row["title"],
-                        "description": row["description"] or "",
-                        "author_name": row["author_name"] or "",
-                        "book_title": row["book_title"] or "",
-                        "year": row["year"] or "",
-                        "reference_type": row["reference_type"] or "",
-                        "reference_uuid": row["reference_uuid"] or "",
-                        "reference_slug": row["reference_slug"] or "",
-                        "reference_name": row["reference_name"] or "",
-                        "priority": (
-                            row["priority"] if row["priority"] is not None else ""
-                        ),
-                        "metadata_json": row["metadata"] or "",
-                    }
-                )
+        Фильтры — как у export_to_csv. Возвращает количество записанных событий.
+        """
+        from literary_calendar_io import export_ndjson
+
+        return export_ndjson(
+            self, ndjson_path, month=month, event_type=event_type, modified_since=modified_since, batch_size=batch_size
+        )
 
     def close(self):
-        """Закрывает соединение с БД"""
+        """Закрывает соединение с БД (у общего экземпляра соединения живут до close_shared_databases)"""
+        if self._manager:
+            return
+        if self._index:
+            self._index.close()
+        self._close_stamp_probe()
         if self.conn:
             self.conn.close()
 
 
+class AsyncLiteraryCalendarDatabase:
+    """
+    Асинхронный фасад над LiteraryCalendarDatabase для обработчиков бота
+
+    Запросы выполняются в выделенном ограниченном пуле потоков, поэтому
+    медленный запрос или ожидание блокировки (busy_timeout) не останавливает
+    event loop. Работает поверх общего экземпляра (get_shared_database):
+    у каждого потока пула своё читающее соединение, запись сериализуется.
+    """
+
+    def __init__(self, db: LiteraryCalendarDatabase = None, max_workers: int = None):
+        if db is None:
+            db = get_shared_database()
+        if db._manager is None:
+            raise ValueError("AsyncLiteraryCalendarDatabase требует общий экземпляр БД (get_shared_database)")
+        if max_workers is None:
+            try:
+                from literary_calendar_bot_config import DB_THREADS
+
+                max_workers = DB_THREADS
+            except (ImportError, AttributeError):
+                max_workers = 4
+
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calendar-db")
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_events_by_date(self, month: int, day: int) -> List[Dict]:
+        return await self._run(self.db.get_events_by_date, month, day)
+
+    async def get_events_by_dates(self, dates: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], List[Dict]]:
+        return await self._run(self.db.get_events_by_dates, list(dates))
+
+    async def data_stamp(self) -> Tuple:
+        return await self._run(self.db.data_stamp)
+
+    async def add_subscriber(self, chat_id: str, send_hour: int, timezone: str) -> Dict:
+        return await self._run(self.db.add_subscriber, chat_id, send_hour, timezone)
+
+    async def remove_subscriber(self, chat_id: str) -> bool:
+        return await self._run(self.db.remove_subscriber, chat_id)
+
+    async def get_subscribers(self) -> List[Dict]:
+        return await self._run(self.db.get_subscribers)
+
+    async def enqueue_digest(self, chat_ids: Iterable[str], digest_date: str, event_ids: List[int]) -> int:
+        return await self._run(self.db.enqueue_digest, list(chat_ids), digest_date, event_ids)
+
+    async def lease_outbox(self, limit: int, lease_seconds: float) -> List[Dict]:
+        return await self._run(self.db.lease_outbox, limit, lease_seconds)
+
+    async def renew_outbox(self, entry_id: int, attempts: int, lease_seconds: float) -> bool:
+        return await self._run(self.db.renew_outbox, entry_id, attempts, lease_seconds)
+
+    async def complete_outbox(self, entry_id: int, attempts: int) -> bool:
+        return await self._run(self.db.complete_outbox, entry_id, attempts)
+
+    async def retry_outbox(self, entry_id: int, attempts: int, error: str, retry_at: Optional[float]) -> bool:
+        return await self._run(self.db.retry_outbox, entry_id, attempts, error, retry_at)
+
+    async def fail_outbox_chat(self, chat_id: str, error: str, entry_id: int, attempts: int) -> int:
+        return await self._run(self.db.fail_outbox_chat, chat_id, error, entry_id, attempts)
+
+    async def next_outbox_time(self) -> Optional[float]:
+        return await self._run(self.db.next_outbox_time)
+
+    async def outbox_stats(self, digest_date: str = None) -> Dict:
+        return await self._run(self.db.outbox_stats, digest_date)
+
+    async def purge_outbox(self, before_date: str) -> int:
+        return await self._run(self.db.purge_outbox, before_date)
+
+    async def get_event_references(self, event_id: int) -> List[Dict]:
+        return await self._run(self.db.get_event_references, event_id)
+
+    async def get_jubilees_by_year(self, target_year: int) -> List[Dict]:
+        return await self._run(self.db.get_jubilees_by_year, target_year)
+
+    async def search_events(self, query: str, limit: int = 20) -> List[Dict]:
+        return await self._run(self.db.search_events, query, limit)
+
+    async def add_event(self, *args, **kwargs) -> int:
+        return await self._run(self.db.add_event, *args, **kwargs)
+
+    async def add_reference(self, *args, **kwargs):
+        return await self._run(self.db.add_reference, *args, **kwargs)
+
+    async def import_from_csv(self, *args, **kwargs) -> Dict[str, int]:
+        return await self._run(self.db.import_from_csv, *args, **kwargs)
+
+    async def import_from_excel(self, *args, **kwargs) -> Dict[str, int]:
+        return await self._run(self.db.import_from_excel, *args, **kwargs)
+
+    async def export_to_csv(self, *args, **kwargs) -> int:
+        return await self._run(self.db.export_to_csv, *args, **kwargs)
+
+    async def export_to_ndjson(self, *args, **kwargs) -> int:
+        return await self._run(self.db.export_to_ndjson, *args, **kwargs)
+
+    def close(self):
+        """Останавливает пул потоков (уже запущенные запросы доработают)"""
+        self._executor.shutdown(wait=False)
+
+
 # Пример использования
 if __name__ == "__main__":
     db = LiteraryCalendarDatabase()
@@ -0,0 +1,453 @@
+"""
+Массовый импорт и экспорт событий литературного календаря (CSV/Excel/NDJSON)
+
+Импорт читает файл потоково, группирует строки по событию и пишет через
+executemany порциями в отдельных транзакциях. Повторный импорт того же файла
+ничего не дублирует: события и ссылки сверяются по естественному ключу.
+
+Экспорт читает курсор порциями (fetchmany) и пишет файл по мере чтения,
+не загружая всю выборку в память.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from literary_calendar_database import _IN_CHUNK_SIZE, LiteraryCalendarDatabase
+
+logger = logging.getLogger(__name__)
+
+# Колонки файла импорта/экспорта
+CSV_FIELDS = [
+    "month",
+    "day",
+    "event_type",
+    "title",
+    "description",
+    "author_name",
+    "book_title",
+    "year",
+    "reference_type",
+    "reference_uuid",
+    "reference_slug",
+    "reference_name",
+    "priority",
+    "metadata_json",
+]
+
+# Естественные ключи для идемпотентного импорта
+EventKey = Tuple[str, str, str, str]  # (event_date, event_type, title, year)
+ReferenceKey = Tuple[int, str, str, str, str]  # (event_id, type, uuid, slug, name)
+
+
+def iter_csv_rows(csv_path: str) -> Iterator[Dict]:
+    """Построчно читает CSV с заголовком"""
+    with open(csv_path, "r", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def iter_xlsx_rows(xlsx_path: str, sheet_name: Optional[str] = None) -> Iterator[Dict]:
+    """Построчно читает лист Excel (первая строка — заголовок) в потоковом режиме openpyxl"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Для импорта .xlsx установите openpyxl: pip install openpyxl") from e
+
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        columns = [str(name).strip() if name is not None else "" for name in header]
+        for values in rows:
+            if not values or all(value is None for value in values):
+                continue
+            yield dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def _text(value) -> Optional[str]:
+    """Значение ячейки как строка (пустые — None)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value_str = str(value).strip()
+    return value_str or None
+
+
+class BulkImporter:
+    """Потоковый импорт событий и ссылок порциями через executemany"""
+
+    def __init__(self, db: LiteraryCalendarDatabase, chunk_size: int = 1000):
+        self.db = db
+        self.chunk_size = chunk_size
+        self._event_ids: Dict[EventKey, int] = {}
+        self._known_references: Set[ReferenceKey] = set()
+        self._loaded_reference_events: Set[int] = set()
+
+    def import_file(self, path: str, sheet_name: Optional[str] = None) -> Dict[str, int]:
+        """Импортирует .csv или .xlsx (по расширению файла)"""
+        if path.lower().endswith((".xlsx", ".xlsm")):
+            return self.import_rows(iter_xlsx_rows(path, sheet_name))
+        return self.import_rows(iter_csv_rows(path))
+
+    def import_rows(self, rows: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Импортирует строки формата CSV_FIELDS
+
+        Returns:
+            Статистика: rows, events_added, events_existing, references_added, references_skipped
+        """
+        stats = dict.fromkeys(
+            ("rows", "events_added", "events_existing", "references_added", "references_skipped"), 0
+        )
+        conn = self.db.conn
+
+        with self.db._write_lock:
+            saved_pragmas = self._tune_pragmas(conn)
+            try:
+                self._load_existing_events(conn)
+
+                batch: List[Dict] = []
+                for row in rows:
+                    stats["rows"] += 1
+                    batch.append(row)
+                    if len(batch) >= self.chunk_size:
+                        self._flush(conn, batch, stats)
+                        batch = []
+                if batch:
+                    self._flush(conn, batch, stats)
+            finally:
+                self._restore_pragmas(conn, saved_pragmas)
+
+        logger.info("Импорт завершён: %s", stats)
+        return stats
+
+    @staticmethod
+    def _tune_pragmas(conn) -> Dict[str, int]:
+        """Ускоряющие прагмы на время загрузки; возвращает прежние значения"""
+        saved = {
+            "synchronous": conn.execute("PRAGMA synchronous").fetchone()[0],
+            "cache_size": conn.execute("PRAGMA cache_size").fetchone()[0],
+            "temp_store": conn.execute("PRAGMA temp_store").fetchone()[0],
+        }
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -65536")  # 64 МБ
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return saved
+
+    @staticmethod
+    def _restore_pragmas(conn, saved: Dict[str, int]):
+        for name, value in saved.items():
+            conn.execute(f"PRAGMA {name} = {int(value)}")
+
+    def _load_existing_events(self, conn):
+        """Ключи уже существующих событий"""
+        self._event_ids = {}
+        for row in conn.execute("SELECT id, event_date, event_type, title, year FROM events"):
+            key = (row["event_date"], row["event_type"], row["title"], row["year"] or "")
+            self._event_ids.setdefault(key, row["id"])
+        self._known_references = set()
+        self._loaded_reference_events = set()
+
+    @staticmethod
+    def _next_free_event_id(conn) -> int:
+        """Следующий свободный id события (вызывать внутри транзакции записи)"""
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+        seq_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        return max(max_id, seq_row[0] if seq_row else 0) + 1
+
+    def _load_existing_references(self, conn, event_ids: Iterable[int]) -> int:
+        """Подгружает ключи ссылок существующих событий (один раз на событие); возвращает число событий"""
+        pending = [event_id for event_id in set(event_ids) if event_id not in self._loaded_reference_events]
+        for start in range(0, len(pending), _IN_CHUNK_SIZE):
+            chunk = pending[start:start + _IN_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"""
+                SELECT event_id, reference_type, reference_uuid, reference_slug, reference_name
+                FROM event_references WHERE event_id IN ({placeholders})
+            """,
+                chunk,
+            ):
+                self._known_references.add(
+                    (
+                        row["event_id"],
+                        row["reference_type"],
+                        row["reference_uuid"] or "",
+                        row["reference_slug"] or "",
+                        row["reference_name"] or "",
+                    )
+                )
+            self._loaded_reference_events.update(chunk)
+        return len(pending)
+
+    def _flush(self, conn, rows: List[Dict], stats: Dict[str, int]):
+        """Записывает порцию строк одной транзакцией"""
+        # id новым событиям выдаются внутри транзакции: пока идёт импорт, события
+        # может добавить и другой процесс (например, веб-редактор)
+        new_events: Dict[EventKey, Tuple] = {}
+        pending_references: List[Tuple[EventKey, Tuple]] = []
+        existing_ids: List[int] = []
+
+        for row in rows:
+            month = int(float(row["month"]))
+            day = int(float(row["day"]))
+            event_type = _text(row.get("event_type")) or ""
+            title = _text(row.get("title")) or ""
+            raw_year = row.get("year")
+            if isinstance(raw_year, (int, float)):
+                raw_year = _text(raw_year)
+            year = LiteraryCalendarDatabase.normalize_reference_date(raw_year)
+            key = (f"{month:02d}-{day:02d}", event_type, title, year or "")
+
+            if key not in self._event_ids and key not in new_events:
+                new_events[key] = (
+                    key[0],
+                    event_type,
+                    title,
+                    _text(row.get("description")),
+                    _text(row.get("author_name")),
+                    _text(row.get("book_title")),
+                    year,
+                    LiteraryCalendarDatabase.derive_birth_year(year, title),
+                )
+                stats["events_added"] += 1
+            elif key in self._event_ids and self._event_ids[key] not in self._loaded_reference_events:
+                existing_ids.append(self._event_ids[key])
+
+            reference_type = _text(row.get("reference_type"))
+            if not reference_type:
+                continue
+
+            metadata_json = None
+            cover_url = None
+            raw_metadata = _text(row.get("metadata_json"))
+            if raw_metadata:
+                try:
+                    metadata = json.loads(raw_metadata)
+                    metadata_json = json.dumps(metadata) if metadata else None
+                    cover_url = LiteraryCalendarDatabase.extract_cover_url(metadata)
+                except Exception:
+                    metadata_json = None
+
+            pending_references.append(
+                (
+                    key,
+                    (
+                        reference_type,
+                        _text(row.get("reference_uuid")),
+                        _text(row.get("reference_slug")),
+                        _text(row.get("reference_name")),
+                        int(float(_text(row.get("priority")) or 0)),
+                        metadata_json,
+                        cover_url,
+                    ),
+                )
+            )
+
+        stats["events_existing"] += self._load_existing_references(conn, existing_ids)
+
+        try:
+            # IMMEDIATE: id выдаются и вставляются под блокировкой записи, без гонки с другими писателями
+            conn.execute("BEGIN IMMEDIATE")
+            next_id = self._next_free_event_id(conn)
+            new_event_rows: List[Tuple] = []
+            for event_id, (key, values) in enumerate(new_events.items(), start=next_id):
+                self._event_ids[key] = event_id
+                # Только что созданное событие: ссылок в БД у него ещё нет
+                self._loaded_reference_events.add(event_id)
+                new_event_rows.append((event_id,) + values)
+
+            new_references: List[Tuple] = []
+            for key, reference in pending_references:
+                reference_type, ref_uuid, ref_slug, ref_name, priority, metadata_json, cover_url = reference
+                event_id = self._event_ids[key]
+                ref_key = (event_id, reference_type, ref_uuid or "", ref_slug or "", ref_name or "")
+                if ref_key in self._known_references:
+                    stats["references_skipped"] += 1
+                    continue
+                self._known_references.add(ref_key)
+                new_references.append(
+                    (event_id, reference_type, ref_uuid, ref_slug, ref_name, priority, metadata_json, cover_url)
+                )
+                stats["references_added"] += 1
+
+            conn.executemany(
+                """
+                INSERT INTO events
+                (id, event_date, event_type, title, description, author_name, book_title, year, birth_year)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                new_event_rows,
+            )
+            conn.executemany(
+                """
+                INSERT INTO event_references
+                (event_id, reference_type, reference_uuid, reference_slug, reference_name, priority, metadata, cover_url)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                new_references,
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _modified_since_value(value: Union[str, datetime, date]) -> str:
+    """Момент для сравнения с updated_at/created_at (формат CURRENT_TIMESTAMP, UTC)"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return f"{value.isoformat()} 00:00:00"
+    return str(value).strip().replace("T", " ")
+
+
+def iter_export_rows(
+    db: LiteraryCalendarDatabase,
+    month: Optional[int] = None,
+    event_type: Optional[str] = None,
+    modified_since: Union[str, datetime, date, None] = None,
+    batch_size: int = 500,
+) -> Iterator:
+    """
+    Строки events × event_references (LEFT JOIN), отсортированные по дате и событию
+
+    Фильтры применяются в SQL; курсор читается порциями по batch_size строк.
+    """
+    conditions: List[str] = []
+    params: List = []
+    if month is not None:
+        # Диапазон вместо LIKE, чтобы работал индекс по event_date
+        conditions.append("e.event_date BETWEEN ? AND ?")
+        params.extend((f"{int(month):02d}-00", f"{int(month):02d}-99"))
+    if event_type:
+        conditions.append("e.event_type = ?")
+        params.append(event_type)
+    if modified_since is not None:
+        conditions.append("COALESCE(e.updated_at, e.created_at) >= ?")
+        params.append(_modified_since_value(modified_since))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = db._read_conn().cursor()
+    cursor.execute(
+        f"""
+        SELECT
+            e.*,
+            r.id AS reference_id,
+            r.reference_type,
+            r.reference_uuid,
+            r.reference_slug,
+            r.reference_name,
+            r.priority,
+            r.metadata
+        FROM events e
+        LEFT JOIN event_references r ON e.id = r.event_id
+        {where}
+        ORDER BY e.event_date, e.id, r.priority, r.id
+    """,
+        params,
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def export_csv(db: LiteraryCalendarDatabase, csv_path: str, batch_size: int = 500, **filters) -> int:
+    """Пишет CSV (по строке на ссылку) в формате CSV_FIELDS; возвращает число строк"""
+    written = 0
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+        for row in iter_export_rows(db, batch_size=batch_size, **filters):
+            month, day = row["event_date"].split("-")
+            writer.writerow(
+                {
+                    "month": month,
+                    "day": day,
+                    "event_type": row["event_type"],
+                    "title": row["title"],
+                    "description": row["description"] or "",
+                    "author_name": row["author_name"] or "",
+                    "book_title": row["book_title"] or "",
+                    "year": row["year"] or "",
+                    "reference_type": row["reference_type"] or "",
+                    "reference_uuid": row["reference_uuid"] or "",
+                    "reference_slug": row["reference_slug"] or "",
+                    "reference_name": row["reference_name"] or "",
+                    "priority": (
+                        row["priority"] if row["priority"] is not None else ""
+                    ),
+                    "metadata_json": row["metadata"] or "",
+                }
+            )
+            written += 1
+    return written
+
+
+def export_ndjson(db: LiteraryCalendarDatabase, ndjson_path: str, batch_size: int = 500, **filters) -> int:
+    """Пишет NDJSON: по объекту на событие со вложенными ссылками; возвращает число событий"""
+    written = 0
+    current: Optional[Dict] = None
+
+    with open(ndjson_path, "w", encoding="utf-8") as f:
+
+        def flush():
+            nonlocal written
+            if current is not None:
+                f.write(json.dumps(current, ensure_ascii=False) + "\n")
+                written += 1
+
+        for row in iter_export_rows(db, batch_size=batch_size, **filters):
+            # Строки одного события идут подряд (ORDER BY e.event_date, e.id)
+            if current is None or current["id"] != row["id"]:
+                flush()
+                month, day = row["event_date"].split("-")
+                current = {
+                    "id": row["id"],
+                    "month": int(month),
+                    "day": int(day),
+                    "event_type": row["event_type"],
+                    "title": row["title"],
+                    "description": row["description"],
+                    "author_name": row["author_name"],
+                    "book_title": row["book_title"],
+                    "year": row["year"],
+                    "updated_at": row["updated_at"] or row["created_at"],
+                    "references": [],
+                }
+
+            if row["reference_id"] is not None:
+                metadata = None
+                if row["metadata"]:
+                    try:
+                        metadata = json.loads(row["metadata"])
+                    except ValueError:
+                        metadata = row["metadata"]
+                current["references"].append(
+                    {
+                        "reference_type": row["reference_type"],
+                        "reference_uuid": row["reference_uuid"],
+                        "reference_slug": row["reference_slug"],
+                        "reference_name": row["reference_name"],
+                        "priority": row["priority"],
+                        "metadata": metadata,
+                    }
+                )
+        flush()
+
+    return written
@@ -4,9 +4,11 @@
 """
 
 import asyncio
+import html
 import logging
 import os
 from datetime import datetime
+from zoneinfo import ZoneInfo
 
 from time_utils import now_tz
 from dotenv import load_dotenv
@@ -46,6 +48,9 @@ class BotWithCommands:
             "/send_events_for_today - События на сегодня\n"
             "/choose_date - Выбрать дату из календаря\n"
             "/jubilee - Показать юбиляров за выбранный год\n"
+            "/search - Найти события по словам\n"
+            "/subscribe - Получать события каждый день\n"
+            "/unsubscribe - Отписаться от рассылки\n"
             "/help - Помощь"
         )
 
@@ -58,6 +63,9 @@ class BotWithCommands:
     /send_events_for_today — Получить события на сегодня
     /choose_date — Выбрать дату из календаря
     /jubilee — Показать юбиляров за выбранный год
+    /search &lt;слова&gt; — Найти события по названию, описанию, автору или книге
+    /subscribe [час] — Получать события каждый день (по умолчанию в {send_hour}:00)
+    /unsubscribe — Отписаться от ежедневной рассылки
     /help — Показать эту справку
 
     <b>Как использовать:</b>
@@ -70,6 +78,7 @@ class BotWithCommands:
     Для каждого события предоставляются ссылки на книги в приложении «Свет».
     Вопросы и предложения: svet@rsl.ru
         """
+        help_text = help_text.replace("{send_hour}", str(self.literary_bot.send_hour))
         await update.message.reply_text(help_text, parse_mode='HTML')
 
     async def send_events_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -77,10 +86,67 @@ class BotWithCommands:
         chat_id = update.effective_chat.id
         
         await update.message.reply_text("🔍 Ищу события на сегодня...")
-        await self.literary_bot.send_daily_digest(chat_id=str(chat_id))
+        await self.literary_bot.send_daily_digest(
+            chat_id=str(chat_id), deadline=self.literary_bot.new_command_deadline()
+        )
         
         logger.info(f"Команда send_events_for_today выполнена для чата {chat_id}")
 
+    async def subscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /subscribe [час] - подписка на ежедневную рассылку"""
+        chat_id = update.effective_chat.id
+        send_hour = None
+        if context.args:
+            try:
+                send_hour = int(context.args[0].split(':')[0])
+            except ValueError:
+                send_hour = -1
+            if not 0 <= send_hour <= 23:
+                await update.message.reply_text("⏰ Укажите час от 0 до 23, например: /subscribe 9")
+                return
+
+        subscriber = await self.literary_bot.subscribe(str(chat_id), send_hour)
+        next_send = subscriber['next_send_at'].astimezone(ZoneInfo(subscriber['timezone']))
+        await update.message.reply_text(
+            f"📬 Вы подписаны на ежедневную рассылку в {subscriber['send_hour']:02d}:00 "
+            f"({subscriber['timezone']}).\n"
+            f"Ближайшая — {next_send.strftime('%d.%m в %H:%M')}. Отписаться: /unsubscribe"
+        )
+        logger.info(f"Чат {chat_id} подписан на рассылку в {subscriber['send_hour']}:00")
+
+    async def unsubscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /unsubscribe - отписка от ежедневной рассылки"""
+        chat_id = update.effective_chat.id
+        if await self.literary_bot.unsubscribe(str(chat_id)):
+            await update.message.reply_text("📭 Вы отписаны от ежедневной рассылки.")
+            logger.info(f"Чат {chat_id} отписан от рассылки")
+        else:
+            await update.message.reply_text("Подписки не было. Подписаться: /subscribe")
+
+    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /search <слова> - полнотекстовый поиск по событиям"""
+        query = " ".join(context.args or []).strip()
+        if not query:
+            await update.message.reply_text("🔎 Укажите слова для поиска, например: /search Пушкин")
+            return
+
+        events = await self.literary_bot.search_events(query, limit=10)
+        if not events:
+            await update.message.reply_text(
+                f"🔎 По запросу «{html.escape(query)}» ничего не найдено.",
+                parse_mode='HTML'
+            )
+            return
+
+        lines = [f"🔎 <b>Найдено по запросу «{html.escape(query)}»:</b>\n"]
+        for event in events:
+            month, _, day = (event.get('event_date') or '').partition('-')
+            lines.append(f"• {day}.{month} — {html.escape(event.get('title') or 'Без названия')}")
+        lines.append("\nВыберите дату через /choose_date, чтобы получить подробности.")
+
+        await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+        logger.info(f"Поиск '{query}' для чата {update.effective_chat.id}: {len(events)} результатов")
+
     async def jubilee_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /jubilee - открывает упрощённый селектор годов."""
         # Помечаем режим, чтобы callback знал, что это выбор года для юбилеев
@@ -157,13 +223,15 @@ class BotWithCommands:
             chat_id: ID чата
             date: Выбранная дата
         """
+        # Бюджет на ответ: по истечении книги берутся только из кэша
+        deadline = self.literary_bot.new_command_deadline()
         try:
-            # Получаем события на выбранную дату
-            events = await self.literary_bot.get_events_by_date(date)
+            # События на выбранную дату: дайджест готовится один раз на дату для всех чатов
+            build = await self.literary_bot.get_digest(date, deadline=deadline)
             
-            if not events:
+            if not build.events:
                 date_str = date.strftime('%d %B %Y')
-                await self.literary_bot.bot.send_message(
+                await self.literary_bot.sender.send_message(
                     chat_id=chat_id,
                     text=f"📅 <b>{date_str}</b>\n\n"
                          f"На этот день в календаре пока что нет событий.",
@@ -171,22 +239,20 @@ class BotWithCommands:
                 )
                 return
             
-            # Отправляем каждое событие отдельным сообщением (вариант А)
-            for event in events:
-                try:
-                    # Используем новую логику из send_daily_digest
-                    await self._send_event_with_media(chat_id, event)
-                except Exception as inner_e:
-                    logger.error(f"Ошибка отправки события '{event.get('title')}' на дату {date}: {inner_e}", exc_info=True)
-                    await self.literary_bot.bot.send_message(
-                        chat_id=chat_id,
-                        text=f"⚠️ Не удалось отправить событие: {event.get('title')}",
-                        parse_mode='HTML'
-                    )
+            async def report_failed(event: dict, error: Exception):
+                await self.literary_bot.sender.send_message(
+                    chat_id=chat_id,
+                    text=f"⚠️ Не удалось отправить событие: {event.get('title')}",
+                    parse_mode='HTML'
+                )
+
+            # Отправляем каждое событие отдельным сообщением (вариант А):
+            # события готовятся параллельно, уходят в порядке календаря
+            await self.literary_bot.send_digest(str(chat_id), build, on_error=report_failed)
                 
         except Exception as e:
             logger.error(f"Ошибка отправки событий на дату {date}: {e}", exc_info=True)
-            await self.literary_bot.bot.send_message(
+            await self.literary_bot.sender.send_message(
                 chat_id=chat_id,
                 text="❌ Произошла ошибка при получении событий. Попробуйте позже.",
                 parse_mode='HTML'
@@ -196,13 +262,6 @@ class BotWithCommands:
         """Получает и отправляет список юбиляров для указанного года."""
         await self.literary_bot.send_jubilees_for_year(str(chat_id), year)
 
-    async def _send_event_with_media(self, chat_id: int, event: dict):
-        """
-        Отправляет одно событие с обложками (media_group) + текст.
-        Использует универсальный метод из LiteraryCalendarBot.
-        """
-        await self.literary_bot.send_event_with_media(str(chat_id), event)
-
     async def setup_handlers(self):
         """Настройка обработчиков команд"""
         self.app.add_handler(CommandHandler("start", self.start_command))
@@ -210,6 +269,9 @@ class BotWithCommands:
         self.app.add_handler(CommandHandler("send_events_for_today", self.send_events_command))
         self.app.add_handler(CommandHandler("choose_date", self.choose_date_command))
         self.app.add_handler(CommandHandler("jubilee", self.jubilee_command))
+        self.app.add_handler(CommandHandler("search", self.search_command))
+        self.app.add_handler(CommandHandler("subscribe", self.subscribe_command))
+        self.app.add_handler(CommandHandler("unsubscribe", self.unsubscribe_command))
         
         # Обработчик для календаря
         self.app.add_handler(CallbackQueryHandler(self.calendar_callback, pattern='^cal_'))
@@ -221,6 +283,8 @@ class BotWithCommands:
         print("   /start - Начать работу")
         print("   /send_events_for_today - События на сегодня")
         print("   /choose_date - Выбрать дату")
+        print("   /search - Поиск событий")
+        print("   /subscribe, /unsubscribe - Ежедневная рассылка")
         print("   /help - Помощь")
 
         max_retries = 3
@@ -235,7 +299,8 @@ class BotWithCommands:
                 await self.app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
                 logger.info("✅ Успешно подключено к Telegram API")
                 try:
-                    await asyncio.Event().wait()
+                    # Рассылка подписчикам по расписанию работает рядом с polling
+                    await self._supervise_broadcast()
                 finally:
                     await self._shutdown_app()
                 return
@@ -249,6 +314,17 @@ class BotWithCommands:
                     logger.error(f"❌ Не удалось подключиться после {max_retries} попыток")
                     raise
 
+    async def _supervise_broadcast(self, restart_delay: float = 30):
+        """Планировщик рассылки: если он упал, ошибка логируется и он перезапускается"""
+        while True:
+            try:
+                await self.literary_bot.run_daily()
+                logger.warning("⚠️ Планировщик рассылки остановился")
+            except Exception as e:
+                logger.error(f"❌ Планировщик рассылки упал: {e}", exc_info=True)
+            logger.info(f"Перезапуск планировщика рассылки через {restart_delay} секунд...")
+            await asyncio.sleep(restart_delay)
+
     async def _shutdown_app(self):
         """Останавливает приложение и освобождает ресурсы"""
         if not self.app:
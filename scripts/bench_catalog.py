@@ -0,0 +1,222 @@
+"""
+Бенчмарк клиента каталога на заглушке HTTP с искусственной задержкой
+
+Сеть не нужна: GraphQLClient ходит в StubCatalogTransport (httpx), который отвечает
+выдуманными книгами после задержки base ± 20%, а с вероятностью tail — в tail_factor раз дольше.
+Печатает число HTTP-запросов и p50/p99.
+
+Сценарии:
+    prefetch — сбор книг для дайджеста: отдельные запросы на каждое событие
+               против одного документа с алиасами (prefetch_for_events) и ответов из кэша
+    hedging  — хвостовая задержка одиночных запросов без дублирования и с hedge_budget
+
+Запуск:
+    python scripts/bench_catalog.py --events 20 --runs 30 --latency-ms 40
+    python scripts/bench_catalog.py hedging --requests 1000 --hedge-budget 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clients.cache import TTLCache  # noqa: E402
+from clients.graphql_client import GraphQLClient  # noqa: E402
+from clients.limiter import percentile  # noqa: E402
+
+ENDPOINT = "http://catalog.stub/graphql"
+
+
+class StubCatalogTransport(httpx.AsyncBaseTransport):
+    """
+    Заглушка GraphQL API каталога
+
+    Понимает одиночные запросы GraphQLClient и пакетные документы с алиасами (q0: books(...), ...),
+    на каждую выборку отвечает несколькими книгами. Считает запросы по имени операции.
+    """
+
+    _OPERATION_RE = re.compile(r"query\s+(\w+)")
+    _ALIAS_RE = re.compile(r"(q\d+):\s*(books|tags|category)\(")
+
+    def __init__(self, latency: float, tail: float = 0.0, tail_factor: float = 10.0, seed: int = 0):
+        self.latency = latency
+        self.tail = tail
+        self.tail_factor = tail_factor
+        self.requests: Counter = Counter()
+        self._random = random.Random(seed)
+
+    def delay(self) -> float:
+        delay = self.latency * self._random.uniform(0.8, 1.2)
+        if self._random.random() < self.tail:
+            delay *= self.tail_factor
+        return delay
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        query, variables = payload["query"], payload.get("variables") or {}
+        match = self._OPERATION_RE.search(query)
+        operation = match.group(1) if match else "anonymous"
+        self.requests[operation] += 1
+        await asyncio.sleep(self.delay())
+
+        aliases = self._ALIAS_RE.findall(query)
+        if aliases:
+            data = {alias: self._field(field, variables, f"{alias}_") for alias, field in aliases}
+        else:
+            field = {"GetBooksByTag": "tags", "GetBooksByCategory": "category"}.get(operation, "books")
+            data = {field: self._field(field, variables, "")}
+        return httpx.Response(200, json={"data": data}, request=request)
+
+    def _field(self, field: str, variables: Dict, prefix: str):
+        if field == "books" and prefix + "bookUuids" in variables:
+            return [self._book(book_uuid) for book_uuid in variables[prefix + "bookUuids"]]
+        key = next((str(value) for name, value in variables.items() if name.startswith(prefix)), "x")
+        books = [self._book(f"{key}-{i}") for i in range(3)]
+        if field == "tags":
+            return [{"uuid": key, "name": key, "books": books}]
+        if field == "category":
+            return {"uuid": key, "name": key, "books": books}
+        return books
+
+    @staticmethod
+    def _book(book_uuid: str) -> Dict:
+        return {
+            "uuid": book_uuid,
+            "name": f"Книга {book_uuid}",
+            "slug": book_uuid,
+            "annotation": "",
+            "image": {"url": f"https://covers.stub/{book_uuid}.jpg"},
+        }
+
+    @property
+    def total(self) -> int:
+        return sum(self.requests.values())
+
+
+async def make_client(transport: StubCatalogTransport, **kwargs) -> GraphQLClient:
+    """GraphQLClient поверх заглушки; кэш только в памяти"""
+    client = GraphQLClient(ENDPOINT, cache_factory=lambda namespace: TTLCache(), **kwargs)
+    await client.aclose()
+    client._http = httpx.AsyncClient(transport=transport)
+    return client
+
+
+def make_events(count: int, run: int) -> List[Dict]:
+    """События дня: по два автора, тег, категория и три книги без обложки; теги частично общие"""
+    events = []
+    for i in range(count):
+        prefix = f"r{run}e{i}"
+        events.append(
+            {
+                "title": f"Событие {i}",
+                "author_refs": [{"uuid": f"{prefix}-author{j}"} for j in range(2)],
+                "tag_refs": [{"uuid": f"r{run}-tag{i % 5}"}],
+                "category_refs": [{"uuid": f"{prefix}-category"}],
+                "book_references": [{"uuid": f"{prefix}-book{j}", "cover_url": ""} for j in range(3)],
+            }
+        )
+    return events
+
+
+async def lookup_event(client: GraphQLClient, event: Dict):
+    """Те же обращения к каталогу, что делает DigestService.collect_books_and_links для события"""
+    return await asyncio.gather(
+        client.get_books_by_uuids([ref["uuid"] for ref in event["book_references"]]),
+        *(client.get_books_by_author(ref["uuid"]) for ref in event["author_refs"]),
+        *(client.get_books_by_tag(ref["uuid"]) for ref in event["tag_refs"]),
+        *(client.get_books_by_category(ref["uuid"]) for ref in event["category_refs"]),
+    )
+
+
+async def collect_digest(client: GraphQLClient, events: List[Dict], prefetch: bool):
+    if prefetch:
+        await client.prefetch_for_events(events)
+    await asyncio.gather(*(lookup_event(client, event) for event in events))
+
+
+def report(title: str, latencies: List[float], requests: float, extra: str = ""):
+    p50 = percentile(latencies, 0.5) * 1000
+    p99 = percentile(latencies, 0.99) * 1000
+    line = f"  {title:<28} запросов: {requests:>7g}   p50: {p50:>7.1f} мс   p99: {p99:>7.1f} мс"
+    print(line + (f"   {extra}" if extra else ""))
+
+
+async def bench_prefetch(args):
+    print(f"📦 Дайджест: событий {args.events}, прогонов {args.runs} (запросы и задержка — на один дайджест)")
+    for title, prefetch in (("по запросу на событие", False), ("prefetch с алиасами", True)):
+        transport = StubCatalogTransport(args.latency_ms / 1000, args.tail, args.tail_factor, args.seed)
+        latencies = []
+        for run in range(args.runs):
+            # Новый клиент на прогон: холодный кэш, как у первого дайджеста дня
+            client = await make_client(transport, hedge_budget=0.0)
+            events = make_events(args.events, run)
+            started = time.perf_counter()
+            await collect_digest(client, events, prefetch)
+            latencies.append(time.perf_counter() - started)
+            await client.aclose()
+        report(title, latencies, transport.total / args.runs)
+
+
+async def bench_hedging(args):
+    print(
+        f"🐢 Одиночные запросы книг автора: {args.requests}, параллельно {args.concurrency} "
+        f"(медленных ответов {args.tail:.0%}, в {args.tail_factor:g} раз дольше)"
+    )
+    for title, budget in (("без дублирования", 0.0), (f"hedge_budget={args.hedge_budget:g}", args.hedge_budget)):
+        transport = StubCatalogTransport(args.latency_ms / 1000, args.tail, args.tail_factor, args.seed)
+        client = await make_client(transport, hedge_budget=budget)
+        author_uuids = iter(range(args.requests))
+        latencies = []
+
+        async def worker():
+            # Все UUID разные: каждый вызов — промах кэша и настоящий запрос
+            for author_uuid in author_uuids:
+                started = time.perf_counter()
+                await client.get_books_by_author(f"author{author_uuid}")
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        stats = client.hedging_stats()
+        await client.aclose()
+        report(title, latencies, transport.total, f"дублей: {stats['hedges_sent']}, выиграли: {stats['hedges_won']}")
+
+
+SCENARIOS = {"prefetch": bench_prefetch, "hedging": bench_hedging}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк клиента каталога на заглушке HTTP")
+    parser.add_argument("scenario", nargs="*", help=f"Сценарии: {', '.join(SCENARIOS)} (по умолчанию все)")
+    parser.add_argument("--events", type=int, default=20, help="Событий в дайджесте")
+    parser.add_argument("--runs", type=int, default=30, help="Прогонов дайджеста")
+    parser.add_argument("--requests", type=int, default=1000, help="Одиночных запросов в сценарии hedging")
+    parser.add_argument("--concurrency", type=int, default=4, help="Параллельных запросов в сценарии hedging")
+    parser.add_argument("--hedge-budget", type=float, default=0.1, help="Доля дублей в сценарии hedging")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Обычная задержка ответа, мс")
+    parser.add_argument("--tail", type=float, default=0.05, help="Доля медленных ответов")
+    parser.add_argument("--tail-factor", type=float, default=10.0, help="Во сколько раз медленный ответ дольше")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора задержек")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenario if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.ERROR)
+    for name in args.scenario or SCENARIOS:
+        asyncio.run(SCENARIOS[name](args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""
+Разовая отправка ежедневного дайджеста (для cron / GitHub Actions)
+
+Отправляет дайджест всем подписчикам, у которых час рассылки сегодня уже прошёл,
+а сегодняшний дайджест ещё не получен (включая подписавшихся после своего часа).
+Подписчики с более поздним часом получат дайджест при следующем запуске после него —
+поэтому cron запускают ежечасно. В GROUP_CHAT_ID (если задан) дайджест уходит
+только при запуске в час SEND_HOUR (по TIMEZONE) или с флагом --force-group.
+Дайджест готовится один раз на всех получателей.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from dotenv import load_dotenv
+
+from literary_calendar_bot import LiteraryCalendarBot
+from time_utils import now_tz
+
+logger = logging.getLogger(__name__)
+
+
+async def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Разовая отправка ежедневного дайджеста")
+    parser.add_argument(
+        "--force-group", action="store_true", help="отправить дайджест в GROUP_CHAT_ID независимо от часа"
+    )
+    args = parser.parse_args(argv)
+    load_dotenv()
+    from literary_calendar_bot_config import (
+        BOT_TOKEN,
+        CALENDAR_URL,
+        GRAPHQL_ENDPOINT,
+        GROUP_CHAT_ID,
+        SEND_HOUR,
+        TIMEZONE,
+    )
+
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN не задан. Укажите его в переменных окружения или в файле .env")
+        return 1
+
+    bot = LiteraryCalendarBot(
+        bot_token=BOT_TOKEN,
+        calendar_url=CALENDAR_URL,
+        graphql_endpoint=GRAPHQL_ENDPOINT,
+        timezone=TIMEZONE,
+        send_hour=SEND_HOUR,
+    )
+    try:
+        if GROUP_CHAT_ID:
+            # Ежечасные запуски не должны слать дайджест в группу каждый час
+            if args.force_group or now_tz(TIMEZONE).hour == SEND_HOUR:
+                await bot.send_daily_digest(GROUP_CHAT_ID)
+                logger.info(f"Дайджест отправлен в чат {GROUP_CHAT_ID}")
+            else:
+                logger.info(f"Дайджест в чат {GROUP_CHAT_ID} уходит в {SEND_HOUR}:00 ({TIMEZONE}), сейчас пропускаем")
+        await bot.broadcast.load(catch_up=True)
+        planned = await bot.broadcast.send_due()
+        # Отправляем всё из outbox, в том числе недоотправленное прошлым запуском
+        sent = await bot.broadcast.drain()
+        logger.info(f"Дайджест поставлен в рассылку подписчикам: {planned}, отправлено сообщений: {sent}")
+        logger.info(f"Прогресс рассылки: {await bot.broadcast.progress()}")
+    finally:
+        await bot.aclose()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,447 @@
+"""
+Ежедневная рассылка дайджеста подписчикам
+
+Расписание — min-heap ближайших отправок (время UTC, chat_id): планировщик спит
+ровно до ближайшей отправки или до изменения подписок, ставит дайджест всем,
+у кого подошло время, в outbox и переносит их на следующий день.
+
+Outbox — таблица в SQLite с записью на каждое (чат, дата, событие): отправители
+забирают записи в аренду, отмечают отправленные, повторяют неудачные с паузой.
+После перезапуска рассылка продолжается с неотправленных записей; повторно может
+уйти только сообщение, отправка которого шла в момент падения.
+Дайджест даты готовится один раз на всех подписчиков (см. DigestService.get_digest).
+
+Прогресс рассылки:
+
+    python -m services.broadcast_service [--date 2026-06-06]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+import time as time_module
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from telegram.error import Forbidden
+
+from literary_calendar_database import AsyncLiteraryCalendarDatabase, LiteraryCalendarDatabase
+from services.digest_service import DigestBuild, PreparedEvent
+
+logger = logging.getLogger(__name__)
+
+# Дольше не спим: время отправки — по настенным часам, а asyncio спит по монотонным
+MAX_SLEEP = 3600
+
+# Сколько дней хранить завершённые записи outbox
+OUTBOX_KEEP_DAYS = 7
+
+# Пауза перед повтором записи outbox: 30 с, 60 с, 120 с... но не больше 15 минут
+OUTBOX_RETRY_BASE = 30
+OUTBOX_RETRY_MAX = 900
+
+
+def _utc_now() -> datetime:
+    return datetime.now(dt_timezone.utc)
+
+
+def _parse_created_at(value) -> Optional[datetime]:
+    """created_at подписчика (CURRENT_TIMESTAMP SQLite, UTC) → aware datetime; None, если не разобрать"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def next_send_time(
+    now: datetime,
+    send_hour: int,
+    timezone: str,
+    last_sent_date: Optional[str] = None,
+    created_at: Optional[str] = None,
+) -> datetime:
+    """
+    Ближайшее время отправки подписчику (aware datetime в UTC)
+
+    Сегодняшний дайджест уже отправлен — завтра в send_hour. Час рассылки прошёл,
+    а дайджест не отправлен (бот был выключен) — сразу; подписавшийся после
+    сегодняшнего часа рассылки (по created_at) начинает с завтрашнего дня.
+    Без created_at — сразу всем, у кого час прошёл (разовый запуск по cron).
+    """
+    tz = ZoneInfo(timezone)
+    local_now = now.astimezone(tz)
+    today = local_now.date()
+    fire_at = datetime.combine(today, time(send_hour), tzinfo=tz)
+    subscribed_at = _parse_created_at(created_at)
+    if last_sent_date == today.isoformat() or (
+        fire_at <= local_now and subscribed_at is not None and subscribed_at > fire_at
+    ):
+        fire_at = datetime.combine(today + timedelta(days=1), time(send_hour), tzinfo=tz)
+    return fire_at.astimezone(dt_timezone.utc)
+
+
+class BroadcastService:
+    def __init__(
+        self,
+        db: AsyncLiteraryCalendarDatabase,
+        get_digest: Callable[[datetime], Awaitable[DigestBuild]],
+        deliver: Callable[[str, PreparedEvent], Awaitable[None]],
+        timezone: str,
+        send_hour: int,
+        concurrency: int = 30,
+        retry_delay: float = 300,
+        lease_seconds: float = 120,
+        max_attempts: int = 5,
+        clock: Callable[[], datetime] = _utc_now,
+    ):
+        """
+        Args:
+            db: БД с таблицами подписчиков и outbox
+            get_digest: Дайджест на дату (общий для всех чатов)
+            deliver: Отправка подготовленного события в чат
+            timezone: Часовой пояс новых подписчиков
+            send_hour: Час рассылки для /subscribe без аргумента
+            concurrency: Сколько отправителей забирают записи outbox одновременно
+            retry_delay: Через сколько секунд повторить, если дайджест не удалось подготовить
+            lease_seconds: На сколько запись outbox занимается отправителем (после падения — доступна снова)
+            max_attempts: Попыток отправить запись outbox, после чего она помечается failed
+            clock: Текущее время (aware, UTC)
+        """
+        self._db = db
+        self._get_digest = get_digest
+        self._deliver = deliver
+        self.timezone = timezone
+        self.send_hour = send_hour
+        self.concurrency = max(1, concurrency)
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._clock = clock
+        self._subscribers: Dict[str, Dict] = {}
+        # (время отправки, порядковый номер, chat_id); устаревшие записи пропускаются при извлечении
+        self._heap: List[Tuple[float, int, str]] = []
+        self._scheduled: Dict[str, Tuple[float, int]] = {}
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._outbox_changed: Optional[asyncio.Event] = None
+        self._loaded = False
+        self.sent = 0
+        self.failed = 0
+
+    def _get_changed(self) -> asyncio.Event:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _get_outbox_changed(self) -> asyncio.Event:
+        if self._outbox_changed is None:
+            self._outbox_changed = asyncio.Event()
+        return self._outbox_changed
+
+    async def load(self, catch_up: bool = False):
+        """
+        Загружает подписчиков из БД и строит расписание
+
+        Args:
+            catch_up: Разовый запуск (send_daily.py): сегодняшний дайджест положен всем,
+                у кого час рассылки уже прошёл, — в том числе подписавшимся позже этого часа
+        """
+        subscribers = await self._db.get_subscribers()
+        now = self._clock()
+        self._subscribers.clear()
+        self._heap.clear()
+        self._scheduled.clear()
+        for subscriber in subscribers:
+            self._subscribers[subscriber["chat_id"]] = subscriber
+            self._schedule(subscriber, now, catch_up=catch_up)
+        self._loaded = True
+        logger.info("📬 Подписчиков рассылки: %s", len(subscribers))
+        purged = await self._db.purge_outbox((now.date() - timedelta(days=OUTBOX_KEEP_DAYS)).isoformat())
+        if purged:
+            logger.info("🧹 Outbox: удалено старых записей: %s", purged)
+
+    def _schedule(self, subscriber: Dict, now: datetime, fire_at: Optional[datetime] = None, catch_up: bool = False):
+        if fire_at is None:
+            fire_at = next_send_time(
+                now,
+                subscriber["send_hour"],
+                subscriber["timezone"],
+                subscriber.get("last_sent_date"),
+                None if catch_up else subscriber.get("created_at"),
+            )
+        entry = (fire_at.timestamp(), next(self._seq))
+        self._scheduled[subscriber["chat_id"]] = entry
+        heapq.heappush(self._heap, entry + (subscriber["chat_id"],))
+        self._get_changed().set()
+
+    def _is_current(self, item: Tuple[float, int, str]) -> bool:
+        return self._scheduled.get(item[2]) == item[:2]
+
+    async def subscribe(self, chat_id: str, send_hour: Optional[int] = None, timezone: Optional[str] = None) -> Dict:
+        """Подписывает чат (или меняет час рассылки); возвращает запись подписчика с next_send_at"""
+        if send_hour is None:
+            send_hour = self.send_hour
+        if not 0 <= send_hour <= 23:
+            raise ValueError("Час рассылки должен быть от 0 до 23")
+        if not self._loaded:
+            await self.load()
+        subscriber = await self._db.add_subscriber(str(chat_id), send_hour, timezone or self.timezone)
+        self._subscribers[subscriber["chat_id"]] = subscriber
+        self._schedule(subscriber, self._clock())
+        fire_ts = self._scheduled[subscriber["chat_id"]][0]
+        return dict(subscriber, next_send_at=datetime.fromtimestamp(fire_ts, dt_timezone.utc))
+
+    async def unsubscribe(self, chat_id: str) -> bool:
+        """Отписывает чат; False, если подписки не было"""
+        if not self._loaded:
+            await self.load()
+        removed = await self._db.remove_subscriber(str(chat_id))
+        self._subscribers.pop(str(chat_id), None)
+        # Запись в куче станет устаревшей и будет пропущена
+        self._scheduled.pop(str(chat_id), None)
+        return removed
+
+    def next_delay(self) -> Optional[float]:
+        """Сколько секунд до ближайшей отправки (None — подписчиков нет)"""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self._clock().timestamp())
+
+    async def send_due(self) -> int:
+        """Ставит дайджест в outbox всем, у кого наступило время; возвращает число чатов"""
+        if not self._loaded:
+            await self.load()
+        now = self._clock()
+        due: List[Dict] = []
+        while self._heap and self._heap[0][0] <= now.timestamp():
+            item = heapq.heappop(self._heap)
+            if not self._is_current(item):
+                continue
+            del self._scheduled[item[2]]
+            subscriber = self._subscribers.get(item[2])
+            if subscriber is not None:
+                due.append(subscriber)
+        if not due:
+            return 0
+
+        # Подписчики в разных часовых поясах могут получать дайджесты разных дат
+        by_date: Dict[str, List[Dict]] = {}
+        for subscriber in due:
+            local_date = now.astimezone(ZoneInfo(subscriber["timezone"])).date().isoformat()
+            by_date.setdefault(local_date, []).append(subscriber)
+
+        planned = 0
+        for local_date, subscribers in by_date.items():
+            try:
+                build = await self._get_digest(now.astimezone(ZoneInfo(subscribers[0]["timezone"])))
+                event_ids = [event["id"] for event in build.events if event.get("id") is not None]
+                added = await self._db.enqueue_digest(
+                    [subscriber["chat_id"] for subscriber in subscribers], local_date, event_ids
+                )
+            except Exception as e:
+                logger.error("❌ Не удалось поставить в очередь дайджест на %s: %s", local_date, e, exc_info=True)
+                retry_at = now + timedelta(seconds=self.retry_delay)
+                for subscriber in subscribers:
+                    self._schedule(subscriber, now, fire_at=retry_at)
+                continue
+
+            for subscriber in subscribers:
+                subscriber["last_sent_date"] = local_date
+                self._schedule(subscriber, now)
+            planned += len(subscribers)
+            logger.info(
+                "📬 Дайджест на %s: %s подписчиков, в outbox добавлено сообщений: %s",
+                local_date,
+                len(subscribers),
+                added,
+            )
+        if planned:
+            self._get_outbox_changed().set()
+        return planned
+
+    async def _digest_for(self, digest_date: str) -> DigestBuild:
+        day = date.fromisoformat(digest_date)
+        return await self._get_digest(datetime(day.year, day.month, day.day, tzinfo=ZoneInfo(self.timezone)))
+
+    async def _prepare_entry(self, entry: Dict) -> Optional[PreparedEvent]:
+        """Подготовленное событие записи outbox; None — события больше нет в дайджесте даты"""
+        task = (await self._digest_for(entry["digest_date"])).task_for(entry["event_id"])
+        if task is None:
+            return None
+        return await asyncio.shield(task)
+
+    async def _keep_lease(self, entry: Dict):
+        """Продлевает аренду записи, пока она обрабатывается (отправка может ждать RetryAfter)"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await self._db.renew_outbox(entry["id"], entry["attempts"], self.lease_seconds):
+                return
+
+    async def _send_entry(self, entry: Dict) -> bool:
+        """Отправляет одну запись outbox и записывает результат; True — отправлено"""
+        keeper = asyncio.ensure_future(self._keep_lease(entry))
+        try:
+            return await self._process_entry(entry)
+        finally:
+            keeper.cancel()
+
+    async def _process_entry(self, entry: Dict) -> bool:
+        chat_id = entry["chat_id"]
+        # (id, attempts) — токен аренды: после её потери запись уже не наша и не меняется
+        lease = (entry["id"], entry["attempts"])
+        try:
+            # Сборка дайджеста может зависнуть — ждём её меньше срока аренды
+            prepared = await asyncio.wait_for(self._prepare_entry(entry), timeout=self.lease_seconds / 2)
+            if prepared is None:
+                if await self._db.retry_outbox(*lease, "событие удалено из календаря", None):
+                    self.failed += 1
+                return False
+            if not await self._db.renew_outbox(*lease, self.lease_seconds):
+                logger.warning("Аренда события %s для чата %s истекла, отправку пропускаем", entry["event_id"], chat_id)
+                return False
+            await self._deliver(chat_id, prepared)
+        except Forbidden as e:
+            # Бот заблокирован или удалён из чата — остальные события туда тоже не уйдут
+            failed = await self._db.fail_outbox_chat(chat_id, str(e), *lease)
+            self.failed += failed
+            logger.warning("🚫 Чат %s недоступен, отменено сообщений: %s", chat_id, failed)
+            return False
+        except Exception as e:
+            attempt = entry["attempts"]
+            retry_at = None
+            if attempt < self.max_attempts:
+                retry_at = time_module.time() + min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempt - 1))
+            if not await self._db.retry_outbox(*lease, str(e) or type(e).__name__, retry_at):
+                logger.warning(
+                    "Аренда события %s для чата %s истекла, ошибку не записываем: %s", entry["event_id"], chat_id, e
+                )
+            elif retry_at is None:
+                self.failed += 1
+                logger.error("❌ Не удалось отправить событие %s в чат %s: %s", entry["event_id"], chat_id, e)
+            else:
+                logger.warning(
+                    "Событие %s в чат %s не отправлено (попытка %s): %s", entry["event_id"], chat_id, attempt, e
+                )
+            return False
+        if not await self._db.complete_outbox(*lease):
+            logger.warning("Событие %s отправлено в чат %s после истечения аренды", entry["event_id"], chat_id)
+        self.sent += 1
+        return True
+
+    async def drain(self) -> int:
+        """
+        Отправляет всё, что в outbox готово к отправке; возвращает число отправленных
+
+        Каждый из concurrency отправителей забирает по одной записи: медленный чат
+        (например, после RetryAfter) не задерживает остальных.
+        """
+        sent = 0
+
+        async def worker():
+            nonlocal sent
+            while True:
+                entries = await self._db.lease_outbox(1, self.lease_seconds)
+                if not entries:
+                    return
+                if await self._send_entry(entries[0]):
+                    sent += 1
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return sent
+
+    async def _drain_loop(self):
+        changed = self._get_outbox_changed()
+        while True:
+            changed.clear()
+            try:
+                await self.drain()
+                next_at = await self._db.next_outbox_time()
+            except Exception as e:
+                logger.error("Ошибка отправки из outbox: %s", e, exc_info=True)
+                next_at = time_module.time() + self.retry_delay
+            timeout = None if next_at is None else min(MAX_SLEEP, max(0.0, next_at - time_module.time()))
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """
+        Рассылка по расписанию: спит до ближайшей отправки, без периодического опроса
+
+        Отправка из outbox идёт параллельно; незавершённая рассылка после перезапуска продолжается.
+        """
+        await self.load()
+        drain = asyncio.ensure_future(self._drain_loop())
+        changed = self._get_changed()
+        try:
+            while True:
+                try:
+                    await self.send_due()
+                except Exception as e:
+                    logger.error("Ошибка рассылки подписчикам: %s", e, exc_info=True)
+                changed.clear()
+                delay = self.next_delay()
+                timeout = None if delay is None else min(delay, MAX_SLEEP)
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            drain.cancel()
+
+    async def progress(self, digest_date: Optional[str] = None) -> Dict:
+        """Прогресс рассылки по outbox (см. LiteraryCalendarDatabase.outbox_stats)"""
+        return await self._db.outbox_stats(digest_date)
+
+    def stats(self) -> Dict[str, object]:
+        delay = self.next_delay()
+        return {
+            "subscribers": len(self._subscribers),
+            "sent": self.sent,
+            "failed": self.failed,
+            "next_in": None if delay is None else round(delay, 1),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m services.broadcast_service", description="Прогресс рассылки подписчикам (outbox)"
+    )
+    parser.add_argument("--date", help="дата дайджеста YYYY-MM-DD (по умолчанию — все)")
+    parser.add_argument("--failed", type=int, default=10, help="сколько последних неудачных записей показать")
+    args = parser.parse_args(argv)
+
+    db = LiteraryCalendarDatabase()
+    try:
+        stats = db.outbox_stats(args.date)
+        print(
+            f"Всего: {stats['total']}  ждут: {stats['pending']}  отправляются: {stats['sending']}  "
+            f"отправлено: {stats['sent']}  ошибок: {stats['failed']}"
+        )
+        print(
+            f"Готово: {stats['progress']:.1%}  чатов в очереди: {stats['chats_waiting']}  "
+            f"темп: {stats['sent_per_second']} сообщ./с (за минуту)"
+        )
+        for entry in db.failed_outbox(args.date, args.failed):
+            print(
+                f"✗ чат {entry['chat_id']:<16} {entry['digest_date']} событие {entry['event_id']:<6} "
+                f"попыток {entry['attempts']}: {entry['last_error']}"
+            )
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
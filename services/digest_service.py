@@ -3,13 +3,16 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
-from typing import Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from telegram import Bot, InputMediaPhoto
 from telegram.error import TelegramError
 
 from bot.formatting import extract_image_url_from_metadata, format_event_message
+from clients.cache import TTLCache, is_fallback
 from clients.graphql_client import GraphQLClient
+from services.send_scheduler import SendScheduler
+from time_utils import Deadline
 
 try:
     from bs4 import BeautifulSoup
@@ -21,13 +24,112 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+async def _resolved(value):
+    """Готовое значение в виде awaitable — заглушка для asyncio.gather"""
+    return value
+
+
+class PreparedEvent(NamedTuple):
+    """Событие, готовое к отправке: обложки, подпись к ним и текст для отправки без медиа"""
+
+    event: Dict
+    books: List[Dict]
+    other_links: List[Dict]
+    media: List[str]
+    caption: str
+    text: str
+    # Дедлайн истёк или каталог не ответил (ошибка, заглушка при сбое): часть книг могла не загрузиться
+    degraded: bool = False
+
+
+class DigestBuild:
+    """
+    Подготовка событий одной даты
+
+    Задачи подготовки общие для всех чатов, которые запросили эту дату: каждый чат
+    ждёт их по порядку и отправляет готовые события, пока остальные ещё готовятся.
+    """
+
+    def __init__(self, events: List[Dict], tasks: List["asyncio.Task[PreparedEvent]"], stamp=None):
+        self.events = events
+        self.tasks = tasks
+        # Версия данных БД, из которых собраны события (см. LiteraryCalendarDatabase.data_stamp)
+        self.stamp = stamp
+
+    def spoiled(self) -> bool:
+        """Есть событие, которое не подготовилось или подготовилось не полностью — повторно не использовать"""
+        for task in self.tasks:
+            if not task.done():
+                continue
+            if task.cancelled() or task.exception() is not None or task.result().degraded:
+                return True
+        return False
+
+    def task_for(self, event_id: int) -> Optional["asyncio.Task[PreparedEvent]"]:
+        """Задача подготовки события по его id в БД (None — события в дайджесте нет)"""
+        for event, task in zip(self.events, self.tasks):
+            if event.get("id") == event_id:
+                return task
+        return None
+
+    def cancel(self):
+        for task in self.tasks:
+            if not task.done():
+                task.cancel()
+
+
 class DigestService:
-    def __init__(self, bot: Bot, gql: GraphQLClient, timezone: str):
+    def __init__(
+        self,
+        bot: Bot,
+        gql: GraphQLClient,
+        timezone: str,
+        prepare_concurrency: int = 4,
+        digest_cache_ttl: float = 3600,
+        sender: Optional[SendScheduler] = None,
+    ):
+        """
+        Args:
+            sender: Планировщик отправок с лимитами Telegram (по умолчанию — свой)
+            prepare_concurrency: Сколько событий одновременно готовится в send_events
+            digest_cache_ttl: Сколько секунд готовый дайджест даты отдаётся всем чатам (0 — не хранить)
+        """
         self._bot = bot
+        self._sender = sender or SendScheduler(bot)
         self._gql = gql
         self._timezone = timezone
+        self.prepare_concurrency = max(1, prepare_concurrency)
+        self.digest_cache_ttl = digest_cache_ttl
+        # Дата -> DigestBuild; запись действительна, пока не изменились данные БД (stamp)
+        self._digests = TTLCache(maxsize=32, ttl=digest_cache_ttl, negative_ttl=digest_cache_ttl, stale_ttl=0)
+        self._digest_flights: Dict[str, Tuple[object, "asyncio.Future[DigestBuild]"]] = {}
+        self.digest_hits = 0
+        self.digest_builds = 0
+
+    async def prefetch(self, events: List[Dict], deadline: Optional[Deadline] = None):
+        """Прогревает кэш каталога для всех событий дня одним пакетным запросом"""
+        try:
+            await self._gql.prefetch_for_events(events, deadline=deadline)
+        except Exception as e:
+            # Прогрев — только оптимизация: при ошибке книги будут запрошены по одному
+            logger.warning("⚠️ [prefetch] Не удалось прогреть кэш каталога: %s", e)
+
+    async def collect_books_and_links(
+        self, event: Dict, deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Книги и ссылки для события
+
+        С deadline запросы к каталогу ждём только до его истечения: дальше событие
+        собирается из того, что уже есть в кэше (ссылки на авторов/теги не теряются).
+        """
+        books, other_links, _ = await self._collect_books_and_links(event, deadline)
+        return books, other_links
 
-    async def collect_books_and_links(self, event: Dict) -> Tuple[List[Dict], List[Dict]]:
+    async def _collect_books_and_links(
+        self, event: Dict, deadline: Optional[Deadline]
+    ) -> Tuple[List[Dict], List[Dict], bool]:
+        """collect_books_and_links + признак, что часть ответов каталога — ошибки или заглушки при сбое"""
         books: List[Dict] = []
         other_links: List[Dict] = []
         max_books = 6
@@ -35,29 +137,81 @@ class DigestService:
         event_title = event.get("title", "Без названия")
         logger.info("🔍 [collect_books_and_links] Начинаем сбор книг для события: '%s'", event_title)
 
-        # 1. Добавляем книги из book_references БД (если есть)
-        for book_ref in event.get("book_references", []):
-            if len(books) >= max_books:
-                break
+        # 1. Книги из book_references БД (если есть)
+        book_refs = event.get("book_references", [])[:max_books]
+
+        # Книги без обложки в БД запрашиваем через API одним пакетным запросом
+        missing_cover_uuids = [
+            book_ref["uuid"] for book_ref in book_refs if book_ref["uuid"] and not book_ref.get("cover_url")
+        ]
+        if missing_cover_uuids:
+            logger.info(
+                "🔄 [collect_books_and_links] Обложки не найдены в БД для %s книг, запрашиваем через API...",
+                len(missing_cover_uuids),
+            )
+
+        # Все независимые запросы события уходят одновременно; если книг из БД уже хватает,
+        # книги авторов/тегов/категорий не понадобятся (и ссылки на них не добавляются — как раньше)
+        need_more = len(book_refs) < max_books
+        author_refs = event.get("author_refs", []) if need_more else []
+        tag_refs = event.get("tag_refs", []) if need_more else []
+        cat_refs = event.get("category_refs", []) if need_more else []
+
+        lookups = [
+            self._gql.get_books_by_uuids(missing_cover_uuids, deadline=deadline) if missing_cover_uuids
+            else _resolved({})
+        ]
+        lookups += [
+            self._gql.get_books_by_author(ref["uuid"], deadline=deadline) if ref.get("uuid") else _resolved([])
+            for ref in author_refs
+        ]
+        lookups += [
+            self._gql.get_books_by_tag(ref["uuid"], deadline=deadline) if ref.get("uuid") else _resolved([])
+            for ref in tag_refs
+        ]
+        lookups += [
+            self._gql.get_books_by_category(ref["uuid"], deadline=deadline) if ref.get("uuid") else _resolved([])
+            for ref in cat_refs
+        ]
+        results = await asyncio.gather(*lookups, return_exceptions=True)
+        catalog_failed = any(isinstance(result, Exception) or is_fallback(result) for result in results)
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.warning("⚠️ [collect_books_and_links] Ошибка запроса к каталогу: %s", result)
+                results[i] = {} if i == 0 else []
+        api_books: Dict[str, Dict] = results[0] or {}
+        author_results = results[1:1 + len(author_refs)]
+        tag_results = results[1 + len(author_refs):1 + len(author_refs) + len(tag_refs)]
+        cat_results = results[1 + len(author_refs) + len(tag_refs):]
+
+        # Дальше — слияние в прежнем порядке приоритета: БД, авторы, теги, категории
+        seen_uuids = set()
+
+        def add_book(book: Dict, source: str, metadata: Dict):
+            seen_uuids.add(book.get("uuid"))
+            books.append(
+                {
+                    "uuid": book.get("uuid"),
+                    "name": book.get("name", "Без названия"),
+                    "slug": book.get("slug", ""),
+                    "metadata": metadata,
+                    "source": source,
+                }
+            )
 
+        for book_ref in book_refs:
             book_uuid = book_ref["uuid"]
             book_metadata = book_ref.get("metadata", {}) or {}
+            # Обложка нормализуется при записи в БД (колонка cover_url) — JSON здесь не разбираем
+            cover_url = book_ref.get("cover_url") or ""
 
-            has_cover = False
-            if book_metadata:
-                image_url = extract_image_url_from_metadata(book_metadata)
-                has_cover = bool(image_url)
-
-            if not has_cover and book_uuid:
-                logger.info(
-                    "🔄 [collect_books_and_links] Обложка не найдена в БД для книги '%s', запрашиваем через API...",
-                    book_ref.get("name"),
-                )
-                api_book = await self._gql.get_book_by_uuid(book_uuid)
+            if not cover_url and book_uuid:
+                api_book = api_books.get(book_uuid)
                 if api_book:
                     book_image = api_book.get("image", {}) or {}
                     if book_image.get("url"):
                         book_metadata = {"image": book_image}
+                        cover_url = extract_image_url_from_metadata(book_metadata)
                         logger.info(
                             "✅ [collect_books_and_links] Обложка получена через API для книги '%s'",
                             book_ref.get("name"),
@@ -73,18 +227,20 @@ class DigestService:
                         book_ref.get("name"),
                     )
 
+            seen_uuids.add(book_uuid)
             books.append(
                 {
                     "uuid": book_uuid,
                     "name": book_ref["name"],
                     "slug": book_ref["slug"],
                     "metadata": book_metadata,
+                    "cover_url": cover_url,
                     "source": "database",
                 }
             )
 
         # 2. Книги по авторам + ссылки на авторов
-        for author_ref in event.get("author_refs", []):
+        for author_ref, author_books in zip(author_refs, author_results):
             if len(books) >= max_books:
                 break
 
@@ -97,25 +253,14 @@ class DigestService:
                 author_url = f"https://example.com/authors/{author_identifier}"
                 other_links.append({"type": "author", "name": au_name or "Автор", "url": author_url})
 
-            if au_uuid:
-                author_books = await self._gql.get_books_by_author(au_uuid)
-                for book in author_books:
-                    if len(books) >= max_books:
-                        break
-                    if not any(b.get("uuid") == book.get("uuid") for b in books):
-                        book_image = book.get("image", {}) or {}
-                        books.append(
-                            {
-                                "uuid": book.get("uuid"),
-                                "name": book.get("name", "Без названия"),
-                                "slug": book.get("slug", ""),
-                                "metadata": {"image": book_image},
-                                "source": "author_api",
-                            }
-                        )
+            for book in author_books:
+                if len(books) >= max_books:
+                    break
+                if book.get("uuid") not in seen_uuids:
+                    add_book(book, "author_api", {"image": book.get("image", {}) or {}})
 
         # 3. Книги по тегам + ссылки
-        for tag_ref in event.get("tag_refs", []):
+        for tag_ref, tag_books in zip(tag_refs, tag_results):
             if len(books) >= max_books:
                 break
             tag_uuid = tag_ref.get("uuid")
@@ -123,23 +268,14 @@ class DigestService:
             if tag_uuid:
                 tag_url = f"https://example.com/catalog?tags={tag_uuid}"
                 other_links.append({"type": "tag", "name": tag_name or "Тег", "url": tag_url})
-                tag_books = await self._gql.get_books_by_tag(tag_uuid)
                 for book in tag_books:
                     if len(books) >= max_books:
                         break
-                    if not any(b.get("uuid") == book.get("uuid") for b in books):
-                        books.append(
-                            {
-                                "uuid": book.get("uuid"),
-                                "name": book.get("name", "Без названия"),
-                                "slug": book.get("slug", ""),
-                                "metadata": {"image": book.get("image", {})} if book.get("image") else {},
-                                "source": "tag_api",
-                            }
-                        )
+                    if book.get("uuid") not in seen_uuids:
+                        add_book(book, "tag_api", {"image": book.get("image", {})} if book.get("image") else {})
 
         # 4. Книги по категориям + ссылки
-        for cat_ref in event.get("category_refs", []):
+        for cat_ref, cat_books in zip(cat_refs, cat_results):
             if len(books) >= max_books:
                 break
             cat_uuid = cat_ref.get("uuid")
@@ -149,166 +285,258 @@ class DigestService:
                 other_links.append(
                     {"type": "category", "name": cat_name or "Категория", "url": cat_url}
                 )
-                cat_books = await self._gql.get_books_by_category(cat_uuid)
                 for book in cat_books:
                     if len(books) >= max_books:
                         break
-                    if not any(b.get("uuid") == book.get("uuid") for b in books):
-                        books.append(
-                            {
-                                "uuid": book.get("uuid"),
-                                "name": book.get("name", "Без названия"),
-                                "slug": book.get("slug", ""),
-                                "metadata": {"image": book.get("image", {})} if book.get("image") else {},
-                                "source": "category_api",
-                            }
+                    if book.get("uuid") not in seen_uuids:
+                        add_book(
+                            book, "category_api", {"image": book.get("image", {})} if book.get("image") else {}
                         )
 
-        return books, other_links
+        return books, other_links, catalog_failed
 
-    async def send_event_with_media(self, chat_id: str, event: Dict):
-        try:
-            books, other_links = await self.collect_books_and_links(event)
+    async def prepare_event(self, event: Dict, deadline: Optional[Deadline] = None) -> PreparedEvent:
+        """Собирает книги и готовит тексты события к отправке (без обращений к Telegram)"""
+        books, other_links, catalog_failed = await self._collect_books_and_links(event, deadline)
 
-            media_items: List[InputMediaPhoto] = []
-            for book in books:
-                if len(media_items) >= 6:
-                    break
-                metadata = book.get("metadata", {}) or {}
-                image_url = extract_image_url_from_metadata(metadata)
-                if not image_url:
-                    continue
-                caption = book.get("name", "")
-                try:
-                    media_items.append(InputMediaPhoto(media=image_url, caption=caption))
-                except Exception:
-                    continue
-
-            if media_items:
-                try:
-                    full_message = format_event_message(
-                        event=event,
-                        timezone=self._timezone,
-                        books=books,
-                        include_image_urls=False,
-                        other_links=other_links,
-                    )
-
-                    max_caption = 1024
-                    if len(full_message) > max_caption:
-                        open_tag_stack: List[str] = []
-                        tag_pattern = re.compile(r"<(/?)([a-z]+)[^>]*>", re.IGNORECASE)
-                        safe_cut_pos = max_caption - 20
-
-                        for match in tag_pattern.finditer(full_message[:safe_cut_pos]):
-                            is_closing = match.group(1) == "/"
-                            tag_name = match.group(2).lower()
-                            if is_closing:
-                                if open_tag_stack and open_tag_stack[-1] == tag_name:
-                                    open_tag_stack.pop()
-                            else:
-                                if tag_name in ["a", "b", "i", "u", "strong", "em"]:
-                                    open_tag_stack.append(tag_name)
-
-                        if open_tag_stack:
-                            last_close_pos = -1
-                            for tag in ["a", "b", "i", "u", "strong", "em"]:
-                                pos = full_message[:safe_cut_pos].rfind(f"</{tag}>")
-                                if pos > last_close_pos:
-                                    last_close_pos = pos + len(f"</{tag}>")
-
-                            if last_close_pos > 100:
-                                truncated = full_message[:last_close_pos]
-                            else:
-                                last_space = full_message[:safe_cut_pos].rfind(" ")
-                                truncated = full_message[:last_space] if last_space > 100 else full_message[:safe_cut_pos]
-
-                            for tag in reversed(open_tag_stack):
-                                truncated += f"</{tag}>"
-                        else:
-                            truncated = full_message[:safe_cut_pos]
-
-                        full_message = truncated + "..."
-
-                    if HAS_BS4:
-                        try:
-                            soup = BeautifulSoup(full_message, "html.parser")
-                            full_message = str(soup)
-                            if full_message.startswith("<html>"):
-                                full_message = full_message[6:]
-                            if full_message.startswith("<body>"):
-                                full_message = full_message[6:]
-                            if full_message.endswith("</body></html>"):
-                                full_message = full_message[:-14]
-                            elif full_message.endswith("</html>"):
-                                full_message = full_message[:-7]
-                            elif full_message.endswith("</body>"):
-                                full_message = full_message[:-7]
-                        except Exception:
-                            pass
-
-                    if len(media_items) == 1:
-                        await self._bot.send_photo(
-                            chat_id=chat_id,
-                            photo=media_items[0].media,
-                            caption=full_message,
-                            parse_mode="HTML",
-                        )
-                        await asyncio.sleep(0.5)
-                        return
-
-                    media_to_send: List[InputMediaPhoto] = []
-                    for idx, m in enumerate(media_items[:6]):
-                        if idx == 0:
-                            media_to_send.append(
-                                InputMediaPhoto(media=m.media, caption=full_message, parse_mode="HTML")
-                            )
-                        else:
-                            media_to_send.append(InputMediaPhoto(media=m.media))
-
-                    await self._bot.send_media_group(chat_id=chat_id, media=media_to_send)
-                    await asyncio.sleep(0.5)
-                    return
-                except TelegramError as e:
-                    logger.warning("Не удалось отправить медиа: %s", e)
-                    message = format_event_message(
-                        event=event,
-                        timezone=self._timezone,
-                        books=books,
-                        include_image_urls=True,
-                        other_links=other_links,
-                    )
-                    for send_attempt in range(3):
-                        try:
-                            await self._bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
-                            await asyncio.sleep(1)
-                            return
-                        except TelegramError as e2:
-                            if send_attempt < 2:
-                                await asyncio.sleep(2)
-                            else:
-                                logger.error("❌ Не удалось отправить сообщение (fallback): %s", e2)
-                                return
-
-            # no media
-            message = format_event_message(
-                event=event,
-                timezone=self._timezone,
-                books=books,
-                include_image_urls=True,
-                other_links=other_links,
+        media_urls: List[str] = []
+        for book in books:
+            if len(media_urls) >= 6:
+                break
+            image_url = book.get("cover_url") or extract_image_url_from_metadata(book.get("metadata"))
+            if image_url:
+                media_urls.append(image_url)
+
+        caption = ""
+        if media_urls:
+            caption = self._fit_caption(
+                format_event_message(
+                    event=event,
+                    timezone=self._timezone,
+                    books=books,
+                    include_image_urls=False,
+                    other_links=other_links,
+                )
             )
-            for send_attempt in range(3):
-                try:
-                    await self._bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
-                    await asyncio.sleep(1)
+        text = format_event_message(
+            event=event,
+            timezone=self._timezone,
+            books=books,
+            include_image_urls=True,
+            other_links=other_links,
+        )
+        return PreparedEvent(
+            event=event,
+            books=books,
+            other_links=other_links,
+            media=media_urls,
+            caption=caption,
+            text=text,
+            degraded=catalog_failed or (deadline is not None and deadline.expired),
+        )
+
+    @staticmethod
+    def _fit_caption(full_message: str) -> str:
+        """Обрезает подпись к медиа до лимита Telegram (1024), не разрывая HTML-теги"""
+        max_caption = 1024
+        if len(full_message) > max_caption:
+            open_tag_stack: List[str] = []
+            tag_pattern = re.compile(r"<(/?)([a-z]+)[^>]*>", re.IGNORECASE)
+            safe_cut_pos = max_caption - 20
+
+            for match in tag_pattern.finditer(full_message[:safe_cut_pos]):
+                is_closing = match.group(1) == "/"
+                tag_name = match.group(2).lower()
+                if is_closing:
+                    if open_tag_stack and open_tag_stack[-1] == tag_name:
+                        open_tag_stack.pop()
+                else:
+                    if tag_name in ["a", "b", "i", "u", "strong", "em"]:
+                        open_tag_stack.append(tag_name)
+
+            if open_tag_stack:
+                last_close_pos = -1
+                for tag in ["a", "b", "i", "u", "strong", "em"]:
+                    pos = full_message[:safe_cut_pos].rfind(f"</{tag}>")
+                    if pos > last_close_pos:
+                        last_close_pos = pos + len(f"</{tag}>")
+
+                if last_close_pos > 100:
+                    truncated = full_message[:last_close_pos]
+                else:
+                    last_space = full_message[:safe_cut_pos].rfind(" ")
+                    truncated = full_message[:last_space] if last_space > 100 else full_message[:safe_cut_pos]
+
+                for tag in reversed(open_tag_stack):
+                    truncated += f"</{tag}>"
+            else:
+                truncated = full_message[:safe_cut_pos]
+
+            full_message = truncated + "..."
+
+        if HAS_BS4:
+            try:
+                soup = BeautifulSoup(full_message, "html.parser")
+                full_message = str(soup)
+                if full_message.startswith("<html>"):
+                    full_message = full_message[6:]
+                if full_message.startswith("<body>"):
+                    full_message = full_message[6:]
+                if full_message.endswith("</body></html>"):
+                    full_message = full_message[:-14]
+                elif full_message.endswith("</html>"):
+                    full_message = full_message[:-7]
+                elif full_message.endswith("</body>"):
+                    full_message = full_message[:-7]
+            except Exception:
+                pass
+        return full_message
+
+    async def deliver(self, chat_id: str, prepared: PreparedEvent):
+        """
+        Отправляет подготовленное событие: фото/альбом с подписью, при ошибке — текстом
+
+        Паузы между сообщениями и повторы (RetryAfter, сетевые ошибки) — в SendScheduler.
+        Если не удалось отправить и текст, TelegramError пробрасывается вызывающему.
+        """
+        if prepared.media:
+            try:
+                if len(prepared.media) == 1:
+                    await self._sender.send_photo(
+                        chat_id=chat_id,
+                        photo=prepared.media[0],
+                        caption=prepared.caption,
+                        parse_mode="HTML",
+                    )
                     return
-                except TelegramError as e:
-                    if send_attempt < 2:
-                        await asyncio.sleep(2)
+
+                media_to_send: List[InputMediaPhoto] = []
+                for idx, url in enumerate(prepared.media[:6]):
+                    if idx == 0:
+                        media_to_send.append(InputMediaPhoto(media=url, caption=prepared.caption, parse_mode="HTML"))
                     else:
-                        logger.error("❌ Не удалось отправить сообщение: %s", e)
-                        return
+                        media_to_send.append(InputMediaPhoto(media=url))
+
+                await self._sender.send_media_group(chat_id=chat_id, media=media_to_send)
+                return
+            except TelegramError as e:
+                logger.warning("Не удалось отправить медиа: %s", e)
+
+        await self._sender.send_message(chat_id=chat_id, text=prepared.text, parse_mode="HTML")
+
+    async def send_event_with_media(self, chat_id: str, event: Dict, deadline: Optional[Deadline] = None):
+        try:
+            prepared = await self.prepare_event(event, deadline=deadline)
+            await self.deliver(chat_id, prepared)
         except Exception as e:
             logger.error("Ошибка обработки события '%s': %s", event.get("title"), e, exc_info=True)
 
+    def start_build(self, events: List[Dict], deadline: Optional[Deadline] = None, stamp=None) -> DigestBuild:
+        """Запускает подготовку событий: параллельно, не больше prepare_concurrency одновременно"""
+        semaphore = asyncio.Semaphore(self.prepare_concurrency)
+
+        async def prepare(event: Dict) -> PreparedEvent:
+            async with semaphore:
+                return await self.prepare_event(event, deadline=deadline)
+
+        return DigestBuild(events, [asyncio.ensure_future(prepare(event)) for event in events], stamp=stamp)
+
+    async def get_digest(
+        self,
+        day_key: str,
+        stamp,
+        load_events: Callable[[], Awaitable[List[Dict]]],
+        deadline: Optional[Deadline] = None,
+    ) -> DigestBuild:
+        """
+        Дайджест даты, общий для всех чатов
+
+        Пока данные БД не изменились (stamp тот же) и дайджест собран полностью,
+        события, книги и тексты готовятся один раз на дату, а не на каждый чат.
+        Одновременные запросы одной даты ждут одну сборку.
+
+        Args:
+            day_key: Дата дайджеста (например, "2026-06-06")
+            stamp: Версия данных БД; None — не кэшировать
+            load_events: Загрузка событий даты из БД
+            deadline: Бюджет на запросы к каталогу для первой сборки
+        """
+        if stamp is None or self.digest_cache_ttl <= 0:
+            return await self._build_digest(None, stamp, load_events, deadline)
+
+        cached = self._digests.peek(day_key)
+        if cached is not None and cached.stamp == stamp and not cached.spoiled():
+            self.digest_hits += 1
+            return cached
+
+        flight = self._digest_flights.get(day_key)
+        if flight is None or flight[0] != stamp:
+            future = asyncio.ensure_future(self._build_digest(day_key, stamp, load_events, deadline))
+            self._digest_flights[day_key] = (stamp, future)
+
+            def forget(_future, day_key=day_key):
+                if self._digest_flights.get(day_key, (None, None))[1] is _future:
+                    del self._digest_flights[day_key]
+
+            future.add_done_callback(forget)
+            flight = (stamp, future)
+        else:
+            self.digest_hits += 1
+        # Отмена одного запроса не должна отменять сборку, которую ждут другие чаты
+        return await asyncio.shield(flight[1])
+
+    async def _build_digest(
+        self,
+        day_key: Optional[str],
+        stamp,
+        load_events: Callable[[], Awaitable[List[Dict]]],
+        deadline: Optional[Deadline],
+    ) -> DigestBuild:
+        self.digest_builds += 1
+        events = await load_events()
+        if events:
+            await self.prefetch(events, deadline=deadline)
+        build = self.start_build(events, deadline=deadline, stamp=stamp)
+        if day_key is not None:
+            self._digests.set(day_key, build)
+        return build
+
+    async def send_digest(
+        self,
+        chat_id: str,
+        build: DigestBuild,
+        on_error: Optional[Callable[[Dict, Exception], Awaitable[None]]] = None,
+    ):
+        """
+        Отправляет события сборки в исходном порядке
+
+        Каждое событие уходит, как только готово оно и отправлены предыдущие.
+
+        Args:
+            on_error: Вызывается для события, которое не удалось подготовить или отправить
+        """
+        for event, task in zip(build.events, build.tasks):
+            try:
+                # Задачи могут быть общими для нескольких чатов — отмена отправки их не трогает
+                await self.deliver(chat_id, await asyncio.shield(task))
+            except Exception as e:
+                logger.error("Ошибка обработки события '%s': %s", event.get("title"), e, exc_info=True)
+                if on_error is not None:
+                    await on_error(event, e)
+
+    async def send_events(
+        self,
+        chat_id: str,
+        events: List[Dict],
+        deadline: Optional[Deadline] = None,
+        on_error: Optional[Callable[[Dict, Exception], Awaitable[None]]] = None,
+    ):
+        """Готовит и отправляет события конвейером (см. start_build и send_digest), без кэша дайджестов"""
+        build = self.start_build(events, deadline=deadline)
+        try:
+            await self.send_digest(chat_id, build, on_error=on_error)
+        finally:
+            build.cancel()
+
+    def digest_stats(self) -> Dict[str, int]:
+        return {"builds": self.digest_builds, "hits": self.digest_hits, "cached_dates": len(self._digests)}
@@ -1,23 +1,26 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from telegram import Bot
 
 from bot.formatting import get_age_word
+from services.send_scheduler import SendScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class JubileeService:
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, sender: Optional[SendScheduler] = None):
         self._bot = bot
+        # Все отправки — через общий планировщик с лимитами Telegram
+        self._sender = sender or SendScheduler(bot)
 
     async def send_jubilees_for_year(self, chat_id: str, year: int, jubilees: List[Dict]):
         try:
             if not jubilees:
-                await self._bot.send_message(
+                await self._sender.send_message(
                     chat_id=chat_id,
                     text=f"🎉 Юбиляров в {year} году не найдено.",
                     parse_mode="HTML",
@@ -126,10 +129,10 @@ class JubileeService:
                     parts.append(f"• <b>{age} {age_word}</b> — {title}{refs_text}")
 
             message = "\n".join(parts)
-            await self._bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+            await self._sender.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
         except Exception as e:
             logger.error("Ошибка при отправке юбиляров для %s: %s", year, e, exc_info=True)
-            await self._bot.send_message(
+            await self._sender.send_message(
                 chat_id=chat_id,
                 text="❌ Произошла ошибка при получении юбиляров. Попробуйте позже.",
                 parse_mode="HTML",
@@ -0,0 +1,234 @@
+"""
+Отправка сообщений в Telegram с учётом лимитов
+
+Все вызовы Bot.send_* из сервисов идут через SendScheduler:
+- общий token bucket на бота (~30 сообщений в секунду);
+- свой bucket на каждый чат: личный — около 1 сообщения в секунду с небольшим
+  запасом, группа/канал (отрицательный chat_id) — около 20 сообщений в минуту;
+- RetryAfter (flood control): отправки ботом приостанавливаются на указанное
+  Telegram время, затем запрос повторяется;
+- сетевые ошибки и таймауты повторяются с паузой, остальные ошибки — сразу вызывающему.
+
+Вместо фиксированных пауз после каждого сообщения ждём ровно столько,
+сколько нужно по лимитам.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar, Union
+
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def retry_after_seconds(value: Union[int, float, timedelta]) -> float:
+    """RetryAfter.retry_after в секундах (в python-telegram-bot это int или timedelta)"""
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием
+
+    reserve() сразу списывает токены (баланс может уйти в минус) и возвращает,
+    сколько ждать до отправки, — так очередь обслуживается по порядку без блокировок.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate: Токенов в секунду
+            capacity: Запас токенов для коротких всплесков
+            clock: Источник времени (монотонные секунды)
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """
+        Списывает cost токенов; возвращает паузу (сек) перед отправкой
+
+        Ждём, пока накопится min(cost, capacity): дороже запаса вызов (большой альбом) уходит
+        с полным запасом, а остаток долга задерживает следующие отправки.
+        """
+        now = self._clock()
+        self._refill(now)
+        need = min(cost, self.capacity)
+        wait = (need - self._tokens) / self.rate if self._tokens < need else 0.0
+        self._tokens -= cost
+        return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд"""
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def idle(self) -> bool:
+        """Запас полон и паузы нет — bucket можно забыть без потери состояния"""
+        now = self._clock()
+        self._refill(now)
+        return self._tokens >= self.capacity and now >= self._paused_until
+
+
+class SendScheduler:
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate_per_minute: float = 20.0,
+        max_attempts: int = 3,
+        network_retry_delay: float = 2.0,
+        max_chats: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        """
+        Args:
+            bot: Telegram Bot
+            global_rate: Сообщений в секунду на бота
+            chat_rate: Сообщений в секунду в личный чат
+            chat_burst: Сколько сообщений подряд можно отправить в чат без паузы
+            group_rate_per_minute: Сообщений в минуту в группу или канал
+            max_attempts: Всего попыток на сообщение (RetryAfter и сетевые ошибки)
+            network_retry_delay: Пауза перед повтором после сетевой ошибки, сек
+            max_chats: Сколько bucket'ов чатов держать (давно неактивные вытесняются)
+        """
+        self._bot = bot
+        self._clock = clock
+        self._sleep = sleep
+        # Без запаса: иначе в первую секунду рассылки уйдёт вдвое больше лимита
+        self.global_bucket = TokenBucket(global_rate, 1, clock)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_minute / 60.0
+        self.max_attempts = max(1, max_attempts)
+        self.network_retry_delay = network_retry_delay
+        self.max_chats = max_chats
+        self._chat_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.sent = 0
+        self.waited = 0.0
+        self.retry_after_hits = 0
+
+    @staticmethod
+    def is_group(chat_id: Union[int, str]) -> bool:
+        """Группы, супергруппы и каналы в Telegram имеют отрицательный id (или @username канала)"""
+        chat = str(chat_id)
+        return chat.startswith("-") or chat.startswith("@")
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            if self.is_group(key):
+                bucket = TokenBucket(self.group_rate, self.chat_burst, self._clock)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, self._clock)
+            self._chat_buckets[key] = bucket
+            while len(self._chat_buckets) > self.max_chats:
+                oldest_key, oldest = next(iter(self._chat_buckets.items()))
+                if not oldest.idle():
+                    break
+                del self._chat_buckets[oldest_key]
+        else:
+            self._chat_buckets.move_to_end(key)
+        return bucket
+
+    async def _acquire(self, chat_id: Union[int, str], cost: float = 1.0):
+        # Сначала очередь чата, затем общий лимит: медленный чат не занимает общие токены, пока ждёт
+        wait = self._chat_bucket(chat_id).reserve(cost)
+        if wait > 0:
+            self.waited += wait
+            await self._sleep(wait)
+        wait = self.global_bucket.reserve(cost)
+        if wait > 0:
+            self.waited += wait
+            await self._sleep(wait)
+
+    async def call(
+        self, chat_id: Union[int, str], method: Callable[..., Awaitable[T]], *, cost: int = 1, **kwargs
+    ) -> T:
+        """
+        Вызывает метод Bot для чата с учётом лимитов и повторами
+
+        cost — сколько сообщений Telegram засчитает вызову (альбом — по одному на каждое фото)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire(chat_id, cost)
+            try:
+                result = await method(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                delay = retry_after_seconds(e.retry_after)
+                self.retry_after_hits += 1
+                # Flood control может относиться ко всему боту: приостанавливаем все отправки
+                self.global_bucket.pause(delay)
+                self._chat_bucket(chat_id).pause(delay)
+                logger.warning("⏳ Telegram просит подождать %.1f с (чат %s)", delay, chat_id)
+                if attempt >= self.max_attempts:
+                    raise
+            except BadRequest:
+                raise
+            except NetworkError as e:
+                if attempt >= self.max_attempts:
+                    raise
+                logger.warning("Сетевая ошибка при отправке в чат %s, повтор: %s", chat_id, e)
+                await self._sleep(self.network_retry_delay)
+            else:
+                self.sent += cost
+                return result
+
+    async def send_message(self, chat_id: Union[int, str], **kwargs):
+        return await self.call(chat_id, self._bot.send_message, **kwargs)
+
+    async def send_photo(self, chat_id: Union[int, str], **kwargs):
+        return await self.call(chat_id, self._bot.send_photo, **kwargs)
+
+    async def send_media_group(self, chat_id: Union[int, str], **kwargs):
+        return await self.call(chat_id, self._bot.send_media_group, cost=max(1, len(kwargs["media"])), **kwargs)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "sent": self.sent,
+            "waited": round(self.waited, 2),
+            "retry_after": self.retry_after_hits,
+            "chats": len(self._chat_buckets),
+        }
+
+
+def make_send_scheduler(bot: Bot) -> SendScheduler:
+    """SendScheduler с лимитами из конфига (TELEGRAM_*_RATE)"""
+    try:
+        from literary_calendar_bot_config import (
+            TELEGRAM_CHAT_RATE,
+            TELEGRAM_GLOBAL_RATE,
+            TELEGRAM_GROUP_RATE_PER_MINUTE,
+        )
+    except (ImportError, AttributeError):
+        return SendScheduler(bot)
+    return SendScheduler(
+        bot,
+        global_rate=TELEGRAM_GLOBAL_RATE,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        group_rate_per_minute=TELEGRAM_GROUP_RATE_PER_MINUTE,
+    )
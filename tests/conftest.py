@@ -0,0 +1,11 @@
+import pytest
+
+from literary_calendar_database import LiteraryCalendarDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Отдельная (не общая) БД во временном файле со всеми миграциями"""
+    db = LiteraryCalendarDatabase(str(tmp_path / "calendar.db"))
+    yield db
+    db.close()
@@ -0,0 +1,113 @@
+"""
+Асинхронный фасад БД не должен блокировать event loop
+
+Медленный запрос и ожидание блокировки записи выполняются в пуле потоков:
+пока они идут, конкурентная корутина с asyncio.sleep(0) продолжает работать.
+"""
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from literary_calendar_database import (
+    AsyncLiteraryCalendarDatabase,
+    close_shared_databases,
+    get_shared_database,
+)
+
+# Рекурсивный CTE без таблиц: заметно долгий запрос на любой машине
+SLOW_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    SELECT count(*) FROM n
+"""
+SLOW_ROWS = 3_000_000
+# Допустимая пауза между тиками heartbeat, пока запрос выполняется в пуле
+MAX_GAP = 0.05
+
+
+@pytest.fixture
+def adb(tmp_path):
+    db = get_shared_database(str(tmp_path / "calendar.db"))
+    adb = AsyncLiteraryCalendarDatabase(db, max_workers=2)
+    yield adb
+    adb.close()
+    close_shared_databases()
+
+
+class Heartbeat:
+    """Считает итерации event loop и самую долгую паузу между ними"""
+
+    def __init__(self):
+        self.ticks = 0
+        self.max_gap = 0.0
+        self._stop = False
+
+    async def run(self):
+        last = time.perf_counter()
+        while not self._stop:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            self.max_gap = max(self.max_gap, now - last)
+            last = now
+            self.ticks += 1
+
+    def stop(self):
+        self._stop = True
+
+
+async def run_with_heartbeat(coro):
+    heartbeat = Heartbeat()
+    task = asyncio.create_task(heartbeat.run())
+    started = time.perf_counter()
+    try:
+        result = await coro
+    finally:
+        heartbeat.stop()
+        await task
+    return result, heartbeat, time.perf_counter() - started
+
+
+def slow_count(db, rows):
+    return db._read_conn().execute(SLOW_QUERY, (rows,)).fetchone()[0]
+
+
+def test_slow_query_blocks_loop_when_called_directly(adb):
+    """Контрольная проверка: тот же запрос в самом event loop останавливает heartbeat"""
+
+    async def direct():
+        await asyncio.sleep(0)
+        return slow_count(adb.db, SLOW_ROWS)
+
+    result, heartbeat, elapsed = asyncio.run(run_with_heartbeat(direct()))
+    assert result == SLOW_ROWS
+    assert heartbeat.max_gap > elapsed / 2
+
+
+@pytest.mark.asyncio
+async def test_slow_query_runs_off_event_loop(adb):
+    result, heartbeat, elapsed = await run_with_heartbeat(adb._run(slow_count, adb.db, SLOW_ROWS))
+    assert result == SLOW_ROWS
+    assert elapsed > 10 * MAX_GAP, "запрос слишком быстрый для проверки"
+    assert heartbeat.ticks > 100
+    assert heartbeat.max_gap < MAX_GAP
+
+
+@pytest.mark.asyncio
+async def test_write_waiting_for_lock_runs_off_event_loop(adb):
+    """Запись ждёт чужую транзакцию (busy_timeout), а event loop продолжает работать"""
+    holder = sqlite3.connect(adb.db.db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    hold = 0.5
+    asyncio.get_running_loop().call_later(hold, holder.commit)
+    try:
+        event_id, heartbeat, elapsed = await run_with_heartbeat(
+            adb.add_event(month=6, day=6, event_type="birthday", title="Пушкин", year=1799)
+        )
+    finally:
+        holder.close()
+    assert [event["id"] for event in await adb.get_events_by_date(6, 6)] == [event_id]
+    assert elapsed >= hold * 0.9
+    assert heartbeat.ticks > 100
+    assert heartbeat.max_gap < MAX_GAP
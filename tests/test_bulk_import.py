@@ -0,0 +1,100 @@
+"""
+Массовый импорт (BulkImporter): повторный импорт ничего не дублирует, события сверяются по
+(дата, тип, заголовок, год), ссылки — по (событие, тип, uuid, slug, название)
+"""
+
+import csv
+
+import pytest
+
+from literary_calendar_io import CSV_FIELDS, BulkImporter
+
+ROWS = [
+    # Событие с двумя ссылками — две строки файла
+    {"month": "6", "day": "6", "event_type": "birthday", "title": "Пушкин", "year": "1799-06-06",
+     "author_name": "Александр Пушкин", "reference_type": "author", "reference_uuid": "author-1"},
+    {"month": "6", "day": "6", "event_type": "birthday", "title": "Пушкин", "year": "1799-06-06",
+     "reference_type": "book", "reference_uuid": "book-1", "reference_name": "Евгений Онегин",
+     "metadata_json": '{"image": {"url": "https://covers.example/onegin.jpg"}}'},
+    # Событие без ссылок
+    {"month": "10", "day": "15", "event_type": "birthday", "title": "Лермонтов", "year": "1814"},
+    # Тот же заголовок в другой день — другое событие
+    {"month": "2", "day": "10", "event_type": "death", "title": "Пушкин", "year": "1837"},
+]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def counts(db):
+    return (
+        db.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0],
+        db.conn.execute("SELECT COUNT(*) FROM event_references").fetchone()[0],
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 1])
+def test_reimport_same_file_adds_nothing(db, tmp_path, chunk_size):
+    path = write_csv(tmp_path / "events.csv", ROWS)
+
+    first = BulkImporter(db, chunk_size=chunk_size).import_file(path)
+    assert first["events_added"] == 3
+    assert first["references_added"] == 2
+    assert counts(db) == (3, 2)
+    cover = db.conn.execute("SELECT cover_url FROM event_references WHERE reference_uuid = 'book-1'").fetchone()
+    assert cover[0] == "https://covers.example/onegin.jpg"
+
+    second = BulkImporter(db, chunk_size=chunk_size).import_file(path)
+    assert second["events_added"] == 0
+    assert second["references_added"] == 0
+    assert second["references_skipped"] == 2
+    assert counts(db) == (3, 2)
+
+
+def test_events_deduplicated_by_date_type_title_year(db):
+    base = {"month": "6", "day": "6", "event_type": "birthday", "title": "Пушкин", "year": "1799"}
+    rows = [
+        base,
+        # Тот же ключ: другое описание и числовой год из Excel — то же событие
+        dict(base, description="Другое описание", year=1799.0),
+        dict(base, event_type="death"),
+        dict(base, year="1800"),
+        dict(base, title="Пушкин А. С."),
+        dict(base, day="7"),
+    ]
+    stats = BulkImporter(db, chunk_size=2).import_rows(rows)
+    assert stats["events_added"] == 5
+    keys = db.conn.execute("SELECT event_date, event_type, title, year FROM events ORDER BY id").fetchall()
+    assert [tuple(row) for row in keys] == [
+        ("06-06", "birthday", "Пушкин", "1799"),
+        ("06-06", "death", "Пушкин", "1799"),
+        ("06-06", "birthday", "Пушкин", "1800"),
+        ("06-06", "birthday", "Пушкин А. С.", "1799"),
+        ("06-07", "birthday", "Пушкин", "1799"),
+    ]
+
+
+def test_duplicate_references_in_one_file_are_skipped(db):
+    row = dict(ROWS[0])
+    stats = BulkImporter(db, chunk_size=1).import_rows([row, dict(row), dict(row, reference_uuid="author-2")])
+    assert stats["references_added"] == 2
+    assert stats["references_skipped"] == 1
+    assert counts(db) == (1, 2)
+
+
+def test_rows_attach_to_existing_event(db):
+    event_id = db.add_event(month=6, day=6, event_type="birthday", title="Пушкин", year="1799-06-06")
+    db.add_reference(event_id, "author", reference_uuid="author-1")
+
+    stats = BulkImporter(db).import_rows(ROWS[:2])
+    assert stats["events_added"] == 0
+    assert stats["events_existing"] == 1
+    assert stats["references_added"] == 1
+    assert stats["references_skipped"] == 1
+    event_ids = {row[0] for row in db.conn.execute("SELECT event_id FROM event_references")}
+    assert event_ids == {event_id}
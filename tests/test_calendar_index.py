@@ -0,0 +1,47 @@
+"""
+Индекс календаря в памяти отдаёт копии: правки вызывающего не попадают в индекс
+"""
+
+import pytest
+
+from literary_calendar_database import LiteraryCalendarDatabase
+
+
+@pytest.fixture
+def indexed_db(tmp_path):
+    db = LiteraryCalendarDatabase(str(tmp_path / "calendar.db"), use_index=True)
+    event_id = db.add_event(month=6, day=6, event_type="birthday", title="День рождения Пушкина")
+    db.add_reference(
+        event_id,
+        "book",
+        reference_uuid="book-1",
+        reference_name="Евгений Онегин",
+        metadata={"image": {"url": "https://covers.example/onegin.jpg"}, "annotation": "Роман в стихах"},
+    )
+    yield db
+    db.close()
+
+
+def test_events_come_from_index(indexed_db):
+    assert indexed_db._index is not None
+    first, second = indexed_db.get_events_by_date(6, 6), indexed_db.get_events_by_date(6, 6)
+    assert first == second
+    assert first[0] is not second[0]
+
+
+def test_caller_mutations_do_not_leak_into_index(indexed_db):
+    (event,) = indexed_db.get_events_by_date(6, 6)
+    event["title"] = "Испорчено"
+    event["references"].append({"reference_type": "tag"})
+    reference = event["references"][0]
+    reference["reference_name"] = "Испорчено"
+    # Разобранный metadata тоже у каждого вызова свой
+    reference["metadata"]["image"]["url"] = "https://evil.example/x.jpg"
+
+    (fresh,) = indexed_db.get_events_by_date(6, 6)
+    assert fresh["title"] == "День рождения Пушкина"
+    assert len(fresh["references"]) == 1
+    fresh_reference = fresh["references"][0]
+    assert fresh_reference["reference_name"] == "Евгений Онегин"
+    assert fresh_reference["metadata"]["image"]["url"] == "https://covers.example/onegin.jpg"
+    assert fresh_reference["metadata"]["annotation"] == "Роман в стихах"
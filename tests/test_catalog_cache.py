@@ -0,0 +1,83 @@
+"""
+Файловый кэш каталога (TieredCache) не читает SQLite в event loop
+
+Синхронные методы работают только с памятью, файл читается в load() в отдельном
+потоке и через своё соединение — запись в файл (блокировка и commit) его не задерживает.
+"""
+
+import asyncio
+
+import pytest
+
+from clients.cache import TTLCache
+from clients.catalog_cache import CatalogStore, TieredCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog_cache.db")
+
+
+def make_cache(store: CatalogStore) -> TieredCache:
+    return TieredCache(TTLCache(), store, "books_by_author")
+
+
+@pytest.fixture
+def stored(path):
+    """Файл с одной записью, записанной и закрытой прошлым «процессом»"""
+    store = CatalogStore(path)
+    make_cache(store).set("author-1", [{"uuid": "book-1"}])
+    store.close()
+    return path
+
+
+@pytest.mark.asyncio
+async def test_lookup_reads_file_only_in_load(stored):
+    store = CatalogStore(stored)
+    cache = make_cache(store)
+    try:
+        assert not cache.lookup("author-1").hit
+        await cache.load(["author-1", "author-2"])
+        cached = cache.lookup("author-1")
+        assert cached.hit and not cached.stale
+        assert cached.value == [{"uuid": "book-1"}]
+        assert "author-2" not in cache
+        assert cache.stats()["disk_hits"] == 1
+        assert cache.stats()["disk_misses"] == 1
+    finally:
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_load_does_not_wait_for_writer_lock(stored):
+    store = CatalogStore(stored)
+    cache = make_cache(store)
+    try:
+        # Блокировку держит «фоновая запись»: чтение идёт через своё соединение и её не ждёт
+        with store._lock:
+            await asyncio.wait_for(cache.load(["author-1"]), timeout=2)
+        assert cache.lookup("author-1").hit
+    finally:
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_loads_in_one_tick_share_one_read(stored, monkeypatch):
+    store = CatalogStore(stored)
+    cache = make_cache(store)
+    reads = []
+    original = store.aget_many
+
+    async def counting(namespace, keys):
+        reads.append(sorted(keys))
+        return await original(namespace, keys)
+
+    monkeypatch.setattr(store, "aget_many", counting)
+    try:
+        await asyncio.gather(cache.load(["author-1"]), cache.load(["author-2"]), cache.load(["author-1"]))
+        assert reads == [["author-1", "author-2"]]
+        # Всё уже в памяти — файл больше не читается
+        await cache.load(["author-1"])
+        assert len(reads) == 1
+    finally:
+        store.close()
@@ -0,0 +1,98 @@
+"""
+Дайджест, собранный во время сбоя каталога, не переиспользуется: следующий запрос собирает его заново
+"""
+
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from clients.cache import TTLCache
+from clients.graphql_client import GraphQLClient
+from clients.resilience import CircuitBreaker, RetryPolicy
+from services.digest_service import DigestService
+
+EVENT = {
+    "id": 1,
+    "event_date": "06-06",
+    "event_type": "birthday",
+    "title": "День рождения Пушкина",
+    "author_name": "Александр Пушкин",
+    "author_refs": [{"uuid": "author-1", "name": "Александр Пушкин"}],
+}
+BOOKS = [
+    {"uuid": "book-1", "name": "Евгений Онегин", "slug": "onegin", "image": {"url": "https://covers.example/1.jpg"}},
+]
+
+
+class CatalogStub:
+    """Каталог: пока down — 503 на всё, потом отвечает книгами автора"""
+
+    def __init__(self):
+        self.down = True
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.down:
+            return httpx.Response(503)
+        query = json.loads(request.content)["query"]
+        # Пакетный прогрев отвечает по алиасам выборок (единственная выборка — q0)
+        data = {"q0": BOOKS} if "PrefetchCatalog" in query else {"books": BOOKS}
+        return httpx.Response(200, json={"data": data})
+
+
+@pytest_asyncio.fixture
+async def catalog():
+    stub = CatalogStub()
+    gql = GraphQLClient(
+        "https://catalog.example/graphql",
+        # Без долгих кэшей, повторов и размыкания цепи: каждый запрос доходит до заглушки
+        cache_factory=lambda name: TTLCache(negative_ttl=0, stale_ttl=0),
+        retry_policy=RetryPolicy(max_attempts=1),
+        circuit_breaker=CircuitBreaker(failure_threshold=100),
+        hedge_budget=0.0,
+    )
+    await gql.aclose()
+    gql._http = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+    yield stub, gql
+    await gql.aclose()
+
+
+async def load_events():
+    return [dict(EVENT)]
+
+
+async def prepared(build):
+    return [await task for task in build.tasks]
+
+
+@pytest.mark.asyncio
+async def test_digest_built_during_outage_is_rebuilt(catalog):
+    stub, gql = catalog
+    service = DigestService(bot=None, gql=gql, timezone="Europe/Moscow")
+
+    first = await service.get_digest("2026-06-06", stamp=1, load_events=load_events)
+    (event,) = await prepared(first)
+    assert stub.requests > 0
+    assert event.degraded
+    assert event.books == []
+    assert first.spoiled()
+
+    # Каталог снова доступен: испорченная сборка не отдаётся из кэша дайджестов
+    stub.down = False
+    second = await service.get_digest("2026-06-06", stamp=1, load_events=load_events)
+    assert second is not first
+    assert service.digest_builds == 2
+    assert service.digest_hits == 0
+    (event,) = await prepared(second)
+    assert not event.degraded
+    assert [book["uuid"] for book in event.books] == ["book-1"]
+    assert not second.spoiled()
+
+    # Полная сборка переиспользуется без новых запросов к каталогу
+    requests = stub.requests
+    assert await service.get_digest("2026-06-06", stamp=1, load_events=load_events) is second
+    assert service.digest_hits == 1
+    assert stub.requests == requests
@@ -0,0 +1,124 @@
+"""
+Цепочка миграций PRAGMA user_version: от БД исходной схемы до последней версии
+"""
+
+import sqlite3
+
+import pytest
+
+import literary_calendar_database
+from literary_calendar_database import LiteraryCalendarDatabase
+
+# Схема до появления миграций (user_version = 0): такие файлы БД уже есть у пользователей
+BASELINE_SCHEMA = """
+CREATE TABLE events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_date TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    author_name TEXT,
+    book_title TEXT,
+    year TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE event_references (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id INTEGER NOT NULL,
+    reference_type TEXT NOT NULL,
+    reference_uuid TEXT,
+    reference_slug TEXT,
+    reference_name TEXT,
+    priority INTEGER DEFAULT 0,
+    metadata TEXT,
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+CREATE INDEX idx_event_date ON events(event_date);
+CREATE INDEX idx_event_type ON events(event_type);
+CREATE INDEX idx_reference_type ON event_references(reference_type);
+CREATE INDEX idx_event_references_event_id ON event_references(event_id);
+INSERT INTO events (event_date, event_type, title, author_name, year, created_at)
+VALUES ('06-06', 'birthday', 'День рождения Пушкина', 'Александр Пушкин', '1799-06-06', '2020-01-01 00:00:00');
+INSERT INTO event_references (event_id, reference_type, reference_uuid, reference_name, metadata)
+VALUES (1, 'book', 'book-1', 'Евгений Онегин', '{"image": {"url": "https://covers.example/onegin.jpg"}}');
+"""
+
+
+@pytest.fixture
+def baseline_path(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    return path
+
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master").fetchall(), key=repr)
+    finally:
+        conn.close()
+
+
+def columns(db, table):
+    return {row["name"] for row in db.conn.execute(f"PRAGMA table_info({table})")}
+
+
+def reopen(path):
+    """Новое открытие файла, как при следующем запуске процесса"""
+    literary_calendar_database._bootstrapped_paths.clear()
+    return LiteraryCalendarDatabase(path)
+
+
+def test_baseline_database_migrates_to_latest(baseline_path):
+    db = reopen(baseline_path)
+    try:
+        assert db.schema_version() == len(LiteraryCalendarDatabase.SCHEMA_MIGRATIONS)
+        assert {"birth_year", "updated_at"} <= columns(db, "events")
+        assert "cover_url" in columns(db, "event_references")
+        tables = {row[0] for row in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"events_fts", "calendar_version", "subscribers", "outbox"} <= tables
+
+        # Старые данные сохранены и дозаполнены
+        event = db.conn.execute("SELECT birth_year, updated_at FROM events WHERE id = 1").fetchone()
+        assert event["birth_year"] == 1799
+        # Дозаполнение cover_url — не правка события
+        assert event["updated_at"] is None
+        cover = db.conn.execute("SELECT cover_url FROM event_references WHERE id = 1").fetchone()[0]
+        assert cover == "https://covers.example/onegin.jpg"
+        assert [e["id"] for e in db.search_events("Пушкин")] == [1]
+    finally:
+        db.close()
+
+
+def test_second_run_does_nothing(baseline_path, monkeypatch):
+    reopen(baseline_path).close()
+    before = schema(baseline_path)
+
+    def must_not_run(self):
+        raise AssertionError("миграция выполнена повторно")
+
+    monkeypatch.setattr(
+        LiteraryCalendarDatabase,
+        "SCHEMA_MIGRATIONS",
+        tuple(must_not_run for _ in LiteraryCalendarDatabase.SCHEMA_MIGRATIONS),
+    )
+    db = reopen(baseline_path)
+    try:
+        db._apply_migrations()
+        assert db.schema_version() == len(LiteraryCalendarDatabase.SCHEMA_MIGRATIONS)
+    finally:
+        db.close()
+    assert schema(baseline_path) == before
+
+
+def test_new_database_gets_same_schema_as_migrated(baseline_path, tmp_path):
+    reopen(baseline_path).close()
+    reopen(str(tmp_path / "new.db")).close()
+
+    def objects(path):
+        # Сравниваем состав объектов: SQL колонок, добавленных ALTER TABLE, записан иначе
+        return {(kind, name) for kind, name, _ in schema(path)}
+
+    assert objects(str(tmp_path / "new.db")) == objects(baseline_path)
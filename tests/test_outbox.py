@@ -0,0 +1,109 @@
+"""
+Аренда записей outbox: защита от повторной отправки и порядок событий внутри чата
+
+Время передаётся явно (now), поэтому аренды истекают без ожидания.
+"""
+
+import pytest
+
+LEASE = 60.0
+T0 = 1_000_000.0
+
+
+@pytest.fixture
+def events(db):
+    return [
+        db.add_event(month=6, day=6, event_type="birthday", title=f"Событие {i}", year=1799 + i) for i in range(2)
+    ]
+
+
+def state(db, entry_id):
+    row = db.conn.execute("SELECT state, attempts, lease_until FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+    return dict(row)
+
+
+def released(db, events):
+    """Запись, чья аренда истекла и которую забрал второй отправитель: (старая аренда, новая аренда)"""
+    db.enqueue_digest(["1"], "2026-06-06", events[:1])
+    (stale,) = db.lease_outbox(10, LEASE, now=T0)
+    (fresh,) = db.lease_outbox(10, LEASE, now=T0 + LEASE + 1)
+    assert fresh["id"] == stale["id"]
+    assert fresh["attempts"] == stale["attempts"] + 1
+    return stale, fresh
+
+
+def test_active_lease_is_not_taken_again(db, events):
+    db.enqueue_digest(["1"], "2026-06-06", events[:1])
+    assert len(db.lease_outbox(10, LEASE, now=T0)) == 1
+    assert db.lease_outbox(10, LEASE, now=T0 + LEASE - 1) == []
+
+
+def test_expired_lease_is_reclaimed(db, events):
+    stale, fresh = released(db, events)
+    assert state(db, fresh["id"]) == {"state": "sending", "attempts": 2, "lease_until": T0 + 2 * LEASE + 1}
+
+
+def test_stale_holder_cannot_complete(db, events):
+    stale, fresh = released(db, events)
+    assert not db.complete_outbox(stale["id"], stale["attempts"])
+    assert state(db, fresh["id"])["state"] == "sending"
+    assert db.complete_outbox(fresh["id"], fresh["attempts"])
+    assert state(db, fresh["id"])["state"] == "sent"
+    # Повторное подтверждение той же аренды ничего не меняет
+    assert not db.complete_outbox(fresh["id"], fresh["attempts"])
+
+
+def test_stale_holder_cannot_retry(db, events):
+    stale, fresh = released(db, events)
+    assert not db.retry_outbox(stale["id"], stale["attempts"], "boom", retry_at=T0)
+    assert not db.retry_outbox(stale["id"], stale["attempts"], "boom", retry_at=None)
+    assert state(db, fresh["id"])["state"] == "sending"
+    assert db.retry_outbox(fresh["id"], fresh["attempts"], "boom", retry_at=T0 + 500)
+    assert state(db, fresh["id"])["state"] == "pending"
+
+
+def test_stale_holder_cannot_renew(db, events):
+    stale, fresh = released(db, events)
+    assert not db.renew_outbox(stale["id"], stale["attempts"], LEASE, now=T0 + LEASE + 2)
+    assert state(db, fresh["id"])["lease_until"] == T0 + 2 * LEASE + 1
+    assert db.renew_outbox(fresh["id"], fresh["attempts"], LEASE, now=T0 + LEASE + 2)
+    assert state(db, fresh["id"])["lease_until"] == T0 + 2 * LEASE + 2
+
+
+def test_stale_holder_cannot_fail_chat(db, events):
+    db.enqueue_digest(["1"], "2026-06-06", events)
+    (stale,) = db.lease_outbox(10, LEASE, now=T0)
+    (fresh,) = db.lease_outbox(10, LEASE, now=T0 + LEASE + 1)
+    assert db.fail_outbox_chat("1", "blocked", stale["id"], stale["attempts"]) == 0
+    assert state(db, fresh["id"])["state"] == "sending"
+    assert db.fail_outbox_chat("1", "blocked", fresh["id"], fresh["attempts"]) == 2
+    states = [row[0] for row in db.conn.execute("SELECT state FROM outbox WHERE chat_id = '1'")]
+    assert states == ["failed", "failed"]
+
+
+def test_chat_entries_are_leased_in_order(db, events):
+    db.enqueue_digest(["1", "2"], "2026-06-06", events)
+    first = db.lease_outbox(10, LEASE, now=T0)
+    # По одной (первой) записи на чат: вторая ждёт, пока первая в 'sending'
+    assert sorted((e["chat_id"], e["position"]) for e in first) == [("1", 0), ("2", 0)]
+    assert db.lease_outbox(10, LEASE, now=T0 + 1) == []
+
+    # Первая вернулась в очередь (pending) — вторая всё равно ждёт её
+    entry = next(e for e in first if e["chat_id"] == "1")
+    assert db.retry_outbox(entry["id"], entry["attempts"], "boom", retry_at=T0 + 10)
+    assert db.lease_outbox(10, LEASE, now=T0 + 5) == []
+    (again,) = db.lease_outbox(10, LEASE, now=T0 + 10)
+    assert again["id"] == entry["id"]
+
+    # После отправки первой забирается вторая
+    assert db.complete_outbox(again["id"], again["attempts"])
+    (second,) = db.lease_outbox(10, LEASE, now=T0 + 11)
+    assert (second["chat_id"], second["position"]) == ("1", 1)
+
+
+def test_next_day_waits_for_previous_digest(db, events):
+    db.enqueue_digest(["1"], "2026-06-06", events[:1])
+    db.enqueue_digest(["1"], "2026-06-07", events[1:])
+    (entry,) = db.lease_outbox(10, LEASE, now=T0)
+    assert entry["digest_date"] == "2026-06-06"
+    assert db.lease_outbox(10, LEASE, now=T0 + 1) == []
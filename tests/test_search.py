@@ -0,0 +1,57 @@
+"""
+Полнотекстовый поиск: триггеры держат events_fts в актуальном состоянии,
+а индекс, пропущенный из-за SQLite без FTS5, создаётся при следующем запуске
+"""
+
+import literary_calendar_database
+from literary_calendar_database import LiteraryCalendarDatabase
+
+
+def found(db, query):
+    return [event["id"] for event in db.search_events(query)]
+
+
+def test_insert_update_delete_reflected_in_search(db):
+    event_id = db.add_event(
+        month=6, day=6, event_type="birthday", title="День рождения Пушкина", author_name="Александр Пушкин"
+    )
+    other_id = db.add_event(month=10, day=15, event_type="birthday", title="День рождения Лермонтова")
+    assert found(db, "Пушкин") == [event_id]
+    # Поиск по началу слова и без учёта регистра
+    assert found(db, "пушк") == [event_id]
+
+    db.conn.execute("UPDATE events SET title = 'Памяти поэта', author_name = 'Фёдор Тютчев' WHERE id = ?", (event_id,))
+    db.conn.commit()
+    assert found(db, "Пушкин") == []
+    assert found(db, "Тютчев") == [event_id]
+
+    db.conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
+    db.conn.commit()
+    assert found(db, "Тютчев") == []
+    assert found(db, "Лермонтова") == [other_id]
+
+
+def test_search_index_created_once_fts5_available(tmp_path, monkeypatch):
+    path = str(tmp_path / "calendar.db")
+    # SQLite «без FTS5»: миграция 5 пропускает индекс, поиск работает через LIKE
+    monkeypatch.setattr(LiteraryCalendarDatabase, "_FTS_MODULE", "fts_missing")
+    db = LiteraryCalendarDatabase(path)
+    try:
+        assert db.schema_version() == len(LiteraryCalendarDatabase.SCHEMA_MIGRATIONS)
+        assert not db._has_search_index()
+        event_id = db.add_event(month=6, day=6, event_type="birthday", title="День рождения Пушкина")
+        assert found(db, "Пушкина") == [event_id]
+    finally:
+        db.close()
+
+    # Следующий запуск уже с FTS5: индекс создаётся и заполняется существующими событиями
+    monkeypatch.undo()
+    literary_calendar_database._bootstrapped_paths.clear()
+    db = LiteraryCalendarDatabase(path)
+    try:
+        assert db._has_search_index()
+        assert found(db, "пушк") == [event_id]
+        new_id = db.add_event(month=10, day=15, event_type="birthday", title="День рождения Лермонтова")
+        assert found(db, "Лермонтова") == [new_id]
+    finally:
+        db.close()
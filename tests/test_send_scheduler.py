@@ -0,0 +1,159 @@
+"""
+Темп отправки SendScheduler/TokenBucket на поддельных часах
+
+sleep() сдвигает поддельное время, поэтому тесты идут мгновенно, а моменты отправки точные.
+"""
+
+import pytest
+from telegram.error import RetryAfter
+
+from services.send_scheduler import SendScheduler, TokenBucket
+
+# RetryAfter(int) в python-telegram-bot 22.x предупреждает о будущем переходе на timedelta
+pytestmark = pytest.mark.filterwarnings("ignore::telegram.warnings.PTBDeprecationWarning")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class FakeBot:
+    """Запоминает (время, чат, число сообщений); fail — исключения для очередных вызовов по чатам"""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.sent = []
+        self.fail = {}
+
+    async def _send(self, chat_id, count=1):
+        errors = self.fail.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((self.clock.now, chat_id, count))
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._send(chat_id)
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        await self._send(chat_id, len(media))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def bot(clock):
+    return FakeBot(clock)
+
+
+def make_scheduler(bot, clock, **kwargs):
+    return SendScheduler(bot, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def fast_global(**kwargs):
+    """Общий лимит не мешает проверять лимит чата"""
+    return dict(global_rate=1e6, **kwargs)
+
+
+def times(bot, chat_id=None):
+    return [round(at, 3) for at, chat, _ in bot.sent if chat_id is None or chat == chat_id]
+
+
+def test_bucket_burst_then_rate(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Резерв уходит в минус: очередь обслуживается по порядку
+    assert [bucket.reserve() for _ in range(2)] == [1.0, 2.0]
+    clock.now = 10.0
+    assert bucket.idle()
+    assert bucket.reserve() == 0.0
+
+
+def test_bucket_cost_above_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    # Дороже запаса: уходит сразу с полным запасом, долг задерживает следующую отправку
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == 8.0
+
+    clock.now = 100.0
+    bucket.reserve(2)
+    # В запасе 1 токен: ждём, пока накопится весь запас (3), а не все 10
+    assert bucket.reserve(10) == 2.0
+
+
+def test_bucket_pause(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+    bucket.pause(5)
+    assert bucket.reserve() == 5.0
+    assert not bucket.idle()
+    clock.now = 5.0
+    assert bucket.reserve() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_private_chat_rate(bot, clock):
+    scheduler = make_scheduler(bot, clock, **fast_global(chat_rate=1.0, chat_burst=3))
+    for i in range(5):
+        await scheduler.send_message("42", text=str(i))
+    assert times(bot) == [0.0, 0.0, 0.0, 1.0, 2.0]
+    assert scheduler.sent == 5
+
+
+@pytest.mark.asyncio
+async def test_group_rate_is_per_minute(bot, clock):
+    scheduler = make_scheduler(bot, clock, **fast_global(chat_burst=3, group_rate_per_minute=20))
+    for i in range(5):
+        await scheduler.send_message("-100123", text=str(i))
+    assert times(bot) == [0.0, 0.0, 0.0, 3.0, 6.0]
+
+
+@pytest.mark.asyncio
+async def test_global_rate_across_chats(bot, clock):
+    scheduler = make_scheduler(bot, clock, global_rate=30.0)
+    for chat_id in range(61):
+        await scheduler.send_message(str(chat_id), text="hi")
+    # Общий bucket без запаса: 30 сообщений в секунду в разные чаты
+    assert times(bot)[-1] == pytest.approx(2.0)
+    assert times(bot)[30] == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_media_group_costs_one_token_per_item(bot, clock):
+    scheduler = make_scheduler(bot, clock, chat_rate=1.0, chat_burst=3)
+    media = [object()] * 10
+    await scheduler.send_media_group("42", media=media)
+    await scheduler.send_media_group("42", media=media)
+    await scheduler.send_message("42", text="после альбомов")
+    # Первый альбом — сразу, второй — когда запас восстановится после долга 7, сообщение — после второго долга
+    assert times(bot) == [0.0, 10.0, 18.0]
+    assert scheduler.sent == 21
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_bot(bot, clock):
+    scheduler = make_scheduler(bot, clock, max_attempts=3)
+    bot.fail["42"] = [RetryAfter(5)]
+    await scheduler.send_message("42", text="hi")
+    assert times(bot, "42") == [5.0]
+    assert scheduler.retry_after_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_other_chats(bot, clock):
+    scheduler = make_scheduler(bot, clock, max_attempts=1)
+    bot.fail["42"] = [RetryAfter(5)]
+    with pytest.raises(RetryAfter):
+        await scheduler.send_message("42", text="hi")
+    assert clock.now == 0.0
+    # Flood control на весь бот: другой чат тоже ждёт паузу
+    await scheduler.send_message("43", text="hi")
+    assert times(bot, "43") == [5.0]
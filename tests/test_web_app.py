@@ -0,0 +1,44 @@
+"""
+API веб-редактора: ссылки события отдаются по именам колонок, а не по их порядку в таблице
+"""
+
+import pytest
+
+pytest.importorskip("flask")
+
+from literary_calendar_database import LiteraryCalendarDatabase  # noqa: E402
+from web.app import create_app  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app(str(tmp_path / "calendar.db"))
+    return app.test_client()
+
+
+def test_event_references_by_column_name(client):
+    db = LiteraryCalendarDatabase(client.application.config["DB_PATH"])
+    try:
+        event_id = db.add_event(month=6, day=6, event_type="birthday", title="День рождения Пушкина")
+        db.add_reference(
+            event_id,
+            "book",
+            reference_uuid="book-1",
+            reference_slug="onegin",
+            reference_name="Евгений Онегин",
+            priority=2,
+            metadata={"image": {"url": "https://covers.example/onegin.jpg"}},
+        )
+    finally:
+        db.close()
+
+    response = client.get(f"/api/events/{event_id}/references")
+    assert response.status_code == 200
+    (reference,) = response.get_json()["references"]
+    assert reference["event_id"] == event_id
+    assert reference["reference_type"] == "book"
+    assert reference["reference_uuid"] == "book-1"
+    assert reference["reference_slug"] == "onegin"
+    assert reference["reference_name"] == "Евгений Онегин"
+    assert reference["priority"] == 2
+    assert reference["cover_url"] == "https://covers.example/onegin.jpg"
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import time
 from datetime import datetime
+from typing import Callable
 from zoneinfo import ZoneInfo
 
 
@@ -8,3 +10,22 @@ def now_tz(timezone: str) -> datetime:
     """Текущее время в заданной IANA timezone (aware datetime)."""
     return datetime.now(ZoneInfo(timezone))
 
+
+class Deadline:
+    """Бюджет времени на обработку команды (по монотонным часам)."""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.seconds = seconds
+        self.expires_at = clock() + seconds
+
+    def remaining(self) -> float:
+        """Сколько секунд осталось (не меньше 0)."""
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self._clock() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.seconds}s, remaining={self.remaining():.3f}s)"
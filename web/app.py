@@ -149,9 +149,10 @@ def create_app(db_path: str | None = None) -> Flask:
                 if isinstance(year_value, str):
                     year_value = year_value.strip()
                 year_value = year_value or None
+                birth_year = LiteraryCalendarDatabase.derive_birth_year(year_value, data["title"])
                 c.execute(
-                    "UPDATE events SET title = ?, description = ?, year = ? WHERE id = ?",
-                    (data["title"], data.get("description", ""), year_value, event_id),
+                    "UPDATE events SET title = ?, description = ?, year = ?, birth_year = ? WHERE id = ?",
+                    (data["title"], data.get("description", ""), year_value, birth_year, event_id),
                 )
                 conn.commit()
                 db.close()
@@ -172,25 +173,16 @@ def create_app(db_path: str | None = None) -> Flask:
             conn = db.conn
             c = conn.cursor()
 
-            c.execute("SELECT * FROM event_references WHERE event_id = ?", (event_id,))
-            references = [
-                dict(
-                    zip(
-                        [
-                            "id",
-                            "event_id",
-                            "reference_type",
-                            "reference_uuid",
-                            "reference_slug",
-                            "reference_name",
-                            "priority",
-                            "metadata",
-                        ],
-                        row,
-                    )
-                )
-                for row in c.fetchall()
-            ]
+            c.execute(
+                """
+                SELECT id, event_id, reference_type, reference_uuid, reference_slug, reference_name,
+                       priority, metadata, cover_url
+                FROM event_references WHERE event_id = ?
+                """,
+                (event_id,),
+            )
+            # conn.row_factory = sqlite3.Row: ключи — имена колонок, порядок в таблице не важен
+            references = [dict(row) for row in c.fetchall()]
 
             db.close()
             return jsonify({"references": references})